@@ -0,0 +1,25 @@
+"""Add rolling summary columns to conversations table
+
+Revision ID: add_conversation_summary
+Revises: add_message_token_count
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_conversation_summary'
+down_revision = 'add_message_token_count'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('conversations', sa.Column('summary', sa.Text(), nullable=True))
+    op.add_column('conversations', sa.Column('summarized_messages', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('conversations', 'summarized_messages')
+    op.drop_column('conversations', 'summary')
@@ -0,0 +1,26 @@
+"""Add idempotency_key column to messages table
+
+Revision ID: add_message_idempotency_key
+Revises: add_conversation_summary
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_idempotency_key'
+down_revision = 'add_conversation_summary'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('idempotency_key', sa.String(length=128), nullable=True))
+    # NULLs do not conflict, so existing and directly written messages are unaffected
+    op.create_unique_constraint('uq_messages_idempotency_key', 'messages', ['idempotency_key'])
+
+
+def downgrade() -> None:
+    op.drop_constraint('uq_messages_idempotency_key', 'messages', type_='unique')
+    op.drop_column('messages', 'idempotency_key')
@@ -0,0 +1,26 @@
+"""Add status column to messages table
+
+Revision ID: add_message_status
+Revises: add_message_idempotency_key
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_status'
+down_revision = 'add_message_idempotency_key'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('status', sa.String(length=16), nullable=True))
+    
+    # Only complete responses were saved so far; user messages have no provider
+    op.execute("UPDATE messages SET status = 'completed' WHERE model_provider IS NOT NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'status')
@@ -0,0 +1,26 @@
+"""Add token_count column to messages table
+
+Revision ID: add_message_token_count
+Revises: add_mock_provider
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_message_token_count'
+down_revision = 'add_mock_provider'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('messages', sa.Column('token_count', sa.Integer(), nullable=True))
+    
+    # Backfill with the same ~4 characters per token estimate used at write time
+    op.execute("UPDATE messages SET token_count = length(content) / 4 WHERE token_count IS NULL")
+
+
+def downgrade() -> None:
+    op.drop_column('messages', 'token_count')
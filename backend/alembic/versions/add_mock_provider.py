@@ -0,0 +1,27 @@
+"""Add mock value to the modelprovider enum
+
+Revision ID: add_mock_provider
+Revises: add_system_prompts_table
+Create Date: 2026-10-16
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_mock_provider'
+down_revision = 'add_system_prompts_table'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # ALTER TYPE ... ADD VALUE cannot run inside a transaction block
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE modelprovider ADD VALUE IF NOT EXISTS 'mock'")
+
+
+def downgrade() -> None:
+    # PostgreSQL cannot drop enum values; remove rows that use it instead
+    op.execute("DELETE FROM messages WHERE model_provider = 'mock'")
+    op.execute("DELETE FROM system_prompts WHERE model_provider = 'mock'")
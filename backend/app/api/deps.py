@@ -1,17 +1,154 @@
-from app.config import settings
+import asyncio
+from typing import Dict, Optional, Type
+from app.config import settings, Settings
+from app.clients.base import BaseAIClient
 from app.clients.claude import ClaudeClient
 from app.clients.openai import OpenAIClient
 from app.clients.gemini import GeminiClient
 from app.clients.grok import GrokClient
 from app.clients.perplexity import PerplexityClient
+from app.clients.mock import MockLLMClient
+from app.constants import MAX_CHAT_TIMEOUT_SECONDS
 from app.models.message import ModelProvider
+from app.utils.logging import get_logger
 
-def get_ai_clients():
-    """Initialize and return all AI clients"""
-    return {
-        ModelProvider.CLAUDE: ClaudeClient(settings.ANTHROPIC_API_KEY),
-        ModelProvider.CHATGPT: OpenAIClient(settings.OPENAI_API_KEY),
-        ModelProvider.GEMINI: GeminiClient(settings.GOOGLE_API_KEY),
-        ModelProvider.GROK: GrokClient(settings.XAI_API_KEY),
-        ModelProvider.PERPLEXITY: PerplexityClient(settings.PERPLEXITY_API_KEY),
-    }
\ No newline at end of file
+logger = get_logger(__name__)
+
+
+# Client class and API key setting for each provider
+PROVIDER_CLIENTS: Dict[ModelProvider, Type[BaseAIClient]] = {
+    ModelProvider.CLAUDE: ClaudeClient,
+    ModelProvider.CHATGPT: OpenAIClient,
+    ModelProvider.GEMINI: GeminiClient,
+    ModelProvider.GROK: GrokClient,
+    ModelProvider.PERPLEXITY: PerplexityClient,
+    ModelProvider.MOCK: MockLLMClient,
+}
+
+PROVIDER_API_KEY_SETTINGS: Dict[ModelProvider, str] = {
+    ModelProvider.CLAUDE: "ANTHROPIC_API_KEY",
+    ModelProvider.CHATGPT: "OPENAI_API_KEY",
+    ModelProvider.GEMINI: "GOOGLE_API_KEY",
+    ModelProvider.GROK: "XAI_API_KEY",
+    ModelProvider.PERPLEXITY: "PERPLEXITY_API_KEY",
+    ModelProvider.MOCK: "MOCK_LLM_API_KEY",
+}
+
+
+class AIClientRegistry:
+    """
+    Process-wide registry of AI provider clients.
+    
+    Each client is built lazily on first use and reused across requests,
+    so SDK connection pools and provider configuration are set up once
+    per process. Providers without an API key are skipped.
+    """
+    
+    def __init__(self, config: Settings = settings, close_grace: float = MAX_CHAT_TIMEOUT_SECONDS):
+        """
+        Initialize the registry.
+        
+        Args:
+            config: Settings object to read API keys from
+            close_grace: Seconds a replaced client stays open for requests still using it
+        """
+        self.config = config
+        self.close_grace = close_grace
+        self._clients: Dict[ModelProvider, BaseAIClient] = {}
+        # Replaced clients waiting out the grace period before they are closed
+        self._retired: Dict[asyncio.Task, BaseAIClient] = {}
+    
+    def get_api_key(self, provider: ModelProvider) -> str:
+        """Return the configured API key for a provider (empty if unset)"""
+        return getattr(self.config, PROVIDER_API_KEY_SETTINGS[provider], "") or ""
+    
+    def is_configured(self, provider: ModelProvider) -> bool:
+        """Check whether a provider has an API key configured"""
+        return bool(self.get_api_key(provider).strip())
+    
+    def get_client(self, provider: ModelProvider) -> Optional[BaseAIClient]:
+        """
+        Get the client for a provider, building it on first use.
+        
+        Args:
+            provider: The AI model provider
+        
+        Returns:
+            The shared client, or None if the provider has no API key
+        """
+        client = self._clients.get(provider)
+        if client is None and self.is_configured(provider):
+            client = PROVIDER_CLIENTS[provider](self.get_api_key(provider))
+            self._clients[provider] = client
+            logger.info(f"Initialized {provider.value} client")
+        return client
+    
+    def get_clients(self) -> Dict[ModelProvider, BaseAIClient]:
+        """
+        Get clients for every configured provider.
+        
+        Returns:
+            Dict mapping providers to their shared clients
+        """
+        clients = {}
+        for provider in ModelProvider:
+            client = self.get_client(provider)
+            if client is not None:
+                clients[provider] = client
+        return clients
+    
+    async def reload(self, config: Optional[Settings] = None) -> None:
+        """
+        Reload API keys and rebuild clients whose key changed.
+        
+        The keys are written into the registry's settings object (the
+        app-wide settings by default), so the rest of the app reads the
+        same keys. Replaced clients are closed after close_grace, since
+        requests that already hold them may still be streaming.
+        
+        Args:
+            config: Settings to take the keys from (defaults to re-reading the environment)
+        """
+        source = config or Settings()
+        for name in PROVIDER_API_KEY_SETTINGS.values():
+            setattr(self.config, name, getattr(source, name))
+        
+        for provider, client in list(self._clients.items()):
+            if client.api_key != self.get_api_key(provider):
+                del self._clients[provider]
+                self._retire(client)
+                logger.info(f"Reloaded {provider.value} client after key change")
+    
+    def _retire(self, client: BaseAIClient) -> None:
+        """Close a replaced client once in-flight requests have had time to finish."""
+        async def close_later():
+            await asyncio.sleep(self.close_grace)
+            try:
+                await client.aclose()
+            except Exception as e:
+                logger.warning(f"Closing replaced {client.get_model_name()} client failed: {e}")
+        
+        task = asyncio.create_task(close_later())
+        self._retired[task] = client
+        task.add_done_callback(lambda _: self._retired.pop(task, None))
+    
+    async def aclose(self) -> None:
+        """Close all clients, including replaced ones, and clear the registry"""
+        clients, self._clients = self._clients, {}
+        retired, self._retired = self._retired, {}
+        for task in retired:
+            task.cancel()
+        for client in [*clients.values(), *retired.values()]:
+            await client.aclose()
+
+
+# Global client registry instance
+client_registry = AIClientRegistry()
+
+
+def get_ai_clients() -> Dict[ModelProvider, BaseAIClient]:
+    """
+    FastAPI dependency returning the shared AI clients.
+    Override with app.dependency_overrides[get_ai_clients] in tests.
+    """
+    return client_registry.get_clients()
@@ -1,10 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.database import get_db
-from app.schemas.chat import ChatRequest, ChatResponse
+from typing import Any, AsyncGenerator, Dict, Optional
+import json
+import time
+from app.database import get_db, async_session
+from app.api.deps import get_ai_clients
+from app.clients.base import BaseAIClient
+from app.models.message import ModelProvider, ResponseStatus
+from app.schemas.chat import ChatRequest, ChatResponse, ChatStreamSummary
 from app.services import chat_service
-from app.services.conversation_service import get_or_create_conversation
-from app.services.document_service import similarity_search
+from app.constants import ERROR_MESSAGES
+from app.utils.cancellation import cancellation_registry
+from app.utils.logging import get_log_context, get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
@@ -12,105 +23,54 @@ router = APIRouter()
 @router.post("/", response_model=ChatResponse)
 async def send_chat(
     request: ChatRequest,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_db),
+    clients: Dict[ModelProvider, BaseAIClient] = Depends(get_ai_clients)
 ):
     """
     Send a prompt to all (or selected) AI models and get responses.
     Creates a new conversation if conversation_id is not provided.
     Optionally augments prompt with RAG context.
+    Models still running when the time budget runs out are reported as timed_out.
+    
+    The request can be cancelled with POST /chat/{request_id}/cancel, where
+    request_id is the X-Request-ID header the client sent; cancelled models
+    are reported as cancelled.
     """
+    deadline = chat_service.request_deadline(request.timeout_seconds)
+    request_id = get_log_context().get("request_id")
+    
     try:
-        # CRITICAL DEBUG: Log the incoming request
-        print("=" * 80)
-        print("CHAT REQUEST RECEIVED:")
-        print(f"  Prompt: {request.prompt[:100]}...")
-        print(f"  use_rag: {request.use_rag}")
-        print(f"  top_k: {request.top_k}")
-        print(f"  conversation_id: {request.conversation_id}")
-        print(f"  models: {request.models}")
-        print("=" * 80)
-        
-        # Generate title for new conversations
-        title = chat_service.generate_conversation_title(request.prompt)
-        
-        # Get or create conversation
-        conversation = await get_or_create_conversation(
-            request.conversation_id,
-            title,
-            db
-        )
-        
-        print(f"Chat request - Conversation ID: {conversation.id}, Prompt: {request.prompt[:50]}...")
-        
-        # Save user message
-        user_message = await chat_service.save_user_message(
-            conversation.id,
-            request.prompt,
-            db
+        logger.debug(
+            "Chat request: use_rag=%s top_k=%s models=%s prompt_chars=%d",
+            request.use_rag, request.top_k, request.models, len(request.prompt)
         )
         
-        # Retrieve RAG context if enabled
-        rag_context = None
-        context_chunks = None
-        
-        # CRITICAL: Check if RAG is enabled
-        if request.use_rag:
-            print(f"✓ RAG IS ENABLED - searching for top {request.top_k} contexts")
+        with cancellation_registry.open(request_id) as cancellation:
+            # Load everything the models need concurrently and start them
+            turn = await chat_service.start_chat_turn(request, db, clients, deadline)
+            conversation = turn.conversation
+            rag_context = turn.rag_context
+            context_chunks = turn.context_chunks
+            
+            # Get responses from models
             try:
-                similar_docs = await similarity_search(
-                    query=request.prompt,
-                    db=db,
-                    top_k=request.top_k
+                responses = await chat_service.collect_model_responses(
+                    turn.calls, deadline, cancellation=cancellation
                 )
-                
-                print(f"✓ RAG search returned {len(similar_docs) if similar_docs else 0} results")
-                
-                if similar_docs:
-                    # Combine document contents for context
-                    rag_context = "\n\n".join([
-                        f"[Document {i+1}]:\n{doc['chunk_text']}"
-                        for i, doc in enumerate(similar_docs)
-                    ])
-                    
-                    # Store metadata about context chunks
-                    context_chunks = [
-                        {
-                            "content": doc['chunk_text'][:200] + "..." if len(doc['chunk_text']) > 200 else doc['chunk_text'],
-                            "similarity": doc['similarity_score'],
-                            "metadata": doc.get('doc_metadata', {})
-                        }
-                        for doc in similar_docs
-                    ]
-                    print(f"✓ RAG context created: {len(rag_context)} characters")
-                    print(f"✓ First 200 chars of context: {rag_context[:200]}...")
-                else:
-                    print("✗ No relevant documents found for RAG context")
-            except Exception as e:
-                print(f"✗ RAG ERROR: {str(e)}")
-                import traceback
-                traceback.print_exc()
-        else:
-            print("✗ RAG IS DISABLED - use_rag=False")
-        
-        # Get responses from models
-        print(f"Sending to models with RAG context: {bool(rag_context)}")
-        responses = await chat_service.generate_multi_model_responses(
-            prompt=request.prompt,
-            conversation_id=conversation.id,
-            db=db,
-            selected_models=request.models,
-            rag_context=rag_context
-        )
+                user_message = await turn.user_message
+            finally:
+                turn.cancel()
         
         # Save successful responses
         await chat_service.save_assistant_responses(
             conversation.id,
             responses,
-            db
+            db,
+            user_message_id=user_message.id
         )
         
         # CRITICAL: Return conversation_id in response so frontend can track it
-        print(f"✓ Returning response - conversation_id: {conversation.id}, rag_used: {bool(rag_context)}")
+        logger.debug("Chat response ready: rag_used=%s", bool(rag_context))
         return ChatResponse(
             conversation_id=conversation.id,
             user_message_id=user_message.id,
@@ -118,12 +78,158 @@ async def send_chat(
             rag_context_used=bool(rag_context),
             context_chunks=context_chunks
         )
-        
+    
     except Exception as e:
-        print(f"✗ ERROR in chat endpoint: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error(f"Chat request failed: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing chat request: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+def format_stream_record(record_type: str, payload: Dict[str, Any], sse: bool) -> str:
+    """
+    Encode one streamed chat record as an NDJSON line or a server-sent event.
+    
+    Args:
+        record_type: Record type ("conversation_info", "model_response" or "summary")
+        payload: Record fields
+        sse: Whether to use server-sent event framing
+    
+    Returns:
+        Encoded record
+    """
+    if sse:
+        return f"event: {record_type}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({"type": record_type, **payload}) + "\n"
+
+
+@router.post("/stream")
+async def send_chat_stream(
+    request: ChatRequest,
+    http_request: Request,
+    db: AsyncSession = Depends(get_db),
+    clients: Dict[ModelProvider, BaseAIClient] = Depends(get_ai_clients)
+):
+    """
+    Like POST /chat, but streams each model's response as soon as it finishes.
+    
+    Sends NDJSON by default, or server-sent events when the client sends
+    "Accept: text/event-stream". Records, in order:
+    
+    - conversation_info: request_id, conversation_id, user_message_id, rag_context_used, context_chunks
+    - model_response: one ModelResponse per model, in completion order
+    - summary: ChatStreamSummary, sent after the responses are saved
+    
+    Models still running when the time budget runs out are cancelled and
+    reported as a timed_out model_response.
+    
+    POST /chat/{request_id}/cancel stops the models, or one of them, early;
+    request_id is the X-Request-ID response header (or the one the client
+    sent). Cancelled models are reported as a cancelled model_response.
+    """
+    deadline = chat_service.request_deadline(request.timeout_seconds)
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+    request_id = get_log_context().get("request_id")
+    # Registered before the models start, so a cancel can arrive at any time
+    cancellation = cancellation_registry.register(request_id)
+    
+    try:
+        # Load everything the models need concurrently and start them
+        turn = await chat_service.start_chat_turn(request, db, clients, deadline)
+        try:
+            # The request's session closes before the body is streamed
+            user_message = await turn.user_message
+        except BaseException:
+            turn.cancel()
+            raise
+    except BaseException as e:
+        cancellation_registry.release(request_id, cancellation)
+        if not isinstance(e, Exception):
+            raise
+        logger.error(f"Chat stream request failed: {e}", exc_info=True)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing chat request: {str(e)}"
+        )
+    
+    conversation_id = turn.conversation.id
+    user_message_id = user_message.id
+    rag_context = turn.rag_context
+    context_chunks = turn.context_chunks
+    
+    def cleanup() -> None:
+        """Stop the models and forget the request; safe to call more than once."""
+        turn.cancel()
+        cancellation_registry.release(request_id, cancellation)
+    
+    async def records() -> AsyncGenerator[str, None]:
+        start_time = time.time()
+        yield format_stream_record("conversation_info", {
+            "request_id": request_id,
+            "conversation_id": conversation_id,
+            "user_message_id": user_message_id,
+            "rag_context_used": bool(rag_context),
+            "context_chunks": context_chunks
+        }, sse)
+        
+        responses = []
+        try:
+            async for response in chat_service.iter_responses_as_completed(
+                turn.calls, deadline, cancellation
+            ):
+                responses.append(response)
+                yield format_stream_record("model_response", response.model_dump(mode="json"), sse)
+        finally:
+            cleanup()
+        
+        # The request's session is closed before the body is streamed,
+        # so responses are saved with a session of their own
+        async with async_session() as session:
+            await chat_service.save_assistant_responses(
+                conversation_id, responses, session, user_message_id=user_message_id
+            )
+        
+        summary = ChatStreamSummary(
+            conversation_id=conversation_id,
+            user_message_id=user_message_id,
+            succeeded=[r.provider for r in responses if r.status == ResponseStatus.COMPLETED],
+            failed=[r.provider for r in responses if r.status == ResponseStatus.ERROR],
+            timed_out=[r.provider for r in responses if r.status == ResponseStatus.TIMED_OUT],
+            cancelled=[r.provider for r in responses if r.status == ResponseStatus.CANCELLED],
+            rag_context_used=bool(rag_context),
+            total_latency_ms=(time.time() - start_time) * 1000
+        )
+        yield format_stream_record("summary", summary.model_dump(mode="json"), sse)
+    
+    return StreamingResponse(
+        records(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        # Runs after the response ends, also when the client disconnected
+        # before the body started and records() never ran
+        background=BackgroundTask(cleanup)
+    )
+
+
+@router.post("/{request_id}/cancel")
+async def cancel_chat(request_id: str, provider: Optional[ModelProvider] = None):
+    """
+    Cancel a chat request in progress, or one of its models.
+    
+    Stops the upstream provider calls. Models that were cancelled are
+    reported as cancelled in the request's response.
+    
+    Args:
+        request_id: X-Request-ID of the POST /chat or POST /chat/stream request
+        provider: Model to stop; all of them if omitted
+    
+    Returns:
+        The cancelled request and provider
+    """
+    if not cancellation_registry.cancel(request_id, provider.value if provider else None):
+        raise HTTPException(
+            status_code=404,
+            detail=ERROR_MESSAGES["request_not_found"].format(request_id=request_id)
+        )
+    return {"request_id": request_id, "provider": provider, "cancelled": True}
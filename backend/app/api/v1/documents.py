@@ -8,6 +8,7 @@ import json
 from app.database import get_db
 from app.schemas.document import DocumentCreate, DocumentResponse, SimilaritySearchRequest, SimilaritySearchResult
 from app.services import document_service
+from app.utils.logging import get_logger
 
 # Import text extraction libraries
 try:
@@ -29,6 +30,8 @@ except ImportError:
 
 import chardet
 
+logger = get_logger(__name__)
+
 router = APIRouter()
 
 
@@ -99,7 +102,7 @@ async def upload_document(
         if filename.endswith('.pdf'):
             if file_size_mb > 5:
                 # For large PDFs, warn user it might take time
-                print(f"Processing large PDF ({file_size_mb:.2f} MB): {file.filename}")
+                logger.info(f"Processing large PDF ({file_size_mb:.2f} MB): {file.filename}")
             text_content = extract_text_from_pdf(content)
             
         elif filename.endswith(('.doc', '.docx')):
@@ -135,7 +138,7 @@ async def upload_document(
             )
         
         # Provide feedback about processing embeddings
-        print(f"Creating embeddings for document with {len(text_content)} characters...")
+        logger.debug("Creating embeddings for document with %d characters", len(text_content))
         
         # Create document with embeddings
         document = await document_service.create_document_with_embeddings(
@@ -159,7 +162,7 @@ async def upload_document(
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error processing upload: {str(e)}")
+        logger.error(f"Error processing upload: {e}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Error processing file: {str(e)}"
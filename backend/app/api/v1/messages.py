@@ -5,6 +5,8 @@ from typing import List
 from app.database import get_db
 from app.models.message import Message
 from app.schemas.message import MessageResponse
+from app.services.compaction_service import conversation_compactor
+from app.services.history_service import history_cache
 
 router = APIRouter()
 
@@ -74,6 +76,8 @@ async def delete_message(
     if not message:
         raise HTTPException(status_code=404, detail="Message not found")
     
-    db.delete(message)
+    await db.delete(message)
     await db.commit()
+    await history_cache.invalidate(message.conversation_id)
+    await conversation_compactor.reset(message.conversation_id, db)
     return {"message": "Message deleted successfully"}
\ No newline at end of file
@@ -8,6 +8,10 @@ from app.models.message import ModelProvider
 from app.utils.circuit_breaker import circuit_manager, CircuitState
 from app.schemas.provider import ProviderHealth, ProviderStatus
 from app.utils.cache import response_cache
+from app.clients.prompt_cache import prompt_cache_stats
+from app.api.deps import client_registry
+from app.utils.hedging import request_hedger
+from app.utils.concurrency_limiter import concurrency_manager
 
 router = APIRouter()
 
@@ -46,11 +50,27 @@ async def get_available_providers():
     Returns:
         List of provider names that are available for use
     """
-    all_providers = [p.value for p in ModelProvider]
+    all_providers = [p.value for p in ModelProvider if client_registry.is_configured(p)]
     healthy_providers = circuit_manager.get_healthy_providers(all_providers)
     return healthy_providers
 
 
+@router.post("/reload")
+async def reload_provider_clients():
+    """
+    Reload provider API keys from the environment.
+    Clients whose key changed are rebuilt on their next use.
+    
+    Returns:
+        List of providers that are configured after the reload
+    """
+    await client_registry.reload()
+    return {
+        "message": "Provider clients reloaded",
+        "configured": [p.value for p in ModelProvider if client_registry.is_configured(p)]
+    }
+
+
 @router.post("/reset/{provider_name}")
 async def reset_provider_circuit(provider_name: str):
     """
@@ -87,6 +107,17 @@ async def get_cache_stats():
     return response_cache.get_cache_stats()
 
 
+@router.get("/prompt-cache/stats")
+async def get_prompt_cache_stats():
+    """
+    Get provider prompt caching statistics.
+    
+    Returns:
+        Prompt tokens sent and read from the providers' caches, per provider
+    """
+    return prompt_cache_stats.get_stats()
+
+
 @router.delete("/cache")
 async def clear_cache(provider: Optional[str] = None):
     """
@@ -114,3 +145,25 @@ async def clear_cache(provider: Optional[str] = None):
         "provider": provider,
         "count": cleared
     }
+
+
+@router.get("/hedging/stats")
+async def get_hedging_stats():
+    """
+    Get hedged request statistics.
+    
+    Returns:
+        Per-provider hedge delay, sample count and hedge counters
+    """
+    return request_hedger.get_stats()
+
+
+@router.get("/limits")
+async def get_concurrency_limits():
+    """
+    Get adaptive concurrency limiter state.
+    
+    Returns:
+        Per-provider current limit, in-flight calls and queue depth
+    """
+    return concurrency_manager.get_stats()
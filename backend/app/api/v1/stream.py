@@ -3,35 +3,78 @@ WebSocket endpoint for streaming chat responses.
 """
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
-from sqlalchemy.ext.asyncio import AsyncSession
 import json
 import asyncio
-from typing import Dict, List, Optional
+import logging
+from contextlib import suppress
+from functools import partial
+from typing import Callable, Dict, List, Optional, Set, Union
 import time
 
-from app.database import get_db
-from app.schemas.chat import ChatRequest
-from app.models.message import ModelProvider, MessageRole, Message
+from app.config import settings
+from app.database import async_session
+from app.schemas.chat import ChatRequest, ModelResponse
+from app.models.message import ModelProvider
 from app.services import chat_service
 from app.services.conversation_service import get_or_create_conversation
+from app.services.history_service import history_token_budget, window_history
 from app.api.deps import get_ai_clients
+from app.clients.base import BaseAIClient
 from app.utils.circuit_breaker import circuit_manager
+from app.utils.concurrency_limiter import concurrency_manager
+from app.clients.errors import counts_toward_circuit_breaker
+from app.clients.retry import retry_policy
+from app.utils.single_flight import single_flight, request_key
+from app.utils.coalescing import ChunkCoalescer, chunk_frame
+from app.utils.cancellation import CancellationScope
+from app.utils.stream_codec import FramedWebSocket, TaggedWebSocket, negotiate_codec, protocol_description
+from app.constants import ERROR_MESSAGES
+from app.utils.logging import bind_log_context, get_logger, log_context
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
+# Client-chosen id of a prompt on a multiplexed connection
+RequestId = Union[str, int]
+
 
 async def stream_model_response(
-    websocket: WebSocket,
+    websocket: Union[FramedWebSocket, TaggedWebSocket],
     provider: ModelProvider,
     client,
     prompt: str,
-    history: List[Dict[str, str]]
+    history: List[Dict[str, str]],
+    system_prompt: Optional[str] = None,
+    deadline: Optional[float] = None,
+    received: Optional[List[str]] = None
 ) -> Optional[str]:
     """
     Stream a single model's response over WebSocket.
     
+    Chunks are forwarded as soon as the provider emits them.
     Returns the complete response content or None if failed.
+    Retries are not attempted past the deadline (a time.monotonic() value).
+    Chunks are also appended to received, if given, so the caller keeps
+    the partial response when it cancels the stream.
     """
+    with log_context(provider=provider.value):
+        return await _stream_model_response(
+            websocket, provider, client, prompt, history, system_prompt, deadline, received
+        )
+
+
+async def _stream_model_response(
+    websocket: Union[FramedWebSocket, TaggedWebSocket],
+    provider: ModelProvider,
+    client,
+    prompt: str,
+    history: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    deadline: Optional[float],
+    received: Optional[List[str]] = None
+) -> Optional[str]:
+    """stream_model_response within the provider's logging context."""
     start_time = time.time()
     breaker = circuit_manager.get_breaker(provider.value)
     
@@ -45,16 +88,44 @@ async def stream_model_response(
         
         # Check if the client supports streaming
         if hasattr(client, 'generate_stream'):
-            # Stream the response
-            full_content = ""
-            async for chunk in client.generate_stream(prompt, history):
-                full_content += chunk
-                await websocket.send_json({
-                    "type": "model_chunk",
-                    "provider": provider.value,
-                    "content": chunk,
-                    "timestamp": time.time()
-                })
+            async def provider_stream():
+                try:
+                    async with concurrency_manager.slot(provider.value, track_latency=False):
+                        stream = retry_policy.stream(
+                            provider.value,
+                            lambda: client.generate_stream(prompt, history, system_prompt),
+                            deadline=deadline
+                        )
+                        async for chunk in stream:
+                            yield chunk
+                except Exception as e:
+                    if counts_toward_circuit_breaker(e):
+                        circuit_manager.record_failure(provider.value)
+                    raise
+                circuit_manager.record_success(provider.value)
+            
+            # Stream the response; identical concurrent requests share one upstream stream
+            key = request_key(provider.value, client.get_model_name(), system_prompt, history, prompt)
+            parts = received if received is not None else []
+            shared_stream = single_flight.stream(key, provider_stream)
+            # Chunks are batched into one frame per window (see app.utils.coalescing)
+            coalescer = ChunkCoalescer(
+                lambda content: websocket.send_json(chunk_frame(provider.value, content))
+            )
+            try:
+                async for chunk in shared_stream:
+                    parts.append(chunk)
+                    await coalescer.add(chunk)
+                await coalescer.aclose()
+            except Exception:
+                # Deliver what arrived before the failure, as when every chunk was sent at once
+                with suppress(Exception):
+                    await coalescer.aclose()
+                raise
+            finally:
+                coalescer.discard()
+                await shared_stream.aclose()
+            full_content = "".join(parts)
         else:
             # Fallback to non-streaming with progress updates
             async def generate_with_updates():
@@ -67,18 +138,14 @@ async def stream_model_response(
                     client.generate_response,
                     provider.value,
                     prompt,
-                    history
+                    history,
+                    system_prompt
                 )
             
             full_content = await generate_with_updates()
             
             # Send the complete response
-            await websocket.send_json({
-                "type": "model_chunk",
-                "provider": provider.value,
-                "content": full_content,
-                "timestamp": time.time()
-            })
+            await websocket.send_json(chunk_frame(provider.value, full_content))
         
         # Send completion status
         latency_ms = (time.time() - start_time) * 1000
@@ -90,15 +157,12 @@ async def stream_model_response(
         })
         
         return full_content
-        
+    
     except Exception as e:
         latency_ms = (time.time() - start_time) * 1000
         error_msg = str(e)
         
-        # Log the error for debugging
-        print(f"Error in {provider.value}: {error_msg}")
-        import traceback
-        traceback.print_exc()
+        logger.warning(f"Model stream failed: {error_msg}", exc_info=logger.isEnabledFor(logging.DEBUG))
         
         if "circuit breaker is OPEN" in error_msg:
             error_msg = f"{provider.value} is temporarily unavailable"
@@ -114,10 +178,168 @@ async def stream_model_response(
         return None
 
 
+@router.get("/protocol")
+async def get_stream_protocol():
+    """
+    Describe the binary framing option of the chat WebSocket.
+    
+    Returns:
+        Subprotocol name and the integer codes used for event types and providers
+    """
+    return protocol_description()
+
+
+async def run_chat_turn(
+    websocket: Union[FramedWebSocket, TaggedWebSocket],
+    request: ChatRequest,
+    all_clients: Dict[ModelProvider, BaseAIClient],
+    cancellation: Optional[CancellationScope] = None
+) -> None:
+    """
+    Run one prompt: save it, stream every model's response, save the responses.
+    
+    The caller sends all_complete once the turn is over.
+    
+    Args:
+        websocket: Socket to send the turn's events on
+        request: Validated chat request
+        all_clients: Configured AI clients
+        cancellation: Scope through which the client can stop models early
+    """
+    deadline = chat_service.request_deadline(request.timeout_seconds)
+    turn_start = time.time()
+    cancellation = cancellation or CancellationScope()
+    
+    # Determine which models to use
+    models_to_use = chat_service.select_models(request.models, all_clients)
+    
+    # A session per turn, returned to the pool before streaming starts,
+    # so idle sockets and slow models hold no database connection
+    async with async_session() as db:
+        # Get or create conversation
+        title = chat_service.generate_conversation_title(request.prompt)
+        conversation = await get_or_create_conversation(
+            request.conversation_id,
+            title,
+            db,
+            load_messages=False
+        )
+        
+        # Get conversation history before saving the prompt, so it is not repeated
+        history = await chat_service.format_conversation_history(conversation.id, db)
+        
+        # Save user message
+        user_message = await chat_service.save_user_message(
+            conversation.id,
+            request.prompt,
+            db
+        )
+        
+        system_prompts = {
+            provider: await chat_service.get_model_system_prompt(provider, db)
+            for provider in models_to_use
+            if provider in all_clients
+        }
+    
+    # Every record of this turn carries the conversation
+    bind_log_context(conversation_id=conversation.id)
+    
+    # Send conversation info
+    await websocket.send_json({
+        "type": "conversation_info",
+        "conversation_id": conversation.id,
+        "timestamp": time.time()
+    })
+    
+    # Stream responses from all models concurrently
+    tasks = []
+    # Chunks received from each model, kept for models that get cancelled
+    received: Dict[ModelProvider, List[str]] = {}
+    try:
+        for provider in models_to_use:
+            if provider not in all_clients:
+                await websocket.send_json({
+                    "type": "model_error",
+                    "provider": provider.value,
+                    "error": ERROR_MESSAGES["model_not_configured"].format(model=provider.value),
+                    "timestamp": time.time()
+                })
+                continue
+            system_prompt = system_prompts[provider]
+            received[provider] = []
+            task = stream_model_response(
+                websocket,
+                provider,
+                all_clients[provider],
+                request.prompt,
+                window_history(history, history_token_budget(provider, request.prompt, system_prompt)),
+                system_prompt,
+                deadline,
+                received[provider]
+            )
+            tasks.append((provider, asyncio.ensure_future(task)))
+        
+        # Run all streaming tasks concurrently, up to the deadline or until cancelled
+        if tasks:
+            await cancellation.wait(
+                {task: provider.value for provider, task in tasks},
+                timeout=chat_service.time_remaining(deadline)
+            )
+        
+        responses = []
+        for provider, task in tasks:
+            if chat_service.was_cancelled(task, provider, cancellation):
+                task.cancel()
+                # Whatever streamed before the cancel is kept
+                response = chat_service.cancelled_model_response(
+                    provider, (time.time() - turn_start) * 1000, "".join(received[provider])
+                )
+                responses.append(response)
+                await websocket.send_json({
+                    "type": "model_cancelled",
+                    "provider": provider.value,
+                    "error": response.error,
+                    "latency_ms": response.latency_ms,
+                    "timestamp": time.time()
+                })
+                continue
+            
+            if task.done():
+                result = task.exception() or task.result()
+                if isinstance(result, str) and result:  # Successful response
+                    responses.append(ModelResponse(provider=provider, content=result))
+                continue
+            
+            # Cancel without waiting, so a hung provider cannot hold the turn
+            task.cancel()
+            await websocket.send_json({
+                "type": "model_timed_out",
+                "provider": provider.value,
+                "error": ERROR_MESSAGES["model_timed_out"].format(model=provider.value),
+                "latency_ms": (time.time() - turn_start) * 1000,
+                "timestamp": time.time()
+            })
+        logger.debug("Model streams finished: %s", [r.status.value for r in responses])
+        
+        # Save successful and cancelled responses (queued for a batched insert with
+        # write-behind, in which case the session is never used and takes no connection)
+        async with async_session() as db:
+            await chat_service.save_assistant_responses(
+                conversation.id,
+                responses,
+                db,
+                user_message_id=user_message.id
+            )
+    finally:
+        # Stop models still streaming, e.g. when the turn itself was cancelled
+        for _, task in tasks:
+            task.cancel()
+
+
 @router.websocket("/chat")
 async def websocket_chat(
     websocket: WebSocket,
-    db: AsyncSession = Depends(get_db)
+    all_clients: Dict[ModelProvider, BaseAIClient] = Depends(get_ai_clients)
 ):
     """
     WebSocket endpoint for streaming chat responses.
@@ -125,126 +347,186 @@ async def websocket_chat(
     Client sends:
     {
         "prompt": "user question",
+        "request_id": "r1",  // optional, string or integer
         "conversation_id": 123,  // optional
-        "models": ["claude", "chatgpt", ...]  // optional
+        "models": ["claude", "chatgpt", ...],  // optional
+        "timeout_seconds": 30  // optional, defaults to CHAT_TIMEOUT_SECONDS
+    }
+    
+    or, to stop generating:
+    {
+        "type": "cancel",
+        "request_id": "r1",   // prompt to cancel; untagged prompts if omitted
+        "provider": "claude"  // optional, cancels only this model
     }
     
     Server sends:
     {
-        "type": "model_start" | "model_chunk" | "model_complete" | "model_error" | "model_thinking",
+        "type": "model_start" | "model_chunk" | "model_complete" | "model_error" | "model_thinking" | "model_timed_out" | "model_cancelled",
+        "request_id": "r1",           // if the request had one
         "provider": "claude",
         "content": "response chunk",  // for model_chunk
-        "error": "error message",     // for model_error
-        "latency_ms": 123.45,        // for model_complete/model_error
+        "error": "error message",     // for model_error/model_timed_out/model_cancelled
+        "latency_ms": 123.45,        // for model_complete/model_error/model_timed_out/model_cancelled
         "timestamp": 1234567890.123
     }
+    
+    Prompts with a request_id run concurrently, and every message about
+    them carries their request_id; a prompt reusing the id of one still
+    running is answered with an error. Prompts without a request_id run
+    one after another, as they arrive. A connection may have at most
+    STREAM_MAX_CONCURRENT_REQUESTS prompts running or waiting, tagged or
+    not; prompts over the limit are answered with an error. A prompt's
+    slot is free again by the time its all_complete arrives.
+    
+    Models still streaming when the time budget runs out are cancelled and
+    get a model_timed_out message; all_complete follows without waiting for them.
+    Models the client cancels stop their upstream calls and get a
+    model_cancelled message; what they had streamed is saved with status
+    cancelled. Prompts still running when the client disconnects are cancelled.
+    
+    Messages are JSON text frames unless the client requests the
+    "chat.msgpack.v1" subprotocol, which switches to compact MessagePack
+    binary frames (see app.utils.stream_codec and GET /stream/protocol).
     """
-    await websocket.accept()
+    codec = negotiate_codec(websocket.scope.get("subprotocols", []))
+    await websocket.accept(subprotocol=codec.subprotocol)
+    # From here on, messages are sent and received in the negotiated encoding
+    websocket = FramedWebSocket(websocket, codec)
+    
+    # Cancellation scopes of tagged prompts in progress, by request id
+    active: Dict[RequestId, CancellationScope] = {}
+    # Cancellation scopes of untagged prompts running or waiting their turn
+    untagged_scopes: List[CancellationScope] = []
+    # Every prompt in progress, tagged or not
+    running: Set[asyncio.Task] = set()
+    # Last untagged prompt; the next one waits for it
+    untagged: Optional[asyncio.Task] = None
+    
+    def start(reply, request: ChatRequest, request_id: Optional[RequestId] = None, after=None) -> asyncio.Task:
+        scope = CancellationScope()
+        if request_id is None:
+            untagged_scopes.append(scope)
+            release = partial(untagged_scopes.remove, scope)
+        else:
+            active[request_id] = scope
+            release = partial(active.pop, request_id, None)
+        task = asyncio.create_task(_run_request(reply, request, all_clients, scope, release, request_id, after))
+        running.add(task)
+        task.add_done_callback(running.discard)
+        return task
     
     try:
         while True:
             # Receive message from client
             data = await websocket.receive_json()
             
+            request_id = data.pop("request_id", None) if isinstance(data, dict) else None
+            if request_id is not None and (isinstance(request_id, bool) or not isinstance(request_id, (str, int))):
+                await websocket.send_json({
+                    "type": "error",
+                    "error": ERROR_MESSAGES["invalid_request_id"]
+                })
+                continue
+            reply = websocket if request_id is None else TaggedWebSocket(websocket, request_id)
+            
+            if isinstance(data, dict) and data.get("type") == "cancel":
+                provider = data.get("provider")
+                if provider is not None and provider not in {p.value for p in ModelProvider}:
+                    error = f"Invalid provider: {provider}"
+                elif request_id is None:
+                    for scope in untagged_scopes:
+                        scope.cancel(provider)
+                    continue
+                elif request_id in active:
+                    active[request_id].cancel(provider)
+                    continue
+                else:
+                    error = ERROR_MESSAGES["request_not_found"].format(request_id=request_id)
+                await reply.send_json({
+                    "type": "error",
+                    "error": error
+                })
+                continue
+            
             # Validate request
             try:
                 request = ChatRequest(**data)
             except Exception as e:
-                await websocket.send_json({
+                await reply.send_json({
                     "type": "error",
                     "error": f"Invalid request: {str(e)}"
                 })
                 continue
             
-            # Get or create conversation
-            title = chat_service.generate_conversation_title(request.prompt)
-            conversation = await get_or_create_conversation(
-                request.conversation_id,
-                title,
-                db
-            )
-            
-            # Send conversation info
-            await websocket.send_json({
-                "type": "conversation_info",
-                "conversation_id": conversation.id,
-                "timestamp": time.time()
-            })
-            
-            # Save user message
-            user_message = await chat_service.save_user_message(
-                conversation.id,
-                request.prompt,
-                db
-            )
-            
-            # Get conversation history
-            history = await chat_service.format_conversation_history(conversation.id, db)
-            
-            # Get AI clients
-            all_clients = get_ai_clients()
-            
-            # Determine which models to use
-            if request.models:
-                models_to_use = request.models
-            else:
-                all_providers = list(ModelProvider)
-                healthy_providers = circuit_manager.get_healthy_providers(
-                    [p.value for p in all_providers]
-                )
-                models_to_use = [
-                    p for p in all_providers 
-                    if p.value in healthy_providers
-                ]
-            
-            # Stream responses from all models concurrently
-            tasks = []
-            for provider in models_to_use:
-                print(f"Creating task for provider: {provider.value}")
-                task = stream_model_response(
-                    websocket,
-                    provider,
-                    all_clients[provider],
-                    request.prompt,
-                    history
+            if request_id is not None and request_id in active:
+                error = ERROR_MESSAGES["duplicate_request_id"].format(request_id=request_id)
+            elif len(active) + len(untagged_scopes) >= settings.STREAM_MAX_CONCURRENT_REQUESTS:
+                error = ERROR_MESSAGES["too_many_stream_requests"].format(
+                    limit=settings.STREAM_MAX_CONCURRENT_REQUESTS
                 )
-                tasks.append((provider, task))
-            
-            print(f"Running {len(tasks)} tasks concurrently")
-            # Run all streaming tasks concurrently
-            results = await asyncio.gather(
-                *[task for _, task in tasks],
-                return_exceptions=True
-            )
-            print(f"All tasks completed. Results: {[type(r).__name__ for r in results]}")
-            
-            # Save successful responses to database
-            assistant_messages = []
-            for (provider, _), result in zip(tasks, results):
-                if isinstance(result, str) and result:  # Successful response
-                    assistant_messages.append(Message(
-                        conversation_id=conversation.id,
-                        role=MessageRole.ASSISTANT,
-                        content=result,
-                        model_provider=provider
-                    ))
-            
-            if assistant_messages:
-                for msg in assistant_messages:
-                    db.add(msg)
-                await db.commit()
-            
-            # Send final completion message
-            await websocket.send_json({
-                "type": "all_complete",
-                "timestamp": time.time()
+            elif request_id is None:
+                untagged = start(reply, request, after=untagged)
+                continue
+            else:
+                start(reply, request, request_id)
+                continue
+            await reply.send_json({
+                "type": "error",
+                "error": error
             })
-            
+    
     except WebSocketDisconnect:
         pass
     except Exception as e:
+        logger.error(f"WebSocket chat failed: {e}", exc_info=True)
         await websocket.send_json({
             "type": "error",
             "error": str(e)
         })
         await websocket.close()
+    finally:
+        # Nobody is left to receive the events
+        for task in running:
+            task.cancel()
+        await asyncio.gather(*running, return_exceptions=True)
+
+
+async def _run_request(
+    websocket: Union[FramedWebSocket, TaggedWebSocket],
+    request: ChatRequest,
+    all_clients: Dict[ModelProvider, BaseAIClient],
+    cancellation: CancellationScope,
+    release: Callable[[], None],
+    request_id: Optional[RequestId],
+    after: Optional[asyncio.Task]
+) -> None:
+    """
+    Run a prompt as its own task, after the one it follows; a failure ends only this prompt.
+    
+    release frees the prompt's slot on the connection. It runs before
+    all_complete is sent, so a client that sends its next prompt as soon
+    as that arrives finds the slot free.
+    """
+    if request_id is not None:
+        bind_log_context(stream_request_id=request_id)
+    try:
+        try:
+            if after is not None:
+                await asyncio.wait([after])
+            await run_chat_turn(websocket, request, all_clients, cancellation)
+        finally:
+            release()
+        
+        # Send final completion message
+        await websocket.send_json({
+            "type": "all_complete",
+            "timestamp": time.time()
+        })
+    except Exception as e:
+        logger.error(f"WebSocket chat turn failed: {e}", exc_info=True)
+        with suppress(Exception):
+            await websocket.send_json({
+                "type": "error",
+                "error": str(e)
+            })
@@ -109,5 +109,6 @@ async def delete_system_prompt(
         delete(SystemPrompt).where(SystemPrompt.id == prompt_id)
     )
     await db.commit()
+    await system_prompt_service.invalidate_system_prompt_cache()
     
     return {"message": "System prompt deleted successfully"}
@@ -52,24 +52,34 @@ class BaseAIClient(ABC):
         """
         return messages
     
+    async def aclose(self) -> None:
+        """
+        Release any network resources held by the client.
+        Override in subclasses that own an SDK client or connection pool.
+        """
+        pass
+    
     async def generate_stream(
         self, 
         prompt: str, 
-        conversation_history: List[Dict[str, str]] = None
+        conversation_history: List[Dict[str, str]] = None,
+        system_prompt: str = None
     ) -> AsyncGenerator[str, None]:
         """
         Stream response from the AI model.
         
-        This is an optional method - if not implemented, the system will
-        fall back to the regular generate_response method.
+        Providers override this to yield tokens as they arrive. If not
+        overridden, it falls back to the regular generate_response method
+        and yields the complete answer once.
         
         Args:
             prompt: The user's input prompt
             conversation_history: List of previous messages
+            system_prompt: Optional system prompt to set context and behavior
             
         Yields:
             Chunks of the response as they become available
         """
         # Default implementation: just yield the complete response
-        response = await self.generate_response(prompt, conversation_history)
+        response = await self.generate_response(prompt, conversation_history, system_prompt)
         yield response
\ No newline at end of file
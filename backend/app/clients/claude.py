@@ -1,7 +1,10 @@
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic
 from app.clients.base import BaseAIClient
-from typing import List, Dict, Optional
-from app.constants import CLAUDE_MODEL, ERROR_MESSAGES
+from typing import List, Dict, Optional, AsyncGenerator, Any
+from app.clients.errors import classify_error
+from app.clients.prompt_cache import EPHEMERAL_CACHE, prompt_cache_stats, split_system_prompt
+from app.config import settings
+from app.constants import CLAUDE_MODEL
 from app.utils.logging import get_logger
 
 logger = get_logger(__name__)
@@ -12,9 +15,63 @@ class ClaudeClient(BaseAIClient):
     
     def __init__(self, api_key: str, model: str = CLAUDE_MODEL):
         super().__init__(api_key)
-        self.client = Anthropic(api_key=api_key)
+        # Retries are handled by the shared policy in app.clients.retry
+        self.client = AsyncAnthropic(api_key=api_key, max_retries=0)
         self.model = model
     
+    def _build_params(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Build the Messages API parameters shared by regular and streaming calls.
+        
+        Laid out for prompt caching: the system instructions and the history
+        come first, each ending in a cache breakpoint, and the request's RAG
+        context travels with the current prompt, after the cached prefix.
+        """
+        caching = settings.PROMPT_CACHING_ENABLED
+        instructions, rag_context = split_system_prompt(system_prompt)
+        messages = []
+        
+        # Add conversation history if provided
+        if conversation_history:
+            messages.extend(conversation_history)
+            if caching:
+                # Breakpoint after the history; next turn's prefix extends it
+                last = messages[-1]
+                messages[-1] = {
+                    "role": last["role"],
+                    "content": [{"type": "text", "text": last["content"], "cache_control": EPHEMERAL_CACHE}]
+                }
+        
+        # Add the current prompt, preceded by the RAG context
+        if rag_context:
+            messages.append({
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": rag_context},
+                    {"type": "text", "text": prompt}
+                ]
+            })
+        else:
+            messages.append({
+                "role": "user",
+                "content": prompt
+            })
+        
+        params = {
+            "model": self.model,
+            "max_tokens": 4096,
+            "messages": messages
+        }
+        
+        # Add system instructions if provided
+        if instructions:
+            if caching:
+                params["system"] = [{"type": "text", "text": instructions, "cache_control": EPHEMERAL_CACHE}]
+            else:
+                params["system"] = instructions
+        
+        return params
+    
     async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
         """
         Generate a response from Claude.
@@ -26,40 +83,50 @@ class ClaudeClient(BaseAIClient):
         
         Returns:
             Claude's response as a string
-        """
-        messages = []
-        
-        # Add conversation history if provided
-        if conversation_history:
-            messages.extend(conversation_history)
-        
-        # Add the current prompt
-        messages.append({
-            "role": "user",
-            "content": prompt
-        })
         
+        Prompt token usage, including cache reads and writes, is reported
+        to prompt_cache_stats.
+        """
         try:
-            # Build API call parameters
-            params = {
-                "model": self.model,
-                "max_tokens": 4096,
-                "messages": messages
-            }
-            
-            # Add system prompt if provided (includes RAG context)
-            if system_prompt:
-                params["system"] = system_prompt
-            
-            response = self.client.messages.create(**params)
+            params = self._build_params(prompt, conversation_history, system_prompt)
+            response = await self.client.messages.create(**params)
+            prompt_cache_stats.record_anthropic("claude", response.usage)
             
             # Extract text from response
             return response.content[0].text
         
         except Exception as e:
             logger.error(f"Claude API error: {str(e)}", exc_info=True)
-            raise Exception(ERROR_MESSAGES["api_error"].format(error=str(e)))
+            raise classify_error("claude", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from Claude as text deltas arrive.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Text deltas from Claude
+        """
+        try:
+            params = self._build_params(prompt, conversation_history, system_prompt)
+            async with self.client.messages.stream(**params) as stream:
+                async for text in stream.text_stream:
+                    yield text
+                final_message = await stream.get_final_message()
+            prompt_cache_stats.record_anthropic("claude", final_message.usage)
+        
+        except Exception as e:
+            logger.error(f"Claude streaming error: {str(e)}", exc_info=True)
+            raise classify_error("claude", e) from e
+    
+    async def aclose(self) -> None:
+        """Close the underlying SDK HTTP client"""
+        await self.client.close()
     
     def get_model_name(self) -> str:
         """Return the Claude model being used"""
-        return self.model
\ No newline at end of file
+        return self.model
@@ -0,0 +1,264 @@
+"""
+Typed errors for AI provider clients.
+
+Clients translate SDK and HTTP errors into these classes so callers can
+tell transient failures (rate limits, overloads, timeouts) that are worth
+retrying from permanent ones (bad requests, auth errors).
+"""
+
+import asyncio
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Mapping, Optional
+
+import anthropic
+import httpx
+import openai
+
+from app.constants import ERROR_MESSAGES, MODEL_DISPLAY_NAMES
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:  # pragma: no cover - google-generativeai always pulls this in
+    google_exceptions = None
+
+
+class ProviderError(Exception):
+    """Base class for errors raised by AI provider clients"""
+    
+    retryable = False
+    
+    def __init__(
+        self,
+        provider: str,
+        message: str,
+        status_code: Optional[int] = None,
+        retry_after: Optional[float] = None
+    ):
+        """
+        Create a provider error.
+        
+        Args:
+            provider: Name of the provider that failed (ModelProvider value)
+            message: Error details
+            status_code: HTTP status code, if any
+            retry_after: Seconds the provider asked us to wait, if any
+        """
+        self.provider = provider
+        self.message = message
+        self.status_code = status_code
+        self.retry_after = retry_after
+        super().__init__(f"{MODEL_DISPLAY_NAMES.get(provider, provider)} API error: {message}")
+
+
+class ProviderRateLimitError(ProviderError):
+    """The provider rejected the call with HTTP 429"""
+    retryable = True
+
+
+class ProviderUnavailableError(ProviderError):
+    """The provider is overloaded or returned a 5xx"""
+    retryable = True
+
+
+class ProviderTimeoutError(ProviderError):
+    """The call timed out"""
+    retryable = True
+
+
+class ProviderConnectionError(ProviderError):
+    """The connection to the provider failed"""
+    retryable = True
+
+
+class ProviderAuthError(ProviderError):
+    """The API key was rejected (401/403)"""
+
+
+class ProviderBadRequestError(ProviderError):
+    """The provider rejected the request as invalid (4xx)"""
+
+
+class ProviderResponseError(ProviderError):
+    """The provider returned a response we could not use"""
+
+
+class ProviderOverloadedError(ProviderError):
+    """Our own per-provider wait queue is full; the provider was not called"""
+    
+    def __init__(self, provider: str):
+        """
+        Create an overload error.
+        
+        Args:
+            provider: Name of the provider whose queue is full
+        """
+        self.provider = provider
+        self.message = ERROR_MESSAGES["provider_overloaded"].format(provider=provider)
+        self.status_code = None
+        self.retry_after = None
+        Exception.__init__(self, self.message)
+
+
+_DURATION = re.compile(r"(?:\d+(?:\.\d+)?(?:ms|s|m|h))+")
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def _parse_reset_value(value: str) -> Optional[float]:
+    """Parse one Retry-After style header value into seconds from now."""
+    value = value.strip()
+    if not value:
+        return None
+    
+    # Plain number: delay in seconds, or an epoch timestamp
+    try:
+        number = float(value)
+        if number > 1e9:
+            return max(0.0, number - time.time())
+        return max(0.0, number)
+    except ValueError:
+        pass
+    
+    # Go-style duration, e.g. "1s", "6m0s", "250ms" (OpenAI)
+    if _DURATION.fullmatch(value):
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in _DURATION_PART.findall(value))
+    
+    # RFC 3339 timestamp (Anthropic) or HTTP date (Retry-After)
+    for parse in (
+        lambda v: datetime.fromisoformat(v.replace("Z", "+00:00")),
+        parsedate_to_datetime
+    ):
+        try:
+            reset_at = parse(value)
+        except (TypeError, ValueError):
+            continue
+        if reset_at.tzinfo is None:
+            reset_at = reset_at.replace(tzinfo=timezone.utc)
+        return max(0.0, (reset_at - datetime.now(timezone.utc)).total_seconds())
+    
+    return None
+
+
+def parse_retry_after(
+    headers: Optional[Mapping[str, str]],
+    include_reset: bool = True
+) -> Optional[float]:
+    """
+    Get how long a provider asked us to wait before retrying.
+    
+    Honors Retry-After, retry-after-ms and the x-ratelimit-reset family
+    of headers. When several reset headers are present the longest wait wins.
+    
+    Args:
+        headers: Response headers
+        include_reset: Whether to fall back to x-ratelimit-reset headers
+            (only meaningful on rate-limited responses)
+    
+    Returns:
+        Seconds to wait, or None if the provider gave no hint
+    """
+    if not headers:
+        return None
+    
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+    
+    retry_after = headers.get("retry-after")
+    if retry_after:
+        parsed = _parse_reset_value(retry_after)
+        if parsed is not None:
+            return parsed
+    
+    if not include_reset:
+        return None
+    
+    waits = []
+    for name, value in headers.items():
+        name = name.lower()
+        if "ratelimit" in name and "reset" in name:
+            parsed = _parse_reset_value(value)
+            if parsed is not None:
+                waits.append(parsed)
+    return max(waits) if waits else None
+
+
+def _from_status(provider: str, status_code: int, message: str, headers=None) -> ProviderError:
+    """Map an HTTP status code to the matching error class."""
+    retry_after = parse_retry_after(headers, include_reset=status_code == 429)
+    if status_code == 429:
+        error_class = ProviderRateLimitError
+    elif status_code in (401, 403):
+        error_class = ProviderAuthError
+    elif status_code in (408, 409):
+        error_class = ProviderUnavailableError
+    elif status_code >= 500:
+        # Includes 529 "overloaded" from Anthropic
+        error_class = ProviderUnavailableError
+    else:
+        error_class = ProviderBadRequestError
+    return error_class(provider, message, status_code=status_code, retry_after=retry_after)
+
+
+def classify_error(provider: str, error: BaseException) -> ProviderError:
+    """
+    Translate an SDK or HTTP error into a typed ProviderError.
+    
+    Args:
+        provider: Name of the provider that raised the error
+        error: The original exception
+    
+    Returns:
+        The matching ProviderError (the original is returned unchanged
+        if it already is one)
+    """
+    if isinstance(error, ProviderError):
+        return error
+    
+    message = str(error) or error.__class__.__name__
+    
+    # Anthropic / OpenAI SDKs
+    if isinstance(error, (anthropic.APITimeoutError, openai.APITimeoutError)):
+        return ProviderTimeoutError(provider, message)
+    if isinstance(error, (anthropic.APIConnectionError, openai.APIConnectionError)):
+        return ProviderConnectionError(provider, message)
+    if isinstance(error, (anthropic.APIStatusError, openai.APIStatusError)):
+        return _from_status(provider, error.status_code, message, error.response.headers)
+    
+    # Raw httpx (Grok, Perplexity)
+    if isinstance(error, httpx.HTTPStatusError):
+        return _from_status(provider, error.response.status_code, message, error.response.headers)
+    if isinstance(error, httpx.TimeoutException):
+        return ProviderTimeoutError(provider, message)
+    if isinstance(error, httpx.TransportError):
+        return ProviderConnectionError(provider, message)
+    
+    # Google API core (Gemini)
+    if google_exceptions is not None:
+        if isinstance(error, google_exceptions.DeadlineExceeded):
+            return ProviderTimeoutError(provider, message)
+        if isinstance(error, google_exceptions.GoogleAPICallError) and error.code:
+            return _from_status(provider, int(error.code), message)
+    
+    if isinstance(error, asyncio.TimeoutError):
+        return ProviderTimeoutError(provider, message)
+    if isinstance(error, (KeyError, IndexError, TypeError, ValueError)):
+        return ProviderResponseError(provider, f"Unexpected response: {message}")
+    
+    return ProviderError(provider, message)
+
+
+def counts_toward_circuit_breaker(error: BaseException) -> bool:
+    """
+    Check whether a final (post-retry) failure should trip the circuit breaker.
+    
+    Rate limits and our own queue overflow mean the provider is busy, not
+    broken; they are handled by the concurrency limiter instead.
+    """
+    return not isinstance(error, (ProviderRateLimitError, ProviderOverloadedError))
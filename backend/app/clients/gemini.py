@@ -1,8 +1,14 @@
 import google.generativeai as genai
+from collections import OrderedDict
 from app.clients.base import BaseAIClient
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncGenerator, Any
+from app.clients.errors import classify_error
 from app.constants import GEMINI_MODEL
 
+# Maximum number of GenerativeModel instances cached per client.
+# RAG context makes system prompts vary per request, so the cache is bounded.
+MAX_CACHED_MODELS = 32
+
 
 class GeminiClient(BaseAIClient):
     """Client for Google's Gemini API"""
@@ -11,7 +17,63 @@ class GeminiClient(BaseAIClient):
         super().__init__(api_key)
         genai.configure(api_key=api_key)
         self.model_name = model
-        self.model = genai.GenerativeModel(model)
+        self._models: "OrderedDict[str, genai.GenerativeModel]" = OrderedDict()
+        self.model = self._get_model(None)
+    
+    def _get_model(self, system_prompt: Optional[str]) -> genai.GenerativeModel:
+        """
+        Get a GenerativeModel configured with the given system instruction.
+        
+        Models are cached per system prompt (LRU) so repeated turns reuse
+        the same instance instead of rebuilding it on every call.
+        """
+        key = system_prompt or ""
+        model = self._models.get(key)
+        if model is not None:
+            self._models.move_to_end(key)
+            return model
+        
+        model = genai.GenerativeModel(
+            self.model_name,
+            system_instruction=system_prompt or None
+        )
+        self._models[key] = model
+        if len(self._models) > MAX_CACHED_MODELS:
+            self._models.popitem(last=False)
+        return model
+    
+    def _build_contents(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None) -> List[Dict[str, Any]]:
+        """
+        Convert chat history into Gemini's structured contents format.
+        
+        Assistant turns map to the "model" role, system messages are dropped
+        (they are passed as system_instruction instead), and consecutive
+        turns from the same role are merged because Gemini expects roles
+        to alternate.
+        """
+        history = conversation_history or []
+        
+        # Skip the trailing user message if it is the current prompt (already saved to history)
+        if history and history[-1].get("role") == "user" and history[-1].get("content") == prompt:
+            history = history[:-1]
+        
+        contents: List[Dict[str, Any]] = []
+        for msg in history:
+            if msg.get("role") == "system":
+                continue
+            role = "model" if msg.get("role") == "assistant" else "user"
+            if contents and contents[-1]["role"] == role:
+                contents[-1]["parts"].append(msg["content"])
+            else:
+                contents.append({"role": role, "parts": [msg["content"]]})
+        
+        # Add current prompt
+        if contents and contents[-1]["role"] == "user":
+            contents[-1]["parts"].append(prompt)
+        else:
+            contents.append({"role": "user", "parts": [prompt]})
+        
+        return contents
     
     async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
         """
@@ -26,32 +88,37 @@ class GeminiClient(BaseAIClient):
             Gemini's response as a string
         """
         try:
-            # Build the full prompt with system prompt and history
-            prompt_parts = []
-            
-            # Add system prompt if provided (includes RAG context)
-            if system_prompt:
-                prompt_parts.append(f"System Instructions: {system_prompt}\n")
-            
-            # Add conversation history if provided
-            if conversation_history:
-                context = "\n\n".join([
-                    f"{msg['role'].capitalize()}: {msg['content']}" 
-                    for msg in conversation_history
-                ])
-                prompt_parts.append(context)
+            contents = self._build_contents(prompt, conversation_history)
             
-            # Add current prompt
-            prompt_parts.append(f"User: {prompt}\n\nAssistant:")
-            
-            full_prompt = "\n\n".join(prompt_parts)
-            
-            response = self.model.generate_content(full_prompt)
+            response = await self._get_model(system_prompt).generate_content_async(contents)
             return response.text
         
         except Exception as e:
-            raise Exception(f"Gemini API error: {str(e)}")
+            raise classify_error("gemini", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from Gemini as chunks arrive.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Text chunks from Gemini
+        """
+        try:
+            contents = self._build_contents(prompt, conversation_history)
+            
+            response = await self._get_model(system_prompt).generate_content_async(contents, stream=True)
+            async for chunk in response:
+                if chunk.parts:
+                    yield chunk.text
+        
+        except Exception as e:
+            raise classify_error("gemini", e) from e
     
     def get_model_name(self) -> str:
         """Return the Gemini model being used"""
-        return self.model_name
\ No newline at end of file
+        return self.model_name
@@ -1,6 +1,8 @@
-import httpx
 from app.clients.base import BaseAIClient
-from typing import List, Dict, Optional
+from app.clients.http_pool import http_pool
+from app.clients.sse import iter_chat_completion_deltas
+from app.clients.errors import classify_error
+from typing import List, Dict, Optional, AsyncGenerator, Any
 from app.constants import GROK_MODEL, GROK_API_URL
 
 
@@ -12,18 +14,8 @@ class GrokClient(BaseAIClient):
         self.model = model
         self.base_url = "https://api.x.ai/v1"
     
-    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
-        """
-        Generate a response from Grok.
-        
-        Args:
-            prompt: The user's input prompt
-            conversation_history: Previous messages in the conversation
-            system_prompt: Optional system prompt with RAG context
-        
-        Returns:
-            Grok's response as a string
-        """
+    def _build_payload(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat completion payload shared by regular and streaming calls"""
         messages = []
         
         # Add system prompt if provided (includes RAG context)
@@ -43,35 +35,78 @@ class GrokClient(BaseAIClient):
             "content": prompt
         })
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
+        return {
             "messages": messages,
             "model": self.model,
-            "stream": False,
+            "stream": stream,
             "temperature": 0.7
         }
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers including the API key"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate a response from Grok.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Returns:
+            Grok's response as a string
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt)
+        
+        try:
+            client = http_pool.get_client("grok")
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data["choices"][0]["message"]["content"]
+        
+        except Exception as e:
+            raise classify_error("grok", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from Grok by parsing its server-sent events.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Content deltas from Grok
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt, stream=True)
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
+            client = http_pool.get_client("grok")
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            ) as response:
                 response.raise_for_status()
-                
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
+                async for content in iter_chat_completion_deltas(response):
+                    yield content
         
-        except httpx.HTTPError as e:
-            raise Exception(f"Grok API error: {str(e)}")
         except Exception as e:
-            raise Exception(f"Grok client error: {str(e)}")
+            raise classify_error("grok", e) from e
     
     def get_model_name(self) -> str:
         """Return the Grok model being used"""
-        return self.model
\ No newline at end of file
+        return self.model
@@ -0,0 +1,114 @@
+"""
+Shared HTTP connection pools for providers that are called over raw HTTP.
+
+Grok and Perplexity expose OpenAI-compatible REST endpoints that we call
+with httpx directly. Opening a new AsyncClient per request means a new
+TCP + TLS handshake every time, so instead each provider gets one
+long-lived client (HTTP/2 when available, keep-alive enabled) that is
+opened in the application lifespan and closed on shutdown.
+"""
+
+import importlib.util
+from typing import Dict, Iterable, Optional
+
+import httpx
+
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def _http2_available() -> bool:
+    """HTTP/2 support in httpx requires the optional h2 package."""
+    return importlib.util.find_spec("h2") is not None
+
+
+class ProviderHTTPPool:
+    """
+    Process-wide registry of pooled httpx clients, one per provider.
+    """
+    
+    def __init__(
+        self,
+        http2: Optional[bool] = None,
+        max_connections: Optional[int] = None,
+        max_keepalive_connections: Optional[int] = None,
+        keepalive_expiry: Optional[float] = None,
+        pool_timeout: Optional[float] = None,
+        request_timeout: Optional[float] = None
+    ):
+        """
+        Initialize the pool registry.
+        
+        Args:
+            http2: Whether to negotiate HTTP/2 (defaults to settings)
+            max_connections: Maximum open connections per provider
+            max_keepalive_connections: Maximum idle connections kept alive per provider
+            keepalive_expiry: Seconds an idle connection is kept open
+            pool_timeout: Seconds a pending request may wait for a free connection
+            request_timeout: Connect/read/write timeout for each request
+        """
+        self.http2 = settings.HTTP_POOL_HTTP2 if http2 is None else http2
+        self.max_connections = max_connections or settings.HTTP_POOL_MAX_CONNECTIONS
+        self.max_keepalive_connections = (
+            max_keepalive_connections or settings.HTTP_POOL_MAX_KEEPALIVE
+        )
+        self.keepalive_expiry = keepalive_expiry or settings.HTTP_POOL_KEEPALIVE_EXPIRY
+        self.pool_timeout = pool_timeout or settings.HTTP_POOL_TIMEOUT
+        self.request_timeout = request_timeout or settings.HTTP_REQUEST_TIMEOUT
+        self._clients: Dict[str, httpx.AsyncClient] = {}
+    
+    def _build_client(self) -> httpx.AsyncClient:
+        """Create a new pooled client using the configured limits."""
+        http2 = self.http2
+        if http2 and not _http2_available():
+            logger.warning("h2 is not installed; provider HTTP pools will use HTTP/1.1")
+            http2 = False
+        
+        return httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry
+            ),
+            timeout=httpx.Timeout(self.request_timeout, pool=self.pool_timeout)
+        )
+    
+    def get_client(self, provider_name: str) -> httpx.AsyncClient:
+        """
+        Get the pooled client for a provider, creating it on first use.
+        
+        Args:
+            provider_name: Name of the provider
+        
+        Returns:
+            Shared httpx.AsyncClient for that provider
+        """
+        client = self._clients.get(provider_name)
+        if client is None or client.is_closed:
+            client = self._build_client()
+            self._clients[provider_name] = client
+        return client
+    
+    def open(self, provider_names: Iterable[str]) -> None:
+        """
+        Eagerly create pools for the given providers.
+        
+        Args:
+            provider_names: Providers to open pools for
+        """
+        for provider_name in provider_names:
+            self.get_client(provider_name)
+        logger.info(f"Opened HTTP pools for: {', '.join(sorted(self._clients))}")
+    
+    async def aclose(self) -> None:
+        """Close every pooled client and drop its connections."""
+        clients, self._clients = self._clients, {}
+        for client in clients.values():
+            await client.aclose()
+
+
+# Global pool registry instance
+http_pool = ProviderHTTPPool()
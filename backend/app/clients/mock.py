@@ -0,0 +1,114 @@
+from app.clients.base import BaseAIClient
+from app.clients.http_pool import http_pool
+from app.clients.sse import iter_chat_completion_deltas
+from app.clients.errors import classify_error
+from typing import List, Dict, Optional, AsyncGenerator, Any
+from app.config import settings
+from app.constants import MOCK_MODEL
+
+
+class MockLLMClient(BaseAIClient):
+    """
+    Client for the local mock LLM server (see app.mock_llm).
+    
+    Speaks the OpenAI chat completions protocol, so it exercises the same
+    pooled-HTTP and SSE code paths as the Grok and Perplexity clients.
+    """
+    
+    def __init__(self, api_key: str, model: str = MOCK_MODEL, base_url: Optional[str] = None):
+        super().__init__(api_key)
+        self.model = model
+        self.base_url = (base_url or settings.MOCK_LLM_BASE_URL).rstrip("/")
+    
+    def _build_payload(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat completion payload shared by regular and streaming calls"""
+        messages = []
+        
+        if system_prompt:
+            messages.append({
+                "role": "system",
+                "content": system_prompt
+            })
+        
+        if conversation_history:
+            messages.extend(conversation_history)
+        
+        messages.append({
+            "role": "user",
+            "content": prompt
+        })
+        
+        return {
+            "messages": messages,
+            "model": self.model,
+            "stream": stream
+        }
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers including the API key"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate a response from the mock server.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Returns:
+            The mock response as a string
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt)
+        
+        try:
+            client = http_pool.get_client("mock")
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            )
+            response.raise_for_status()
+            
+            data = response.json()
+            return data["choices"][0]["message"]["content"]
+        
+        except Exception as e:
+            raise classify_error("mock", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from the mock server.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Content deltas from the mock server
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt, stream=True)
+        
+        try:
+            client = http_pool.get_client("mock")
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            ) as response:
+                response.raise_for_status()
+                async for content in iter_chat_completion_deltas(response):
+                    yield content
+        
+        except Exception as e:
+            raise classify_error("mock", e) from e
+    
+    def get_model_name(self) -> str:
+        """Return the mock model name"""
+        return self.model
@@ -1,6 +1,8 @@
-from openai import OpenAI
+from openai import AsyncOpenAI
 from app.clients.base import BaseAIClient
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, AsyncGenerator
+from app.clients.errors import classify_error
+from app.clients.prompt_cache import prompt_cache_stats, split_system_prompt
 from app.constants import OPENAI_MODEL
 
 
@@ -9,52 +11,116 @@ class OpenAIClient(BaseAIClient):
     
     def __init__(self, api_key: str, model: str = OPENAI_MODEL):
         super().__init__(api_key)
-        self.client = OpenAI(api_key=api_key)
+        # Retries are handled by the shared policy in app.clients.retry
+        self.client = AsyncOpenAI(api_key=api_key, max_retries=0)
         self.model = model
     
-    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
+    def _build_messages(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> List[Dict[str, str]]:
         """
-        Generate a response from ChatGPT.
-        
-        Args:
-            prompt: The user's input prompt
-            conversation_history: Previous messages in the conversation
-            system_prompt: Optional system prompt with RAG context
+        Build the chat message list shared by regular and streaming calls.
         
-        Returns:
-            ChatGPT's response as a string
+        OpenAI caches repeated prompt prefixes automatically, so the parts
+        that stay the same across turns come first: system instructions,
+        then history. The request's RAG context follows as its own system
+        message, just before the current prompt.
         """
+        instructions, rag_context = split_system_prompt(system_prompt)
         messages = []
         
-        # Add system prompt if provided (includes RAG context)
-        if system_prompt:
+        # Add system instructions if provided
+        if instructions:
             messages.append({
                 "role": "system",
-                "content": system_prompt
+                "content": instructions
             })
         
         # Add conversation history if provided
         if conversation_history:
             messages.extend(conversation_history)
         
+        # Add RAG context for this prompt
+        if rag_context:
+            messages.append({
+                "role": "system",
+                "content": rag_context
+            })
+        
         # Add the current prompt
         messages.append({
             "role": "user",
             "content": prompt
         })
         
+        return messages
+    
+    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate a response from ChatGPT.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Returns:
+            ChatGPT's response as a string
+        
+        Prompt token usage, including cached tokens, is reported to
+        prompt_cache_stats.
+        """
+        messages = self._build_messages(prompt, conversation_history, system_prompt)
+        
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=self.model,
                 messages=messages,
                 max_tokens=4096
             )
+            prompt_cache_stats.record_openai("chatgpt", response.usage)
             
             return response.choices[0].message.content
         
         except Exception as e:
-            raise Exception(f"OpenAI API error: {str(e)}")
+            raise classify_error("chatgpt", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from ChatGPT as tokens arrive.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Content deltas from ChatGPT
+        """
+        messages = self._build_messages(prompt, conversation_history, system_prompt)
+        
+        try:
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                max_tokens=4096,
+                stream=True,
+                # Ask for a final usage chunk so cached tokens can be reported
+                extra_body={"stream_options": {"include_usage": True}}
+            )
+            
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+                usage = getattr(chunk, "usage", None)
+                if usage:
+                    prompt_cache_stats.record_openai("chatgpt", usage)
+        
+        except Exception as e:
+            raise classify_error("chatgpt", e) from e
+    
+    async def aclose(self) -> None:
+        """Close the underlying SDK HTTP client"""
+        await self.client.close()
     
     def get_model_name(self) -> str:
         """Return the OpenAI model being used"""
-        return self.model
\ No newline at end of file
+        return self.model
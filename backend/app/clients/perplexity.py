@@ -1,7 +1,12 @@
-import httpx
 from app.clients.base import BaseAIClient
-from typing import List, Dict, Optional
+from app.clients.http_pool import http_pool
+from app.clients.sse import iter_chat_completion_deltas
+from app.clients.errors import classify_error
+from typing import List, Dict, Optional, AsyncGenerator, Any
 from app.constants import PERPLEXITY_MODEL, PERPLEXITY_API_URL
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
 
 
 class PerplexityClient(BaseAIClient):
@@ -12,18 +17,8 @@ class PerplexityClient(BaseAIClient):
         self.model = model
         self.base_url = "https://api.perplexity.ai"
     
-    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
-        """
-        Generate a response from Perplexity.
-        
-        Args:
-            prompt: The user's input prompt
-            conversation_history: Previous messages in the conversation
-            system_prompt: Optional system prompt with RAG context
-        
-        Returns:
-            Perplexity's response as a string
-        """
+    def _build_payload(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None, stream: bool = False) -> Dict[str, Any]:
+        """Build the chat completion payload shared by regular and streaming calls"""
         messages = []
         
         # Add system prompt (includes RAG context if provided)
@@ -58,43 +53,88 @@ class PerplexityClient(BaseAIClient):
             "content": prompt
         })
         
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
         payload = {
             "model": self.model,
             "messages": messages,
             "temperature": 0.2,  # Perplexity default
             "top_p": 0.9
         }
+        if stream:
+            payload["stream"] = True
+        
+        return payload
+    
+    def _headers(self) -> Dict[str, str]:
+        """Request headers including the API key"""
+        return {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+    
+    async def generate_response(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> str:
+        """
+        Generate a response from Perplexity.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Returns:
+            Perplexity's response as a string
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt)
+        
+        try:
+            client = http_pool.get_client("perplexity")
+            response = await client.post(
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            )
+            
+            # Log the response for debugging (the payload holds user content: debug only)
+            if response.status_code != 200:
+                logger.warning(f"Perplexity API error: status {response.status_code}: {response.text}")
+                logger.debug("Perplexity request payload: %s", payload)
+            
+            response.raise_for_status()
+            
+            data = response.json()
+            return data["choices"][0]["message"]["content"]
+        
+        except Exception as e:
+            raise classify_error("perplexity", e) from e
+    
+    async def generate_stream(self, prompt: str, conversation_history: Optional[List[Dict[str, str]]] = None, system_prompt: Optional[str] = None) -> AsyncGenerator[str, None]:
+        """
+        Stream a response from Perplexity by parsing its server-sent events.
+        
+        Args:
+            prompt: The user's input prompt
+            conversation_history: Previous messages in the conversation
+            system_prompt: Optional system prompt with RAG context
+        
+        Yields:
+            Content deltas from Perplexity
+        """
+        payload = self._build_payload(prompt, conversation_history, system_prompt, stream=True)
         
         try:
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers=headers,
-                    json=payload
-                )
-                
-                # Log the response for debugging
-                if response.status_code != 200:
-                    error_detail = response.text
-                    print(f"Perplexity API Error: Status {response.status_code}")
-                    print(f"Response: {error_detail}")
-                    print(f"Request payload: {payload}")
-                
+            client = http_pool.get_client("perplexity")
+            async with client.stream(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                headers=self._headers(),
+                json=payload
+            ) as response:
                 response.raise_for_status()
-                
-                data = response.json()
-                return data["choices"][0]["message"]["content"]
+                async for content in iter_chat_completion_deltas(response):
+                    yield content
         
-        except httpx.HTTPError as e:
-            raise Exception(f"Perplexity API error: {str(e)}")
         except Exception as e:
-            raise Exception(f"Perplexity client error: {str(e)}")
+            raise classify_error("perplexity", e) from e
     
     def get_model_name(self) -> str:
         """Return the Perplexity model being used"""
-        return self.model
\ No newline at end of file
+        return self.model
@@ -0,0 +1,131 @@
+"""
+Prompt caching support shared by the provider clients.
+
+System prompts are built as stable instructions followed by the
+request's RAG context (see system_prompt_service.format_system_prompt).
+Clients send the instructions first, then the conversation history, and
+the RAG context just before the current prompt, so the longest possible
+prefix repeats from one turn to the next:
+
+- Anthropic caches up to explicit cache_control breakpoints
+- OpenAI caches repeated prefixes automatically
+
+Clients report the cached-token counts the providers return to
+prompt_cache_stats.
+"""
+
+from typing import Any, Dict, Optional, Tuple
+
+from app.constants import RAG_CONTEXT_HEADER
+
+# Anthropic cache breakpoint marker
+EPHEMERAL_CACHE = {"type": "ephemeral"}
+
+
+def split_system_prompt(system_prompt: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Split a system prompt into its stable instructions and its RAG context.
+    
+    Args:
+        system_prompt: System prompt, possibly ending with a RAG context section
+    
+    Returns:
+        Tuple of (instructions, RAG context section); either may be None
+    """
+    if not system_prompt:
+        return None, None
+    index = system_prompt.find(RAG_CONTEXT_HEADER)
+    if index == -1:
+        return system_prompt, None
+    return system_prompt[:index].rstrip() or None, system_prompt[index:]
+
+
+def _field(obj: Any, name: str) -> Any:
+    """Read a field from an SDK object or a plain dict (SDKs keep unknown fields as dicts)."""
+    if obj is None:
+        return None
+    if isinstance(obj, dict):
+        return obj.get(name)
+    return getattr(obj, name, None)
+
+
+class PromptCacheStats:
+    """
+    Per-provider totals of prompt tokens and how many were served from cache.
+    """
+    
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+    
+    def record(
+        self,
+        provider: str,
+        input_tokens: int,
+        cached_tokens: int,
+        cache_write_tokens: int = 0
+    ) -> None:
+        """
+        Record one call's prompt token usage.
+        
+        Args:
+            provider: Provider name
+            input_tokens: All prompt tokens, cached or not
+            cached_tokens: Prompt tokens read from the provider's cache
+            cache_write_tokens: Prompt tokens written to the cache (Anthropic)
+        """
+        stats = self._stats.setdefault(provider, {
+            "requests": 0,
+            "input_tokens": 0,
+            "cached_tokens": 0,
+            "cache_write_tokens": 0
+        })
+        stats["requests"] += 1
+        stats["input_tokens"] += input_tokens
+        stats["cached_tokens"] += cached_tokens
+        stats["cache_write_tokens"] += cache_write_tokens
+    
+    def record_anthropic(self, provider: str, usage: Any) -> None:
+        """
+        Record usage from an Anthropic Messages API response.
+        
+        input_tokens excludes tokens read from or written to the cache,
+        so the three are added up for the prompt total.
+        """
+        if usage is None:
+            return
+        cached = _field(usage, "cache_read_input_tokens") or 0
+        written = _field(usage, "cache_creation_input_tokens") or 0
+        uncached = _field(usage, "input_tokens") or 0
+        self.record(provider, uncached + cached + written, cached, written)
+    
+    def record_openai(self, provider: str, usage: Any) -> None:
+        """Record usage from an OpenAI chat completion (or its final stream chunk)."""
+        if usage is None:
+            return
+        cached = _field(_field(usage, "prompt_tokens_details"), "cached_tokens") or 0
+        self.record(provider, _field(usage, "prompt_tokens") or 0, cached)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get totals per provider.
+        
+        Returns:
+            Dictionary mapping provider names to token totals and cache hit ratio
+        """
+        return {
+            provider: {
+                **stats,
+                "cache_hit_ratio": (
+                    stats["cached_tokens"] / stats["input_tokens"] if stats["input_tokens"] else 0.0
+                )
+            }
+            for provider, stats in self._stats.items()
+        }
+    
+    def reset(self) -> None:
+        """Clear all totals."""
+        self._stats.clear()
+
+
+# Global prompt cache statistics instance
+prompt_cache_stats = PromptCacheStats()
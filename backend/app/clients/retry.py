@@ -0,0 +1,178 @@
+"""
+Shared retry policy for AI provider calls.
+
+Retries only errors marked retryable (see app.clients.errors), using
+exponential backoff with full jitter. A Retry-After hint from the
+provider takes precedence over the computed backoff, and no retry is
+attempted if it would overrun the caller's deadline.
+"""
+
+import asyncio
+import random
+import time
+from typing import Any, AsyncGenerator, Callable, Optional
+
+from app.clients.errors import ProviderError, classify_error
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter for retryable provider errors.
+    """
+    
+    def __init__(
+        self,
+        max_attempts: Optional[int] = None,
+        base_delay: Optional[float] = None,
+        max_delay: Optional[float] = None,
+        max_retry_after: Optional[float] = None
+    ):
+        """
+        Initialize retry policy.
+        
+        Args:
+            max_attempts: Total attempts including the first call
+            base_delay: Backoff base in seconds
+            max_delay: Cap on the computed backoff in seconds
+            max_retry_after: Longest provider-requested wait we will honor;
+                longer waits fail immediately instead
+        """
+        self.max_attempts = max_attempts or settings.RETRY_MAX_ATTEMPTS
+        self.base_delay = settings.RETRY_BASE_DELAY if base_delay is None else base_delay
+        self.max_delay = settings.RETRY_MAX_DELAY if max_delay is None else max_delay
+        self.max_retry_after = max_retry_after or settings.RETRY_MAX_RETRY_AFTER
+    
+    def backoff(self, attempt: int) -> float:
+        """
+        Full-jitter backoff for a retry.
+        
+        Args:
+            attempt: Zero-based index of the attempt that just failed
+        
+        Returns:
+            Delay in seconds, uniformly drawn from [0, min(max_delay, base * 2^attempt)]
+        """
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+    
+    def get_delay(
+        self,
+        error: ProviderError,
+        attempt: int,
+        deadline: Optional[float] = None
+    ) -> Optional[float]:
+        """
+        Decide whether to retry and how long to wait first.
+        
+        Args:
+            error: The typed error from the failed attempt
+            attempt: Zero-based index of the attempt that just failed
+            deadline: time.monotonic() value the whole request must finish by
+        
+        Returns:
+            Seconds to wait before retrying, or None to give up
+        """
+        if not error.retryable or attempt + 1 >= self.max_attempts:
+            return None
+        
+        if error.retry_after is not None:
+            if error.retry_after > self.max_retry_after:
+                return None
+            delay = error.retry_after
+        else:
+            delay = self.backoff(attempt)
+        
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        return delay
+    
+    async def call(
+        self,
+        provider_name: str,
+        func: Callable,
+        *args,
+        deadline: Optional[float] = None,
+        **kwargs
+    ) -> Any:
+        """
+        Call an async function, retrying retryable provider errors.
+        
+        Args:
+            provider_name: Name of the provider being called
+            func: Async function to call
+            *args: Positional arguments for func
+            deadline: time.monotonic() value the whole request must finish by
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            Result of func
+        
+        Raises:
+            ProviderError: The last error once retries are exhausted
+        """
+        attempt = 0
+        while True:
+            try:
+                return await func(*args, **kwargs)
+            except Exception as e:
+                error = classify_error(provider_name, e)
+                delay = self.get_delay(error, attempt, deadline)
+                if delay is None:
+                    if error is e:
+                        raise
+                    raise error from e
+                logger.warning(
+                    f"Retrying {provider_name} after {type(error).__name__} "
+                    f"(attempt {attempt + 1}/{self.max_attempts}, waiting {delay:.2f}s)"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+    
+    async def stream(
+        self,
+        provider_name: str,
+        stream_factory: Callable[[], AsyncGenerator[str, None]],
+        deadline: Optional[float] = None
+    ) -> AsyncGenerator[str, None]:
+        """
+        Iterate a provider stream, retrying only if it fails before the first chunk.
+        
+        Once any chunk has been yielded a retry would duplicate output, so
+        later errors are raised as-is.
+        
+        Args:
+            provider_name: Name of the provider being called
+            stream_factory: Callable that starts a new stream
+            deadline: time.monotonic() value the whole request must finish by
+        
+        Yields:
+            Chunks from the provider stream
+        """
+        attempt = 0
+        while True:
+            started = False
+            try:
+                async for chunk in stream_factory():
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                error = classify_error(provider_name, e)
+                delay = None if started else self.get_delay(error, attempt, deadline)
+                if delay is None:
+                    if error is e:
+                        raise
+                    raise error from e
+                logger.warning(
+                    f"Retrying {provider_name} stream after {type(error).__name__} "
+                    f"(attempt {attempt + 1}/{self.max_attempts}, waiting {delay:.2f}s)"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+
+# Global retry policy instance
+retry_policy = RetryPolicy()
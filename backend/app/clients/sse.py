@@ -0,0 +1,66 @@
+"""
+Server-sent event parsing for OpenAI-compatible streaming endpoints.
+"""
+
+import json
+from typing import AsyncGenerator, List
+
+import httpx
+
+
+async def iter_sse_data(response: httpx.Response) -> AsyncGenerator[str, None]:
+    """
+    Yield the data payload of each server-sent event in a streaming response.
+    
+    Multi-line data fields are joined with newlines, comment lines are
+    skipped, and the OpenAI-style "[DONE]" sentinel ends the stream.
+    
+    Args:
+        response: Streaming httpx response
+    
+    Yields:
+        The data payload of each event
+    """
+    data_lines: List[str] = []
+    
+    async for line in response.aiter_lines():
+        if not line:
+            # Blank line dispatches the pending event
+            if data_lines:
+                data = "\n".join(data_lines)
+                data_lines = []
+                if data == "[DONE]":
+                    return
+                yield data
+            continue
+        
+        if line.startswith(":"):
+            continue
+        
+        if line.startswith("data:"):
+            data_lines.append(line[5:].lstrip(" "))
+    
+    if data_lines:
+        data = "\n".join(data_lines)
+        if data != "[DONE]":
+            yield data
+
+
+async def iter_chat_completion_deltas(response: httpx.Response) -> AsyncGenerator[str, None]:
+    """
+    Yield content deltas from an OpenAI-compatible chat completion stream.
+    
+    Args:
+        response: Streaming httpx response
+    
+    Yields:
+        Non-empty content deltas
+    """
+    async for data in iter_sse_data(response):
+        chunk = json.loads(data)
+        choices = chunk.get("choices") or []
+        if not choices:
+            continue
+        content = (choices[0].get("delta") or {}).get("content")
+        if content:
+            yield content
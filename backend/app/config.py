@@ -9,13 +9,24 @@ class Settings(BaseSettings):
     
     # Cache
     REDIS_URL: str = "redis://localhost:6379/0"
+    CACHE_INVALIDATION_ENABLED: bool = True  # Broadcast cache invalidations to other workers via Redis
+    CACHE_INVALIDATION_CHANNEL: str = "cache-invalidation"
+    SYSTEM_PROMPT_CACHE_TTL: float = 300.0  # Upper bound on staleness if an invalidation is missed
+    HISTORY_CACHE_MAX_CONVERSATIONS: int = 1000  # Compiled histories kept in process per worker
+    HISTORY_CACHE_TTL: float = 600.0  # Upper bound on staleness if an invalidation is missed
+    HISTORY_CACHE_REDIS_ENABLED: bool = False  # Share compiled histories between workers via Redis
+    HISTORY_CACHE_PEERS: bool = False  # Other workers or replicas serve the same conversations; broadcast history appends to them
     
-    # API Keys
-    ANTHROPIC_API_KEY: str
-    OPENAI_API_KEY: str
-    GOOGLE_API_KEY: str
-    XAI_API_KEY: str
-    PERPLEXITY_API_KEY: str
+    # API Keys (providers without a key are skipped)
+    ANTHROPIC_API_KEY: str = ""
+    OPENAI_API_KEY: str = ""
+    GOOGLE_API_KEY: str = ""
+    XAI_API_KEY: str = ""
+    PERPLEXITY_API_KEY: str = ""
+    
+    # Local mock provider for load testing (any key enables it; see app.mock_llm)
+    MOCK_LLM_API_KEY: str = ""
+    MOCK_LLM_BASE_URL: str = "http://127.0.0.1:8100/v1"
     
     # Application
     ENVIRONMENT: str = "development"
@@ -23,6 +34,10 @@ class Settings(BaseSettings):
     API_V1_PREFIX: str = "/api/v1"
     PROJECT_NAME: str = "Multi-Model Chat Client"
     
+    # Logging (DEBUG level when DEBUG is on; debug records are sampled per request)
+    LOG_JSON: bool = True
+    LOG_DEBUG_SAMPLE_RATE: float = 0.1
+    
     # CORS
     CORS_ORIGINS: str = '["http://localhost:5173", "http://localhost:3000"]'
     
@@ -33,11 +48,73 @@ class Settings(BaseSettings):
     # Rate Limiting
     RATE_LIMIT_PER_MINUTE: int = 60
     
+    # Provider HTTP connection pools (Grok, Perplexity)
+    HTTP_POOL_HTTP2: bool = True
+    HTTP_POOL_MAX_CONNECTIONS: int = 100
+    HTTP_POOL_MAX_KEEPALIVE: int = 20
+    HTTP_POOL_KEEPALIVE_EXPIRY: float = 30.0
+    HTTP_POOL_TIMEOUT: float = 10.0  # Max seconds a pending request waits for a connection
+    HTTP_REQUEST_TIMEOUT: float = 60.0
+    
+    # Hedged requests
+    HEDGE_PROVIDERS: str = '[]'  # JSON list of providers to hedge, e.g. '["grok", "perplexity"]'
+    HEDGE_PERCENTILE: float = 95.0  # Hedge once a call is slower than this latency percentile
+    HEDGE_BUDGET_PERCENT: float = 5.0  # Maximum extra traffic spent on hedges
+    HEDGE_MIN_SAMPLES: int = 20  # Latency samples required before hedging a provider
+    
+    # Adaptive per-provider concurrency limits (AIMD)
+    LIMITER_INITIAL_LIMIT: int = 10
+    LIMITER_MIN_LIMIT: int = 1
+    LIMITER_MAX_LIMIT: int = 50
+    LIMITER_MAX_QUEUE: int = 100  # Calls allowed to wait for a slot before rejecting
+    LIMITER_BACKOFF_RATIO: float = 0.5  # Limit multiplier on a 429
+    LIMITER_LATENCY_TOLERANCE: float = 3.0  # Trim limit when latency exceeds this multiple of normal (0 disables)
+    
+    # Retries for transient provider errors (429, 5xx, timeouts)
+    RETRY_MAX_ATTEMPTS: int = 3  # Total attempts including the first call
+    RETRY_BASE_DELAY: float = 0.5  # Seconds; backoff is uniform in [0, base * 2^attempt]
+    RETRY_MAX_DELAY: float = 8.0
+    RETRY_MAX_RETRY_AFTER: float = 30.0  # Give up instead of honoring longer Retry-After waits
+    
+    # Rolling compaction of long conversations (see app.services.compaction_service)
+    COMPACTION_ENABLED: bool = True
+    COMPACTION_THRESHOLD: int = 18  # History messages past the summary before older turns are summarized; at most MAX_CONVERSATION_HISTORY - 2
+    COMPACTION_KEEP_RECENT: int = 8  # Newest history messages kept verbatim
+    COMPACTION_SUMMARY_TOKENS: int = 400
+    COMPACTION_SUMMARIZER: str = "extractive"  # Or "module:factory" for a custom summarizer
+    
+    # Write-behind persistence of assistant responses (see app.services.message_writer)
+    WRITE_BEHIND_ENABLED: bool = True
+    WRITE_BEHIND_BATCH_SIZE: int = 100  # Rows per multi-row insert; a full batch is flushed at once
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.05  # Seconds a row may wait for its batch to fill
+    WRITE_BEHIND_MAX_PENDING: int = 10000  # Past this, callers wait for a flush (backpressure)
+    WRITE_BEHIND_RETRY_DELAY: float = 1.0  # Seconds between attempts after a failed flush
+    WRITE_BEHIND_DRAIN_TIMEOUT: float = 10.0  # Seconds allowed to flush what is left on shutdown
+    
+    # End-to-end time budget for a chat request (overridable per request)
+    CHAT_TIMEOUT_SECONDS: float = 60.0
+    
+    # Provider prompt caching (Anthropic cache_control breakpoints)
+    PROMPT_CACHING_ENABLED: bool = True
+    
+    # Share one upstream call between identical concurrent requests
+    SINGLE_FLIGHT_ENABLED: bool = True
+    
+    # WebSocket streaming: coalesce each model's chunks into at most one frame per window
+    STREAM_COALESCE_WINDOW: float = 0.03  # Seconds; 0 sends every chunk as its own frame
+    STREAM_COALESCE_MAX_BYTES: int = 4096  # Buffered bytes that are sent before the window ends
+    STREAM_MAX_CONCURRENT_REQUESTS: int = 4  # Prompts a connection may run or queue at once
+    
     @property
     def cors_origins_list(self) -> List[str]:
         """Parse CORS origins from JSON string to list"""
         return json.loads(self.CORS_ORIGINS)
     
+    @property
+    def hedge_providers_list(self) -> List[str]:
+        """Parse hedged providers from JSON string to list"""
+        return json.loads(self.HEDGE_PROVIDERS)
+    
     class Config:
         env_file = ".env"
         env_file_encoding = "utf-8"
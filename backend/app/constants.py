@@ -8,6 +8,7 @@ OPENAI_MODEL = "gpt-4o"
 GEMINI_MODEL = "gemini-2.5-flash"
 GROK_MODEL = "grok-4-fast-reasoning"
 PERPLEXITY_MODEL = "sonar"
+MOCK_MODEL = "mock-llm"
 
 # Model display names
 MODEL_DISPLAY_NAMES = {
@@ -15,7 +16,8 @@ MODEL_DISPLAY_NAMES = {
     "chatgpt": "ChatGPT",
     "gemini": "Gemini",
     "grok": "Grok",
-    "perplexity": "Perplexity"
+    "perplexity": "Perplexity",
+    "mock": "Mock LLM"
 }
 
 # Model token limits
@@ -25,7 +27,14 @@ MODEL_TOKEN_LIMITS = {
     "gemini": 32768,       # Gemini Pro
     "grok": 8192,          # Grok (estimated)
     "perplexity": 4096,    # Perplexity (estimated)
+    "mock": 8192,          # Local mock server
 }
+RESPONSE_TOKEN_RESERVE = 1024  # Context left free for the model's answer when windowing history
+MESSAGE_TOKEN_OVERHEAD = 4     # Per-message role and formatting tokens
+
+# Starts the RAG section at the end of a system prompt; everything before it
+# is the same on every request and can be served from provider prompt caches
+RAG_CONTEXT_HEADER = "RELEVANT CONTEXT FROM KNOWLEDGE BASE:"
 
 # API endpoints
 ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
@@ -38,6 +47,7 @@ PERPLEXITY_API_URL = "https://api.perplexity.ai/chat/completions"
 ERROR_MESSAGES = {
     "invalid_request": "Invalid request format",
     "model_unavailable": "{model} is temporarily unavailable",
+    "model_not_configured": "{model} is not configured (missing API key)",
     "rate_limit": "Rate limit exceeded. Please try again later",
     "api_error": "API error: {error}",
     "network_error": "Network error. Please check your connection",
@@ -47,12 +57,55 @@ ERROR_MESSAGES = {
     "prompt_too_long": "Prompt too long: approximately {tokens} tokens (maximum {max_tokens} tokens allowed)",
     "conversation_not_found": "Conversation not found",
     "database_error": "Database error occurred",
-    "circuit_breaker_open": "{provider} is temporarily unavailable due to repeated failures"
+    "model_timed_out": "{model} did not respond within the time limit",
+    "provider_overloaded": "{provider} is handling too many requests. Please try again shortly",
+    "circuit_breaker_open": "{provider} is temporarily unavailable due to repeated failures",
+    "too_many_stream_requests": "Too many requests in progress on this connection (maximum {limit})",
+    "duplicate_request_id": "Request {request_id} is already in progress",
+    "invalid_request_id": "request_id must be a string or an integer",
+    "model_cancelled": "{model} was cancelled",
+    "request_not_found": "No request {request_id} is in progress"
+}
+
+# Binary WebSocket stream protocol (see app.utils.stream_codec). Codes are
+# part of the wire format: append new ones, never renumber
+STREAM_MSGPACK_SUBPROTOCOL = "chat.msgpack.v1"
+STREAM_EVENT_CODES = {
+    "conversation_info": 1,
+    "model_start": 2,
+    "model_thinking": 3,
+    "model_chunk": 4,
+    "model_complete": 5,
+    "model_error": 6,
+    "model_timed_out": 7,
+    "all_complete": 8,
+    "error": 9,
+    "model_cancelled": 10,
+    "cancel": 11,
+}
+STREAM_PROVIDER_CODES = {
+    "claude": 1,
+    "chatgpt": 2,
+    "gemini": 3,
+    "grok": 4,
+    "perplexity": 5,
+    "mock": 6,
+}
+STREAM_FIELD_KEYS = {
+    "type": "t",
+    "provider": "p",
+    "content": "c",
+    "error": "e",
+    "latency_ms": "l",
+    "timestamp": "ts",
+    "conversation_id": "cid",
+    "request_id": "r",
 }
 
 # Response timeouts (seconds)
 DEFAULT_TIMEOUT = 30
 STREAMING_TIMEOUT = 120
+MAX_CHAT_TIMEOUT_SECONDS = 600  # Longest time budget a chat request may ask for
 
 # Cache settings
 CACHE_TTL_HOURS = 24
@@ -64,6 +117,6 @@ DB_MAX_OVERFLOW = 10
 DB_POOL_RECYCLE = 3600  # 1 hour
 
 # Conversation settings
-MAX_CONVERSATION_HISTORY = 20  # Maximum messages to load for context
+MAX_CONVERSATION_HISTORY = 20  # Maximum history messages sent to a model
 MAX_PROMPT_LENGTH = 10000  # Maximum characters in a prompt
 MIN_PROMPT_LENGTH = 1      # Minimum characters in a prompt
@@ -2,23 +2,44 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.config import settings
 from app.database import init_db
+from app.clients.http_pool import http_pool
+from app.api.deps import client_registry
+from app.utils.invalidation import invalidation_bus
+from app.services.history_service import history_cache
+from app.services.compaction_service import conversation_compactor
+from app.services.message_writer import message_writer
 from app.api.v1.router import api_router
-from app.utils.logging import setup_logging, get_logger
+from app.utils.logging import setup_logging, get_logger, RequestContextMiddleware
 from contextlib import asynccontextmanager
 
 
 # Configure structured logging
-setup_logging(level="INFO" if not settings.DEBUG else "DEBUG")
+setup_logging(
+    level="INFO" if not settings.DEBUG else "DEBUG",
+    json_logs=settings.LOG_JSON,
+    debug_sample_rate=settings.LOG_DEBUG_SAMPLE_RATE
+)
 logger = get_logger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    """Initialize database on startup"""
+    """Initialize database, provider HTTP pools and cache invalidation on startup; close them on shutdown"""
     await init_db()
+    http_pool.open(["grok", "perplexity"])
+    await invalidation_bus.start()
+    message_writer.start()
     logger.info(f"{settings.PROJECT_NAME} started successfully!")
     logger.info(f"Docs available at: http://{settings.HOST}:{settings.PORT}{settings.API_V1_PREFIX}/docs")
     yield
+    # Drain queued messages first; flushing may schedule compaction
+    await message_writer.stop()
+    await conversation_compactor.stop()
+    # Before the bus stops, so the last history updates are still published
+    await history_cache.aclose()
+    await invalidation_bus.stop()
+    await client_registry.aclose()
+    await http_pool.aclose()
 
 # Create FastAPI application
 app = FastAPI(
@@ -35,8 +56,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID"],
 )
 
+# Request ID and logging context for every request (outermost, so it covers CORS too)
+app.add_middleware(RequestContextMiddleware)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -0,0 +1,7 @@
+"""
+Local mock LLM provider for load and latency testing.
+"""
+
+from app.mock_llm.server import MockLLMConfig, create_app
+
+__all__ = ["MockLLMConfig", "create_app"]
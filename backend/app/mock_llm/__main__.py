@@ -0,0 +1,47 @@
+"""
+Run the mock LLM provider.
+
+    python -m app.mock_llm --port 8100 --ttft 0.3 --tokens-per-second 50 \
+        --error-rate 0.01 --rate-limit-rate 0.05
+
+Then set MOCK_LLM_API_KEY (any value) and MOCK_LLM_BASE_URL for the API
+so the "mock" provider joins the registry.
+"""
+
+import argparse
+
+import uvicorn
+
+from app.mock_llm.server import MockLLMConfig, create_app
+
+
+def main() -> None:
+    defaults = MockLLMConfig()
+    parser = argparse.ArgumentParser(description="Mock OpenAI/Anthropic-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--ttft", type=float, default=defaults.ttft, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=defaults.tokens_per_second)
+    parser.add_argument("--response-tokens", type=int, default=defaults.response_tokens)
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Fraction of 5xx responses")
+    parser.add_argument("--error-status", type=int, default=defaults.error_status)
+    parser.add_argument("--rate-limit-rate", type=float, default=defaults.rate_limit_rate, help="Fraction of 429 responses")
+    parser.add_argument("--retry-after", type=float, default=defaults.retry_after)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+    
+    config = MockLLMConfig(
+        ttft=args.ttft,
+        tokens_per_second=args.tokens_per_second,
+        response_tokens=args.response_tokens,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,375 @@
+"""
+Local stand-in for the OpenAI and Anthropic chat APIs.
+
+Serves /v1/chat/completions (OpenAI) and /v1/messages (Anthropic), both
+regular and streaming, with configurable time-to-first-token, token rate
+and fault injection. Prompt caching is emulated so cached-token reporting
+can be exercised: repeated message prefixes (OpenAI) and prefixes ending
+at a cache_control breakpoint (Anthropic) are reported as cached. Responses are generated locally, so load tests of the
+chat orchestration layer cost nothing and need no network.
+"""
+
+import asyncio
+import hashlib
+import json
+import random
+import time
+import uuid
+from typing import Any, AsyncGenerator, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+
+VOCABULARY = (
+    "the model response is generated locally for load testing so every token "
+    "costs nothing and arrives at a configurable rate while the chat service "
+    "orchestrates providers streams chunks and stores the final answer"
+).split()
+
+
+class MockLLMConfig(BaseModel):
+    """Behaviour of the mock provider"""
+    
+    ttft: float = 0.3  # Seconds before the first token
+    tokens_per_second: float = 50.0  # 0 sends all tokens at once
+    response_tokens: int = 64  # Tokens per response (capped by max_tokens)
+    error_rate: float = 0.0  # Fraction of requests answered with a 5xx error
+    error_status: int = 503
+    rate_limit_rate: float = 0.0  # Fraction of requests answered with 429
+    retry_after: float = 1.0  # Retry-After sent with injected 429s
+    seed: Optional[int] = None  # Seed for fault injection (None = random)
+    prompt_caching: bool = True  # Report repeated prompt prefixes as cached tokens
+
+
+class _Stats:
+    """Counters exposed on /mock/stats"""
+    
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.rate_limited = 0
+        self.errors = 0
+    
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self.__dict__)
+
+
+class _PromptCache:
+    """Remembers prompt prefixes to emulate provider prompt caching."""
+    
+    def __init__(self):
+        self.prefixes = set()
+    
+    @staticmethod
+    def _blocks(content: Any) -> List[Dict[str, Any]]:
+        if isinstance(content, list):
+            return [block for block in content if isinstance(block, dict)]
+        return [{"text": str(content or "")}]
+    
+    def openai(self, messages: List[Dict[str, Any]]) -> int:
+        """Cache every message prefix; return the tokens of the longest one seen before."""
+        digest = hashlib.sha256()
+        cached = tokens = 0
+        for message in messages[:-1]:
+            digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            tokens += _estimate_tokens(_prompt_text([message]))
+            key = digest.hexdigest()
+            if key in self.prefixes:
+                cached = tokens
+            self.prefixes.add(key)
+        return cached
+    
+    def anthropic(self, system: Any, messages: List[Dict[str, Any]]) -> "tuple[int, int]":
+        """Return (tokens read, tokens written) for the request's cache breakpoints."""
+        blocks = self._blocks(system) if system else []
+        for message in messages:
+            blocks.extend(self._blocks(message.get("content")))
+        digest = hashlib.sha256()
+        read = last_breakpoint = tokens = 0
+        for block in blocks:
+            digest.update(block.get("text", "").encode("utf-8"))
+            tokens += _estimate_tokens(block.get("text", ""))
+            if block.get("cache_control"):
+                key = digest.hexdigest()
+                if key in self.prefixes:
+                    read = tokens
+                self.prefixes.add(key)
+                last_breakpoint = tokens
+        return read, max(0, last_breakpoint - read)
+
+
+def _prompt_text(messages: List[Dict[str, Any]]) -> str:
+    """Flatten message contents (plain strings or content blocks) to text."""
+    parts = []
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content if isinstance(block, dict))
+        parts.append(str(content))
+    return "\n".join(parts)
+
+
+def generate_tokens(messages: List[Dict[str, Any]], count: int) -> List[str]:
+    """
+    Build a deterministic response for the given conversation.
+    
+    Args:
+        messages: Request messages
+        count: Number of tokens to produce
+    
+    Returns:
+        List of tokens (words with leading spaces after the first)
+    """
+    digest = hashlib.sha256(_prompt_text(messages).encode("utf-8")).digest()
+    rng = random.Random(digest)
+    words = [rng.choice(VOCABULARY) for _ in range(max(1, count))]
+    return [words[0]] + [f" {word}" for word in words[1:]]
+
+
+def _estimate_tokens(text: str) -> int:
+    """Rough token count (about four characters per token)."""
+    return max(1, len(text) // 4)
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one server-sent event."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+
+def create_app(config: Optional[MockLLMConfig] = None) -> FastAPI:
+    """
+    Create the mock provider application.
+    
+    Args:
+        config: Mock behaviour (defaults to MockLLMConfig())
+    
+    Returns:
+        FastAPI app; config can be changed at runtime via PUT /mock/config
+    """
+    app = FastAPI(title="Mock LLM Provider")
+    app.state.config = config or MockLLMConfig()
+    app.state.stats = _Stats()
+    app.state.rng = random.Random(app.state.config.seed)
+    app.state.prompt_cache = _PromptCache()
+    
+    def injected_fault(api: str) -> Optional[JSONResponse]:
+        """Roll for a 429 or 5xx according to the current config."""
+        cfg: MockLLMConfig = app.state.config
+        roll = app.state.rng.random()
+        if roll < cfg.rate_limit_rate:
+            app.state.stats.rate_limited += 1
+            return _error_response(api, 429, "rate_limit_error", "Rate limit exceeded (injected)", {
+                "retry-after": f"{cfg.retry_after:g}",
+                "x-ratelimit-reset-requests": f"{cfg.retry_after:g}s"
+            })
+        if roll < cfg.rate_limit_rate + cfg.error_rate:
+            app.state.stats.errors += 1
+            return _error_response(api, cfg.error_status, "overloaded_error", "Server error (injected)")
+        return None
+    
+    async def paced(tokens: List[str]) -> AsyncGenerator[str, None]:
+        """Yield tokens after the TTFT, at the configured rate."""
+        cfg: MockLLMConfig = app.state.config
+        await asyncio.sleep(cfg.ttft)
+        interval = 1.0 / cfg.tokens_per_second if cfg.tokens_per_second > 0 else 0.0
+        for index, token in enumerate(tokens):
+            if index and interval:
+                await asyncio.sleep(interval)
+            yield token
+    
+    async def tracked(body: AsyncGenerator[str, None]) -> AsyncGenerator[str, None]:
+        """Count a streaming request as in flight until its body is sent."""
+        try:
+            async for part in body:
+                yield part
+        finally:
+            app.state.stats.in_flight -= 1
+    
+    def start_request() -> None:
+        stats = app.state.stats
+        stats.requests += 1
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+    
+    def response_tokens(body: Dict[str, Any]) -> List[str]:
+        count = app.state.config.response_tokens
+        if body.get("max_tokens"):
+            count = min(count, int(body["max_tokens"]))
+        return generate_tokens(body.get("messages", []), count)
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        """OpenAI-compatible chat completions"""
+        body = await request.json()
+        fault = injected_fault("openai")
+        if fault is not None:
+            return fault
+        
+        start_request()
+        tokens = response_tokens(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock-llm")
+        created = int(time.time())
+        usage = {
+            "prompt_tokens": _estimate_tokens(_prompt_text(body.get("messages", []))),
+            "completion_tokens": len(tokens),
+        }
+        usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        if app.state.config.prompt_caching:
+            cached = app.state.prompt_cache.openai(body.get("messages", []))
+            usage["prompt_tokens_details"] = {"cached_tokens": min(cached, usage["prompt_tokens"])}
+        
+        def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+            return _sse({
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+            })
+        
+        if body.get("stream"):
+            async def events() -> AsyncGenerator[str, None]:
+                yield chunk({"role": "assistant", "content": ""})
+                async for token in paced(tokens):
+                    yield chunk({"content": token})
+                yield chunk({}, "stop")
+                if (body.get("stream_options") or {}).get("include_usage"):
+                    yield _sse({
+                        "id": completion_id,
+                        "object": "chat.completion.chunk",
+                        "created": created,
+                        "model": model,
+                        "choices": [],
+                        "usage": usage
+                    })
+                yield "data: [DONE]\n\n"
+            
+            return StreamingResponse(tracked(events()), media_type="text/event-stream")
+        
+        try:
+            text = "".join([token async for token in paced(tokens)])
+        finally:
+            app.state.stats.in_flight -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop"
+            }],
+            "usage": usage
+        }
+    
+    @app.post("/v1/messages")
+    async def messages(request: Request):
+        """Anthropic-compatible Messages API"""
+        body = await request.json()
+        fault = injected_fault("anthropic")
+        if fault is not None:
+            return fault
+        
+        start_request()
+        tokens = response_tokens(body)
+        message_id = f"msg_{uuid.uuid4().hex[:24]}"
+        model = body.get("model", "mock-llm")
+        system = body.get("system") or ""
+        read = written = 0
+        if app.state.config.prompt_caching:
+            read, written = app.state.prompt_cache.anthropic(system, body.get("messages", []))
+        if isinstance(system, list):
+            system = _prompt_text([{"content": system}])
+        prompt_tokens = _estimate_tokens(system + _prompt_text(body.get("messages", [])))
+        usage = {
+            # Like the real API, input_tokens excludes cache reads and writes
+            "input_tokens": max(0, prompt_tokens - read - written),
+            "output_tokens": len(tokens),
+            "cache_read_input_tokens": read,
+            "cache_creation_input_tokens": written
+        }
+        message = {
+            "id": message_id,
+            "type": "message",
+            "role": "assistant",
+            "model": model,
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {**usage, "output_tokens": 0}
+        }
+        
+        if body.get("stream"):
+            async def events() -> AsyncGenerator[str, None]:
+                yield _sse({"type": "message_start", "message": message}, "message_start")
+                yield _sse({
+                    "type": "content_block_start",
+                    "index": 0,
+                    "content_block": {"type": "text", "text": ""}
+                }, "content_block_start")
+                async for token in paced(tokens):
+                    yield _sse({
+                        "type": "content_block_delta",
+                        "index": 0,
+                        "delta": {"type": "text_delta", "text": token}
+                    }, "content_block_delta")
+                yield _sse({"type": "content_block_stop", "index": 0}, "content_block_stop")
+                yield _sse({
+                    "type": "message_delta",
+                    "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+                    "usage": {"output_tokens": usage["output_tokens"]}
+                }, "message_delta")
+                yield _sse({"type": "message_stop"}, "message_stop")
+            
+            return StreamingResponse(tracked(events()), media_type="text/event-stream")
+        
+        try:
+            text = "".join([token async for token in paced(tokens)])
+        finally:
+            app.state.stats.in_flight -= 1
+        message.update({
+            "content": [{"type": "text", "text": text}],
+            "stop_reason": "end_turn",
+            "usage": usage
+        })
+        return message
+    
+    @app.get("/mock/config")
+    async def get_config():
+        """Current mock behaviour"""
+        return app.state.config
+    
+    @app.put("/mock/config")
+    async def update_config(config: MockLLMConfig):
+        """Replace the mock behaviour (e.g. between load-test phases)"""
+        app.state.config = config
+        app.state.rng = random.Random(config.seed)
+        return config
+    
+    @app.get("/mock/stats")
+    async def get_stats():
+        """Request counters since startup"""
+        return app.state.stats.to_dict()
+    
+    return app
+
+
+def _error_response(
+    api: str,
+    status_code: int,
+    error_type: str,
+    message: str,
+    headers: Optional[Dict[str, str]] = None
+) -> JSONResponse:
+    """Build an error body in the requested API's format."""
+    if api == "anthropic":
+        content = {"type": "error", "error": {"type": error_type, "message": message}}
+    else:
+        content = {"error": {"message": message, "type": error_type, "code": status_code}}
+    return JSONResponse(content, status_code=status_code, headers=headers)
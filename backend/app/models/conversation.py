@@ -1,4 +1,4 @@
-from sqlalchemy import Column, BigInteger, String, DateTime, Text
+from sqlalchemy import Column, BigInteger, Integer, String, DateTime, Text
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.database import Base
@@ -12,6 +12,10 @@ class Conversation(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), server_default=func.now())
     
+    # Rolling summary of older turns (see app.services.compaction_service)
+    summary = Column(Text, nullable=True)
+    summarized_messages = Column(Integer, nullable=False, server_default="0", default=0)  # History messages covered
+    
     # Relationship to messages
     messages = relationship("Message", back_populates="conversation", cascade="all, delete-orphan")
     
@@ -17,6 +17,14 @@ class ModelProvider(str, enum.Enum):
     GEMINI = "gemini"
     GROK = "grok"
     PERPLEXITY = "perplexity"
+    MOCK = "mock"  # Local mock server for load testing (app.mock_llm)
+
+
+class ResponseStatus(str, enum.Enum):
+    COMPLETED = "completed"
+    ERROR = "error"
+    TIMED_OUT = "timed_out"  # Still running when the request deadline passed
+    CANCELLED = "cancelled"  # Stopped at the client's request
 
 
 class Message(Base):
@@ -27,6 +35,9 @@ class Message(Base):
     role = Column(SQLEnum(MessageRole), nullable=False)
     content = Column(Text, nullable=False)
     model_provider = Column(SQLEnum(ModelProvider), nullable=True)  # Null for user messages
+    token_count = Column(Integer, nullable=True)  # Estimated at write time, used for history windowing
+    status = Column(String(16), nullable=True)  # ResponseStatus value; null for user messages
+    idempotency_key = Column(String(128), nullable=True, unique=True)  # Makes replayed write-behind inserts no-ops
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     
     # Relationship to conversation
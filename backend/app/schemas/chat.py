@@ -1,6 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from typing import List, Optional, Dict
-from app.models.message import ModelProvider
+from app.models.message import ModelProvider, ResponseStatus
+from app.constants import MAX_CHAT_TIMEOUT_SECONDS
 
 
 class ChatRequest(BaseModel):
@@ -13,6 +14,9 @@ class ChatRequest(BaseModel):
     use_rag: Optional[bool] = False
     top_k: Optional[int] = Field(default=3, ge=1, le=10)
     
+    # End-to-end time budget; providers still running after it are reported as timed_out
+    timeout_seconds: Optional[float] = Field(None, gt=0, le=MAX_CHAT_TIMEOUT_SECONDS)  # If None, use the server default
+    
     @validator('prompt')
     def validate_prompt(cls, v):
         if not v.strip():
@@ -36,6 +40,7 @@ class ModelResponse(BaseModel):
     content: str
     error: Optional[str] = None  # If the model failed to respond
     latency_ms: Optional[float] = None  # Time taken to get response
+    status: ResponseStatus = ResponseStatus.COMPLETED
 
 
 class ChatResponse(BaseModel):
@@ -46,6 +51,17 @@ class ChatResponse(BaseModel):
     rag_context_used: bool = False
     context_chunks: Optional[List[Dict]] = None
     
+class ChatStreamSummary(BaseModel):
+    """Final record of a streamed chat response"""
+    conversation_id: int
+    user_message_id: int
+    succeeded: List[ModelProvider]
+    failed: List[ModelProvider]
+    timed_out: List[ModelProvider] = []
+    cancelled: List[ModelProvider] = []
+    rag_context_used: bool = False
+    total_latency_ms: float
+    
 class StreamChunk(BaseModel):
     """For streaming responses (future enhancement)"""
     provider: ModelProvider
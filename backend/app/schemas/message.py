@@ -1,7 +1,7 @@
 from pydantic import BaseModel, Field, validator
 from datetime import datetime
 from typing import Optional
-from app.models.message import MessageRole, ModelProvider
+from app.models.message import MessageRole, ModelProvider, ResponseStatus
 
 
 class MessageBase(BaseModel):
@@ -27,6 +27,7 @@ class MessageResponse(MessageBase):
     id: int
     conversation_id: int
     model_provider: Optional[ModelProvider] = None
+    status: Optional[ResponseStatus] = None  # cancelled responses hold partial content
     created_at: datetime
     
     class Config:
@@ -5,20 +5,41 @@ Contains business logic for orchestrating multiple AI model responses.
 
 import asyncio
 import time
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, AsyncGenerator, Awaitable, Callable, Tuple, TypeVar
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 
 from app.models.conversation import Conversation
-from app.models.message import Message, MessageRole, ModelProvider
-from app.schemas.chat import ModelResponse
+from app.models.message import Message, MessageRole, ModelProvider, ResponseStatus
+from app.schemas.chat import ChatRequest, ModelResponse
 from app.clients.base import BaseAIClient
 from app.api.deps import get_ai_clients
+from app.config import settings
+from app.database import async_session
 from app.utils.circuit_breaker import circuit_manager
-from app.utils.validation import sanitize_string, validate_prompt_length
+from app.utils.hedging import request_hedger
+from app.utils.concurrency_limiter import concurrency_manager
+from app.clients.errors import counts_toward_circuit_breaker
+from app.clients.retry import retry_policy
+from app.utils.single_flight import single_flight, request_key
+from app.utils.cancellation import CancellationScope
+from app.utils.validation import estimate_token_count, sanitize_string, validate_prompt_length
 # Cache is disabled due to incorrect implementation
 # from app.utils.cache import response_cache
 from app.services import system_prompt_service
+from app.services.conversation_service import get_or_create_conversation
+from app.services.compaction_service import conversation_compactor
+from app.services.history_service import history_cache, history_token_budget, window_history
+from app.services.message_writer import (
+    assistant_message_row,
+    idempotency_key,
+    insert_messages,
+    message_writer,
+)
+from app.services.document_service import similarity_search
+from app.constants import ERROR_MESSAGES, RAG_CONTEXT_HEADER
+from app.utils.logging import bind_log_context, get_logger, log_context
+
+logger = get_logger(__name__)
 
 
 def create_system_prompt_with_context(context: str) -> str:
@@ -40,22 +61,75 @@ IMPORTANT INSTRUCTIONS:
 4. If the context is not relevant to the question, you may provide answers from your general knowledge
 5. Be concise but comprehensive in your responses
 
-RETRIEVED CONTEXT FROM KNOWLEDGE BASE:
+{RAG_CONTEXT_HEADER}
 {context}"""
     
     return system_prompt
 
 
+async def get_model_system_prompt(
+    provider: ModelProvider,
+    db: AsyncSession,
+    rag_context: Optional[str] = None
+) -> Optional[str]:
+    """
+    Build the system prompt for a provider, including RAG context if available.
+    
+    Args:
+        provider: Model provider enum
+        db: Database session
+        rag_context: Optional RAG context
+    
+    Returns:
+        The formatted system prompt, or None if there is nothing to send
+    """
+    # Get model-specific system prompt
+    model_system_prompt = await system_prompt_service.get_system_prompt(provider, db)
+    return await build_model_system_prompt(provider, model_system_prompt, rag_context)
+
+
+async def build_model_system_prompt(
+    provider: ModelProvider,
+    model_system_prompt: Optional[str],
+    rag_context: Optional[str] = None
+) -> Optional[str]:
+    """
+    Combine a provider's prompt template with RAG context.
+    
+    Args:
+        provider: Model provider enum
+        model_system_prompt: The provider's active template, if any
+        rag_context: Optional RAG context
+    
+    Returns:
+        The formatted system prompt, or None if there is nothing to send
+    """
+    # Format with RAG context if available
+    if model_system_prompt and rag_context:
+        model_system_prompt = await system_prompt_service.format_system_prompt(
+            model_system_prompt, rag_context
+        )
+    elif not model_system_prompt and rag_context:
+        # Fallback to generic prompt if no model-specific prompt exists
+        model_system_prompt = create_system_prompt_with_context(rag_context)
+    
+    return model_system_prompt
+
+
 async def get_model_response(
     client: BaseAIClient,
     provider: ModelProvider,
     prompt: str,
     history: List[Dict[str, str]],
     rag_context: Optional[str] = None,
-    system_prompt: Optional[str] = None
+    system_prompt: Optional[str] = None,
+    deadline: Optional[float] = None
 ) -> ModelResponse:
     """
     Get response from a single AI model with circuit breaker protection.
+    Retryable errors are retried with backoff (see app.clients.retry), and
+    slow calls may be hedged with a duplicate request (see app.utils.hedging).
+    Identical concurrent calls are coalesced (see app.utils.single_flight).
     
     NOTE: Caching is currently disabled. The original implementation had incorrect
     method calls (response_cache.get/set don't exist). To re-enable caching, use:
@@ -69,28 +143,64 @@ async def get_model_response(
         history: Conversation history
         rag_context: Optional RAG context
         system_prompt: Optional system prompt
+        deadline: time.monotonic() value by which retries must give up
         
     Returns:
         ModelResponse object
     """
+    with log_context(provider=provider.value):
+        return await _get_model_response(
+            client, provider, prompt, history, system_prompt, deadline
+        )
+
+
+async def _get_model_response(
+    client: BaseAIClient,
+    provider: ModelProvider,
+    prompt: str,
+    history: List[Dict[str, str]],
+    system_prompt: Optional[str],
+    deadline: Optional[float]
+) -> ModelResponse:
+    """get_model_response within the provider's logging context."""
     try:
         start_time = time.time()
         
-        # Debug: Log what we're sending to the model
-        print(f"\n🤖 Sending to {provider.value}:")
-        print(f"   System prompt length: {len(system_prompt) if system_prompt else 0} chars")
-        if system_prompt:
-            print(f"   System prompt preview: {system_prompt[:150]}...")
-        else:
-            print(f"   ⚠️  NO SYSTEM PROMPT!")
+        logger.debug(
+            "Calling model: system_prompt_chars=%d history_messages=%d",
+            len(system_prompt or ""), len(history)
+        )
         
-        # Get response from model
-        response = await client.generate_response(prompt, history, system_prompt)
+        async def call_provider() -> str:
+            # Get response from model (hedged if the provider is slower than usual).
+            # Each attempt, including retries and hedges, holds a concurrency slot.
+            limited_generate = concurrency_manager.wrap(provider.value, client.generate_response)
+            try:
+                response = await request_hedger.call(
+                    provider.value,
+                    retry_policy.call,
+                    provider.value,
+                    limited_generate,
+                    prompt,
+                    history,
+                    system_prompt,
+                    deadline=deadline
+                )
+            except Exception as e:
+                # Record failure in circuit breaker (only once retries have given up)
+                if counts_toward_circuit_breaker(e):
+                    circuit_manager.record_failure(provider.value)
+                raise
+            
+            # Record success in circuit breaker
+            circuit_manager.record_success(provider.value)
+            return response
         
-        latency_ms = (time.time() - start_time) * 1000
+        # Identical concurrent requests share one upstream call
+        key = request_key(provider.value, client.get_model_name(), system_prompt, history, prompt)
+        response = await single_flight.call(key, call_provider)
         
-        # Record success in circuit breaker
-        circuit_manager.record_success(provider.value)
+        latency_ms = (time.time() - start_time) * 1000
         
         return ModelResponse(
             provider=provider,
@@ -99,72 +209,195 @@ async def get_model_response(
         )
         
     except Exception as e:
-        # Record failure in circuit breaker
-        circuit_manager.record_failure(provider.value)
-        
+        logger.warning(f"Model call failed: {e}")
         return ModelResponse(
             provider=provider,
             content="",
-            error=str(e)
+            error=str(e),
+            status=ResponseStatus.ERROR
         )
 
 
+async def unconfigured_model_response(provider: ModelProvider) -> ModelResponse:
+    """
+    Build the error response for a provider that has no API key configured.
+    
+    Args:
+        provider: Model provider enum
+    
+    Returns:
+        ModelResponse object with an error
+    """
+    return ModelResponse(
+        provider=provider,
+        content="",
+        error=ERROR_MESSAGES["model_not_configured"].format(model=provider.value),
+        status=ResponseStatus.ERROR
+    )
+
+
+def timed_out_model_response(provider: ModelProvider, latency_ms: Optional[float] = None) -> ModelResponse:
+    """
+    Build the response for a provider that was still running at the deadline.
+    
+    Args:
+        provider: Model provider enum
+        latency_ms: Time spent waiting for the provider
+    
+    Returns:
+        ModelResponse object with status timed_out
+    """
+    return ModelResponse(
+        provider=provider,
+        content="",
+        error=ERROR_MESSAGES["model_timed_out"].format(model=provider.value),
+        latency_ms=latency_ms,
+        status=ResponseStatus.TIMED_OUT
+    )
+
+
+def cancelled_model_response(
+    provider: ModelProvider,
+    latency_ms: Optional[float] = None,
+    content: str = ""
+) -> ModelResponse:
+    """
+    Build the response for a provider the client cancelled.
+    
+    Args:
+        provider: Model provider enum
+        latency_ms: Time spent waiting for the provider
+        content: Whatever the provider had produced before it was stopped
+    
+    Returns:
+        ModelResponse object with status cancelled
+    """
+    return ModelResponse(
+        provider=provider,
+        content=content,
+        error=ERROR_MESSAGES["model_cancelled"].format(model=provider.value),
+        latency_ms=latency_ms,
+        status=ResponseStatus.CANCELLED
+    )
+
+
+def was_cancelled(task: asyncio.Future, provider: ModelProvider, cancellation: CancellationScope) -> bool:
+    """Whether a provider task was stopped (or is being stopped) at the client's request."""
+    return cancellation.is_cancelled(provider.value) and (task.cancelled() or not task.done())
+
+
+def request_deadline(timeout_seconds: Optional[float] = None) -> float:
+    """
+    Compute the deadline for a chat request.
+    
+    Args:
+        timeout_seconds: Per-request time budget (defaults to CHAT_TIMEOUT_SECONDS)
+    
+    Returns:
+        time.monotonic() value by which the request must finish
+    """
+    return time.monotonic() + (timeout_seconds or settings.CHAT_TIMEOUT_SECONDS)
+
+
+def time_remaining(deadline: float) -> float:
+    """Seconds left before a deadline (never negative)."""
+    return max(0.0, deadline - time.monotonic())
+
+
 async def format_conversation_history(
     conversation_id: int,
     db: AsyncSession
-) -> List[Dict[str, str]]:
+) -> List[Dict[str, Any]]:
     """
     Format conversation history for AI models.
     Creates a balanced view where each set of model responses is represented
     by a single assistant message (using the best/most comprehensive response).
+    Compiled histories are cached per conversation and extended as messages are saved.
+    In long conversations, older turns are replaced by a stored summary.
+    
+    Messages carry a token count; pass the history through window_history
+    for each model before sending it.
     
     Args:
         conversation_id: ID of the conversation
         db: Database session
-        
+    
     Returns:
-        List of message dicts with role and content
+        List of message dicts with role, content and tokens
     """
-    result = await db.execute(
-        select(Message).where(
-            Message.conversation_id == conversation_id
-        ).order_by(Message.created_at)
-    )
-    messages = result.scalars().all()
-    
-    history: List[Dict[str, str]] = []
-    current_assistant_responses: List[Message] = []
-    
-    for msg in messages:
-        if msg.role == MessageRole.USER:
-            # If there are pending assistant responses, add the best one
-            if current_assistant_responses:
-                best_response = max(current_assistant_responses, key=lambda r: len(r.content))
-                history.append({"role": "assistant", "content": best_response.content})
-                current_assistant_responses = []
-            
-            history.append({"role": "user", "content": msg.content})
-            
-        elif msg.role == MessageRole.ASSISTANT:
-            current_assistant_responses.append(msg)
+    history = await history_cache.get(conversation_id, db)
+    return await conversation_compactor.apply(conversation_id, history, db)
+
+
+async def retrieve_rag_context(
+    prompt: str,
+    db: AsyncSession,
+    top_k: int = 3
+) -> Tuple[Optional[str], Optional[List[Dict[str, Any]]]]:
+    """
+    Retrieve document context for a prompt.
     
-    # Add any remaining assistant responses
-    if current_assistant_responses:
-        best_response = max(current_assistant_responses, key=lambda r: len(r.content))
-        history.append({"role": "assistant", "content": best_response.content})
+    Search errors are logged and treated as "no context" so the chat
+    request still goes through.
     
-    return history
+    Args:
+        prompt: The user's prompt
+        db: Database session
+        top_k: Number of chunks to retrieve
+    
+    Returns:
+        Tuple of (context for the system prompt, chunk summaries for the client),
+        both None if nothing relevant was found
+    """
+    try:
+        similar_docs = await similarity_search(
+            query=prompt,
+            db=db,
+            top_k=top_k
+        )
+        
+        if not similar_docs:
+            logger.debug("RAG search (top_k=%d) found no relevant documents", top_k)
+            return None, None
+        
+        # Combine document contents for context
+        rag_context = "\n\n".join([
+            f"[Document {i+1}]:\n{doc['chunk_text']}"
+            for i, doc in enumerate(similar_docs)
+        ])
+        
+        # Store metadata about context chunks
+        context_chunks = [
+            {
+                "content": doc['chunk_text'][:200] + "..." if len(doc['chunk_text']) > 200 else doc['chunk_text'],
+                "similarity": doc['similarity_score'],
+                "metadata": doc.get('doc_metadata', {})
+            }
+            for doc in similar_docs
+        ]
+        logger.debug(
+            "RAG context built from %d chunks: %d chars", len(similar_docs), len(rag_context)
+        )
+        return rag_context, context_chunks
+    except Exception as e:
+        logger.warning(f"RAG retrieval failed, continuing without context: {e}", exc_info=True)
+        return None, None
 
 
-async def generate_multi_model_responses(
+async def prepare_model_calls(
     prompt: str,
     conversation_id: int,
     db: AsyncSession,
     selected_models: Optional[List[ModelProvider]] = None,
-    rag_context: Optional[str] = None
-) -> List[ModelResponse]:
+    rag_context: Optional[str] = None,
+    clients: Optional[Dict[ModelProvider, BaseAIClient]] = None,
+    deadline: Optional[float] = None
+) -> List[Tuple[ModelProvider, Awaitable[ModelResponse]]]:
     """
-    Generate responses from multiple AI models in parallel.
+    Load history and system prompts and build one call per model.
+    
+    All database reads happen here, so the returned calls only talk to
+    the providers and can run after the request's session is gone.
     
     Args:
         prompt: The user's prompt
@@ -172,76 +405,384 @@ async def generate_multi_model_responses(
         db: Database session
         selected_models: Optional list of specific models to use
         rag_context: Optional RAG context to augment the prompt
-        
+        clients: AI clients to use (defaults to the shared client registry)
+        deadline: time.monotonic() value by which retries must give up
+    
     Returns:
-        List of ModelResponse objects
+        (provider, awaitable) pairs; each awaitable produces one ModelResponse
     """
     # Get conversation history
     history = await format_conversation_history(conversation_id, db)
     
     # Get AI clients
-    all_clients = get_ai_clients()
+    all_clients = clients if clients is not None else get_ai_clients()
+    models_to_use = select_models(selected_models, all_clients)
+    
+    # Build model-specific prompts
+    system_prompts = {}
+    for provider in models_to_use:
+        if provider in all_clients:
+            system_prompts[provider] = await get_model_system_prompt(provider, db, rag_context)
     
-    # Determine which models to use
+    return build_model_calls(
+        prompt, history, models_to_use, all_clients, system_prompts, rag_context, deadline
+    )
+
+
+def select_models(
+    selected_models: Optional[List[ModelProvider]],
+    all_clients: Dict[ModelProvider, BaseAIClient]
+) -> List[ModelProvider]:
+    """
+    Decide which models answer a prompt.
+    
+    Args:
+        selected_models: Models requested by the client, if any
+        all_clients: Configured AI clients
+    
+    Returns:
+        The requested models, or every configured and healthy model
+    """
     if selected_models:
-        models_to_use = selected_models
-    else:
-        # Use all available providers
-        all_providers = list(ModelProvider)
-        healthy_providers = circuit_manager.get_healthy_providers(
-            [p.value for p in all_providers]
-        )
-        models_to_use = [
-            p for p in all_providers 
-            if p.value in healthy_providers
-        ]
-        
-        # If no healthy providers, use all anyway (circuit breaker will handle failures)
-        if not models_to_use:
-            models_to_use = all_providers
+        return selected_models
     
-    # Create tasks for parallel execution with model-specific prompts
+    # Use all configured and available providers
+    all_providers = list(all_clients)
+    healthy_providers = circuit_manager.get_healthy_providers(
+        [p.value for p in all_providers]
+    )
+    models_to_use = [
+        p for p in all_providers 
+        if p.value in healthy_providers
+    ]
+    
+    # If no healthy providers, use all anyway (circuit breaker will handle failures)
+    return models_to_use or all_providers
+
+
+def build_model_calls(
+    prompt: str,
+    history: List[Dict[str, str]],
+    models_to_use: List[ModelProvider],
+    all_clients: Dict[ModelProvider, BaseAIClient],
+    system_prompts: Dict[ModelProvider, Optional[str]],
+    rag_context: Optional[str] = None,
+    deadline: Optional[float] = None
+) -> List[Tuple[ModelProvider, Awaitable[ModelResponse]]]:
+    """
+    Build one provider call per model from already-loaded inputs.
+    
+    Args:
+        prompt: The user's prompt
+        history: Conversation history with token counts; windowed per model
+        models_to_use: Models to call
+        all_clients: Configured AI clients
+        system_prompts: Formatted system prompt per model
+        rag_context: Optional RAG context
+        deadline: time.monotonic() value by which retries must give up
+    
+    Returns:
+        (provider, awaitable) pairs; each awaitable produces one ModelResponse
+    """
     tasks = []
     for provider in models_to_use:
-        # Get model-specific system prompt
-        model_system_prompt = await system_prompt_service.get_system_prompt(provider, db)
-        
-        print(f"\n📋 Processing {provider.value}:")
-        print(f"   Base system prompt: {len(model_system_prompt) if model_system_prompt else 0} chars")
-        print(f"   RAG context available: {bool(rag_context)} ({len(rag_context) if rag_context else 0} chars)")
+        if provider not in all_clients:
+            tasks.append((provider, unconfigured_model_response(provider)))
+            continue
         
-        # Format with RAG context if available
-        if model_system_prompt and rag_context:
-            print(f"   ➜ Formatting system prompt WITH RAG context...")
-            model_system_prompt = await system_prompt_service.format_system_prompt(
-                model_system_prompt, rag_context
-            )
-            print(f"   ✓ Formatted prompt: {len(model_system_prompt)} chars")
-        elif not model_system_prompt and rag_context:
-            print(f"   ➜ Using fallback generic prompt with RAG context...")
-            # Fallback to generic prompt if no model-specific prompt exists
-            model_system_prompt = create_system_prompt_with_context(rag_context)
-        
-        print(f"Creating task for provider: {provider.value}")
-        tasks.append(
+        system_prompt = system_prompts.get(provider)
+        tasks.append((
+            provider,
             get_model_response(
                 all_clients[provider],
                 provider,
                 prompt,
-                history,
+                window_history(history, history_token_budget(provider, prompt, system_prompt)),
                 rag_context,
-                model_system_prompt
+                system_prompt,
+                deadline
             )
+        ))
+    
+    return tasks
+
+
+async def generate_multi_model_responses(
+    prompt: str,
+    conversation_id: int,
+    db: AsyncSession,
+    selected_models: Optional[List[ModelProvider]] = None,
+    rag_context: Optional[str] = None,
+    clients: Optional[Dict[ModelProvider, BaseAIClient]] = None,
+    deadline: Optional[float] = None
+) -> List[ModelResponse]:
+    """
+    Generate responses from multiple AI models in parallel.
+    
+    Providers still running at the deadline are cancelled and reported
+    with status timed_out; the responses that did finish are returned.
+    
+    Args:
+        prompt: The user's prompt
+        conversation_id: ID of the conversation for context
+        db: Database session
+        selected_models: Optional list of specific models to use
+        rag_context: Optional RAG context to augment the prompt
+        clients: AI clients to use (defaults to the shared client registry)
+        deadline: time.monotonic() value for the whole request
+            (defaults to CHAT_TIMEOUT_SECONDS from now)
+        
+    Returns:
+        List of ModelResponse objects, in the order the models were selected
+    """
+    if deadline is None:
+        deadline = request_deadline()
+    start_time = time.time()
+    
+    calls = await prepare_model_calls(
+        prompt, conversation_id, db, selected_models, rag_context, clients, deadline
+    )
+    return await collect_model_responses(calls, deadline, start_time)
+
+
+async def collect_model_responses(
+    calls: List[Tuple[ModelProvider, Awaitable[ModelResponse]]],
+    deadline: float,
+    start_time: Optional[float] = None,
+    cancellation: Optional[CancellationScope] = None
+) -> List[ModelResponse]:
+    """
+    Run model calls in parallel until they finish or the deadline passes.
+    
+    Args:
+        calls: (provider, awaitable) pairs; awaitables may already be running tasks
+        deadline: time.monotonic() value for the whole request
+        start_time: time.time() the request started, for timed_out latencies
+        cancellation: Scope through which the client can stop providers early
+    
+    Returns:
+        List of ModelResponse objects, in the order of calls
+    """
+    start_time = start_time or time.time()
+    cancellation = cancellation or CancellationScope()
+        
+    # Execute all tasks in parallel, up to the deadline
+    tasks = [asyncio.ensure_future(call) for _, call in calls]
+    if tasks:
+        await cancellation.wait(
+            {task: provider.value for (provider, _), task in zip(calls, tasks)},
+            timeout=time_remaining(deadline)
         )
     
-    # Execute all tasks in parallel
-    print(f"Running {len(tasks)} tasks concurrently")
-    responses = await asyncio.gather(*tasks)
-    print(f"All tasks completed. Results: {[type(r).__name__ for r in responses]}")
+    responses = []
+    for (provider, _), task in zip(calls, tasks):
+        if was_cancelled(task, provider, cancellation):
+            task.cancel()
+            responses.append(cancelled_model_response(provider, (time.time() - start_time) * 1000))
+        elif task.done():
+            responses.append(task.result())
+        else:
+            # Cancel without waiting, so a hung provider cannot hold the request
+            task.cancel()
+            responses.append(timed_out_model_response(provider, (time.time() - start_time) * 1000))
+    logger.debug("Model calls finished: %s", [r.status.value for r in responses])
     
     return responses
 
 
+async def iter_responses_as_completed(
+    calls: List[Tuple[ModelProvider, Awaitable[ModelResponse]]],
+    deadline: Optional[float] = None,
+    cancellation: Optional[CancellationScope] = None
+) -> AsyncGenerator[ModelResponse, None]:
+    """
+    Run model calls concurrently and yield each response as soon as it is ready.
+    
+    Calls that are still running at the deadline, or when the consumer
+    stops iterating (e.g. the client disconnected), are cancelled. At the
+    deadline a timed_out response is yielded for each of them. Calls the
+    client cancels through the scope yield a cancelled response.
+    
+    Args:
+        calls: (provider, awaitable) pairs from prepare_model_calls
+        deadline: time.monotonic() value for the whole request
+        cancellation: Scope through which the client can stop providers early
+    
+    Yields:
+        ModelResponse objects in completion order
+    """
+    start_time = time.time()
+    cancellation = cancellation or CancellationScope()
+    providers = {}
+    for provider, call in calls:
+        providers[asyncio.ensure_future(call)] = provider
+    pending = set(providers)
+    try:
+        while pending:
+            timeout = time_remaining(deadline) if deadline is not None else None
+            done, pending = await cancellation.wait(
+                {task: providers[task].value for task in pending},
+                timeout=timeout,
+                return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                if was_cancelled(task, providers[task], cancellation):
+                    yield cancelled_model_response(providers[task], (time.time() - start_time) * 1000)
+                else:
+                    yield task.result()
+            if not done:
+                break
+        
+        latency_ms = (time.time() - start_time) * 1000
+        for task in pending:
+            task.cancel()
+            if cancellation.is_cancelled(providers[task].value):
+                yield cancelled_model_response(providers[task], latency_ms)
+            else:
+                yield timed_out_model_response(providers[task], latency_ms)
+    finally:
+        for task in providers:
+            if not task.done():
+                task.cancel()
+
+
+T = TypeVar("T")
+
+
+async def in_new_session(step: Callable[[AsyncSession], Awaitable[T]]) -> T:
+    """
+    Run one pipeline step on a database session of its own.
+    
+    An AsyncSession cannot run two queries at once, so steps that run
+    concurrently with the request's session each need their own.
+    """
+    async with async_session() as session:
+        return await step(session)
+
+
+class ChatTurn:
+    """
+    A chat request whose provider calls have been started.
+    
+    Attributes:
+        conversation: The conversation the prompt belongs to
+        user_message: Task saving the user's message; await it for the Message
+        calls: (provider, task) pairs for the running provider calls
+        rag_context: RAG context sent to the models, if any
+        context_chunks: Chunk summaries for the client, if any
+        time_to_first_call_ms: Time from the start of the turn until the provider calls started
+    """
+    
+    def __init__(
+        self,
+        conversation: Conversation,
+        user_message: "asyncio.Task[Message]",
+        calls: List[Tuple[ModelProvider, "asyncio.Task[ModelResponse]"]],
+        rag_context: Optional[str],
+        context_chunks: Optional[List[Dict[str, Any]]],
+        time_to_first_call_ms: float
+    ):
+        self.conversation = conversation
+        self.user_message = user_message
+        self.calls = calls
+        self.rag_context = rag_context
+        self.context_chunks = context_chunks
+        self.time_to_first_call_ms = time_to_first_call_ms
+    
+    def cancel(self) -> None:
+        """Cancel provider calls that have not finished."""
+        for _, task in self.calls:
+            if not task.done():
+                task.cancel()
+
+
+async def start_chat_turn(
+    request: ChatRequest,
+    db: AsyncSession,
+    clients: Optional[Dict[ModelProvider, BaseAIClient]] = None,
+    deadline: Optional[float] = None
+) -> ChatTurn:
+    """
+    Run the steps before generation concurrently and start the provider calls.
+    
+    The steps form a small dependency graph instead of a sequence:
+    
+    - RAG retrieval (embedding + vector search), history and the system
+      prompt templates only depend on the request, so they run in
+      parallel, each on its own session
+    - The conversation is fetched or created on the request's session
+      at the same time
+    - Provider calls start as soon as history, prompts and RAG context
+      are in; saving the user's message overlaps with them
+    
+    History is loaded before the user's message is saved, so the current
+    prompt is not repeated at the end of it.
+    
+    Args:
+        request: The chat request
+        db: The request's database session, used for the conversation and user message
+        clients: Configured AI clients (defaults to get_ai_clients())
+        deadline: time.monotonic() value for the whole request
+    
+    Returns:
+        ChatTurn with the provider calls running
+    """
+    start = time.perf_counter()
+    
+    rag = history = None
+    if request.use_rag:
+        rag = asyncio.create_task(in_new_session(
+            lambda session: retrieve_rag_context(request.prompt, session, request.top_k)
+        ))
+    prompts = asyncio.create_task(in_new_session(system_prompt_service.get_system_prompts))
+    if request.conversation_id is not None:
+        history = asyncio.create_task(in_new_session(
+            lambda session: format_conversation_history(request.conversation_id, session)
+        ))
+    branches = [task for task in (rag, prompts, history) if task is not None]
+    
+    try:
+        conversation = await get_or_create_conversation(
+            request.conversation_id,
+            generate_conversation_title(request.prompt),
+            db,
+            load_messages=False
+        )
+        rag_context, context_chunks = await rag if rag else (None, None)
+        templates = await prompts
+        conversation_history = await history if history else []
+    except BaseException:
+        for task in branches:
+            task.cancel()
+        raise
+    
+    # Logged with this request's records from here on, including the provider calls
+    bind_log_context(conversation_id=conversation.id)
+    user_message = asyncio.create_task(save_user_message(conversation.id, request.prompt, db))
+    
+    all_clients = clients if clients is not None else get_ai_clients()
+    models_to_use = select_models(request.models, all_clients)
+    system_prompts = {
+        provider: await build_model_system_prompt(provider, templates.get(provider), rag_context)
+        for provider in models_to_use
+        if provider in all_clients
+    }
+    calls = [
+        (provider, asyncio.ensure_future(call))
+        for provider, call in build_model_calls(
+            request.prompt, conversation_history, models_to_use,
+            all_clients, system_prompts, rag_context, deadline
+        )
+    ]
+    
+    time_to_first_call_ms = (time.perf_counter() - start) * 1000
+    logger.debug("Started %d provider calls after %.1fms", len(calls), time_to_first_call_ms)
+    
+    return ChatTurn(
+        conversation, user_message, calls, rag_context, context_chunks, time_to_first_call_ms
+    )
+
+
 async def save_user_message(
     conversation_id: int,
     prompt: str,
@@ -261,38 +802,58 @@ async def save_user_message(
     user_message = Message(
         conversation_id=conversation_id,
         role=MessageRole.USER,
-        content=prompt
+        content=prompt,
+        token_count=estimate_token_count(prompt)
     )
     db.add(user_message)
     await db.commit()
     await db.refresh(user_message)
+    await history_cache.append(conversation_id, [user_message])
     return user_message
 
 
 async def save_assistant_responses(
     conversation_id: int,
     responses: List[ModelResponse],
-    db: AsyncSession
+    db: AsyncSession,
+    user_message_id: Optional[int] = None
 ) -> None:
     """
-    Save successful assistant responses to database.
+    Save successful assistant responses to database, along with whatever
+    cancelled responses had produced before they were stopped.
+    
+    With WRITE_BEHIND_ENABLED the messages are queued for a batched insert
+    and this returns without waiting for the database (see
+    app.services.message_writer); otherwise they are inserted with db.
     
     Args:
         conversation_id: ID of the conversation
         responses: List of model responses
-        db: Database session
+        db: Database session (unused with write-behind)
+        user_message_id: ID of the turn's user message, which makes the
+            messages' idempotency keys stable across retries
     """
-    for response in responses:
-        if not response.error:
-            assistant_message = Message(
-                conversation_id=conversation_id,
-                role=MessageRole.ASSISTANT,
-                content=response.content,
-                model_provider=response.provider
-            )
-            db.add(assistant_message)
+    rows = [
+        assistant_message_row(
+            conversation_id,
+            response.provider,
+            response.content,
+            idempotency_key(conversation_id, user_message_id, response.provider),
+            response.status
+        )
+        for response in responses
+        if not response.error or (response.status == ResponseStatus.CANCELLED and response.content)
+    ]
+    if not rows:
+        return
     
-    await db.commit()
+    if settings.WRITE_BEHIND_ENABLED:
+        await message_writer.enqueue(rows)
+        return
+    
+    await insert_messages(rows, db)
+    await history_cache.append(conversation_id, [Message(**row) for row in rows])
+    conversation_compactor.schedule(conversation_id)
 
 
 def generate_conversation_title(prompt: str, max_length: int = 50) -> str:
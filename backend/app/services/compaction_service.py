@@ -0,0 +1,391 @@
+"""
+Rolling compaction of long conversations.
+
+Once a conversation's history has more than COMPACTION_THRESHOLD messages
+past its summary, the older turns are folded into a stored summary and
+only the newest COMPACTION_KEEP_RECENT messages stay verbatim. Models
+then see the summary followed by the recent turns, so the history sent
+per turn stays bounded instead of growing with the conversation.
+
+Summaries are refreshed in the background after a turn is saved, never
+on the request path. Each refresh only summarizes the messages since
+the previous summary, together with that summary. The summarizer is
+pluggable: the default is a local extractive one that needs no network,
+and COMPACTION_SUMMARIZER can name any other ("module:factory").
+"""
+
+import asyncio
+import importlib
+import math
+import re
+from abc import ABC, abstractmethod
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.constants import MAX_CONVERSATION_HISTORY
+from app.database import async_session
+from app.models.conversation import Conversation
+from app.services.history_service import history_cache
+from app.utils.invalidation import invalidation_bus
+from app.utils.logging import get_logger
+from app.utils.validation import estimate_token_count
+
+logger = get_logger(__name__)
+
+
+# Invalidation topic for stored summaries (key: conversation ID)
+SUMMARY_TOPIC = "conversation_summary"
+
+# How a summary is presented to models: a user turn and an acknowledgement,
+# so providers that require alternating roles accept it
+SUMMARY_PREFIX = "Summary of our earlier conversation:"
+SUMMARY_ACKNOWLEDGEMENT = "Understood. I'll keep that earlier context in mind."
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from has have how i if in is it its "
+    "me my not of on or so that the their them there these this to was we were "
+    "what when which who why will with you your".split()
+)
+
+
+class BaseSummarizer(ABC):
+    """
+    Folds new messages into a running summary.
+    """
+    
+    @abstractmethod
+    async def summarize(self, previous: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        """
+        Update a conversation summary.
+        
+        Args:
+            previous: The summary so far, if any
+            messages: Messages since that summary (role and content), oldest first
+        
+        Returns:
+            Summary covering the previous summary and the messages
+        """
+
+
+class ExtractiveSummarizer(BaseSummarizer):
+    """
+    Keeps the most representative sentences, without calling a model.
+    
+    Sentences are scored by how frequent their words are across the
+    summary and the new messages; the best ones that fit the token
+    budget are kept in their original order.
+    """
+    
+    def __init__(self, max_tokens: Optional[int] = None):
+        """
+        Initialize extractive summarizer.
+        
+        Args:
+            max_tokens: Summary size limit (defaults to settings)
+        """
+        self.max_tokens = max_tokens or settings.COMPACTION_SUMMARY_TOKENS
+    
+    async def summarize(self, previous: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        # Scoring is CPU work; keep it off the event loop
+        return await asyncio.to_thread(self._summarize, previous, messages)
+    
+    def _summarize(self, previous: Optional[str], messages: List[Dict[str, Any]]) -> str:
+        sentences = self._split(previous or "")
+        for message in messages:
+            speaker = "User" if message["role"] == "user" else "Assistant"
+            sentences.extend(f"{speaker}: {s}" for s in self._split(message["content"]))
+        
+        # Drop repeats, keeping the first occurrence
+        seen: Set[str] = set()
+        sentences = [s for s in sentences if not (s in seen or seen.add(s))]
+        
+        words = [self._words(s) for s in sentences]
+        frequency = Counter(w for sentence_words in words for w in set(sentence_words))
+        scores = [
+            sum(frequency[w] for w in set(sentence_words)) / math.sqrt(len(sentence_words))
+            if sentence_words else 0.0
+            for sentence_words in words
+        ]
+        
+        chosen = []
+        used = 0
+        for index in sorted(range(len(sentences)), key=lambda i: scores[i], reverse=True):
+            tokens = estimate_token_count(sentences[index]) + 1
+            if used + tokens > self.max_tokens:
+                continue
+            chosen.append(index)
+            used += tokens
+        return " ".join(sentences[i] for i in sorted(chosen))
+    
+    @staticmethod
+    def _split(text: str) -> List[str]:
+        return [s.strip() for s in _SENTENCE_END.split(text) if s.strip()]
+    
+    @staticmethod
+    def _words(sentence: str) -> List[str]:
+        return [w for w in _WORD.findall(sentence.lower()) if w not in _STOPWORDS]
+
+
+# Summarizers selectable by name in COMPACTION_SUMMARIZER
+SUMMARIZERS: Dict[str, Callable[[], BaseSummarizer]] = {
+    "extractive": ExtractiveSummarizer,
+}
+
+
+def load_summarizer(name: str) -> BaseSummarizer:
+    """
+    Create the summarizer named in settings.
+    
+    Args:
+        name: A key of SUMMARIZERS, or "module:factory" for a custom one
+    
+    Returns:
+        Summarizer instance
+    """
+    if name in SUMMARIZERS:
+        return SUMMARIZERS[name]()
+    module_name, _, attribute = name.partition(":")
+    if not attribute:
+        raise ValueError(f"Unknown summarizer: {name}")
+    return getattr(importlib.import_module(module_name), attribute)()
+
+
+class ConversationCompactor:
+    """
+    Applies stored summaries to histories and refreshes them in the background.
+    """
+    
+    def __init__(
+        self,
+        summarizer: Optional[BaseSummarizer] = None,
+        threshold: Optional[int] = None,
+        keep_recent: Optional[int] = None,
+        enabled: Optional[bool] = None,
+        max_conversations: Optional[int] = None
+    ):
+        """
+        Initialize conversation compactor.
+        
+        Args:
+            summarizer: Summarizer to use (defaults to COMPACTION_SUMMARIZER)
+            threshold: Messages past the summary that trigger a refresh (defaults to settings)
+            keep_recent: Newest messages kept verbatim after a refresh (defaults to settings)
+            enabled: Whether to compact at all (defaults to settings)
+            max_conversations: Summaries kept in process (defaults to settings)
+        """
+        self._summarizer = summarizer
+        self.threshold = threshold or settings.COMPACTION_THRESHOLD
+        self.keep_recent = settings.COMPACTION_KEEP_RECENT if keep_recent is None else keep_recent
+        self.enabled = settings.COMPACTION_ENABLED if enabled is None else enabled
+        self.max_conversations = max_conversations or settings.HISTORY_CACHE_MAX_CONVERSATIONS
+        if self.enabled and self.threshold + 2 > MAX_CONVERSATION_HISTORY:
+            # The summary pair and every verbatim message must fit the history window
+            raise ValueError(
+                f"COMPACTION_THRESHOLD ({self.threshold}) must be at most "
+                f"MAX_CONVERSATION_HISTORY - 2 ({MAX_CONVERSATION_HISTORY - 2})"
+            )
+        # conversation ID -> (summary, number of history messages it covers)
+        self._summaries: "OrderedDict[int, Tuple[Optional[str], int]]" = OrderedDict()
+        self._tasks: Dict[int, asyncio.Task] = {}
+        self._rerun: Set[int] = set()
+    
+    @property
+    def summarizer(self) -> BaseSummarizer:
+        """The summarizer, created from settings on first use."""
+        if self._summarizer is None:
+            self._summarizer = load_summarizer(settings.COMPACTION_SUMMARIZER)
+        return self._summarizer
+    
+    async def apply(
+        self,
+        conversation_id: int,
+        history: List[Dict[str, Any]],
+        db: AsyncSession
+    ) -> List[Dict[str, Any]]:
+        """
+        Replace the summarized part of a history with its summary.
+        
+        The summary and its acknowledgement are marked "pinned", so
+        window_history keeps them ahead of the verbatim messages.
+        
+        Args:
+            conversation_id: ID of the conversation
+            history: Compiled history, oldest first
+            db: Database session, used if the summary is not cached
+        
+        Returns:
+            The model-facing history
+        """
+        if not self.enabled or len(history) <= self.keep_recent:
+            return history
+        
+        summary, covered = await self._get_summary(conversation_id, db)
+        if not summary or covered > len(history):
+            return history
+        
+        return [
+            {
+                "role": "user",
+                "content": f"{SUMMARY_PREFIX}\n{summary}",
+                "tokens": estimate_token_count(summary) + estimate_token_count(SUMMARY_PREFIX),
+                "pinned": True
+            },
+            {
+                "role": "assistant",
+                "content": SUMMARY_ACKNOWLEDGEMENT,
+                "tokens": estimate_token_count(SUMMARY_ACKNOWLEDGEMENT),
+                "pinned": True
+            },
+        ] + history[covered:]
+    
+    def schedule(self, conversation_id: int) -> None:
+        """
+        Refresh a conversation's summary in the background if it has grown.
+        
+        Args:
+            conversation_id: ID of the conversation
+        """
+        if not self.enabled:
+            return
+        if conversation_id in self._tasks:
+            # Check again once the running refresh is done
+            self._rerun.add(conversation_id)
+            return
+        task = asyncio.create_task(self._run(conversation_id))
+        self._tasks[conversation_id] = task
+    
+    async def refresh(self, conversation_id: int, db: AsyncSession) -> bool:
+        """
+        Fold older messages into the summary if enough have accumulated.
+        
+        Args:
+            conversation_id: ID of the conversation
+            db: Database session
+        
+        Returns:
+            True if a new summary was stored
+        """
+        history = await history_cache.get(conversation_id, db)
+        summary, covered = await self._get_summary(conversation_id, db, use_cache=False)
+        if covered > len(history):
+            # Messages were deleted since; start over
+            summary, covered = None, 0
+        if len(history) - covered <= self.threshold:
+            return False
+        
+        cutoff = len(history) - self.keep_recent
+        # Keep whole turns: the verbatim part starts with a user message
+        while cutoff < len(history) and history[cutoff]["role"] != "user":
+            cutoff += 1
+        if cutoff <= covered:
+            return False
+        
+        new_summary = await self.summarizer.summarize(summary, history[covered:cutoff])
+        result = await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .where(Conversation.summarized_messages == covered)
+            .values(summary=new_summary, summarized_messages=cutoff)
+        )
+        await db.commit()
+        if not result.rowcount:
+            # Another worker refreshed it first
+            self.drop(str(conversation_id))
+            return False
+        
+        self._set_summary(conversation_id, new_summary, cutoff)
+        await invalidation_bus.publish(SUMMARY_TOPIC, str(conversation_id))
+        logger.info(f"Compacted conversation {conversation_id}: {cutoff} messages summarized")
+        return True
+    
+    async def reset(self, conversation_id: int, db: AsyncSession) -> None:
+        """
+        Discard a conversation's summary (e.g. after one of its messages was deleted).
+        
+        Args:
+            conversation_id: ID of the conversation
+            db: Database session
+        """
+        await db.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(summary=None, summarized_messages=0)
+        )
+        await db.commit()
+        await invalidation_bus.invalidate(SUMMARY_TOPIC, str(conversation_id))
+    
+    def drop(self, key: Optional[str] = None) -> None:
+        """
+        Drop cached summaries (invalidation bus handler).
+        
+        Args:
+            key: Conversation ID, or None for every conversation
+        """
+        if key is None:
+            self._summaries.clear()
+        else:
+            self._summaries.pop(int(key), None)
+    
+    async def stop(self) -> None:
+        """Cancel background refreshes; they run again after the next turn."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks.clear()
+        self._rerun.clear()
+    
+    async def _run(self, conversation_id: int) -> None:
+        """Background refresh, repeated while turns arrive during it."""
+        try:
+            while True:
+                self._rerun.discard(conversation_id)
+                try:
+                    async with async_session() as db:
+                        await self.refresh(conversation_id, db)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"Compaction of conversation {conversation_id} failed: {e}")
+                    return
+                if conversation_id not in self._rerun:
+                    return
+        finally:
+            self._tasks.pop(conversation_id, None)
+    
+    async def _get_summary(
+        self,
+        conversation_id: int,
+        db: AsyncSession,
+        use_cache: bool = True
+    ) -> Tuple[Optional[str], int]:
+        """Get a conversation's summary and the number of messages it covers."""
+        if use_cache and conversation_id in self._summaries:
+            self._summaries.move_to_end(conversation_id)
+            return self._summaries[conversation_id]
+        
+        result = await db.execute(
+            select(Conversation.summary, Conversation.summarized_messages)
+            .where(Conversation.id == conversation_id)
+        )
+        row = result.one_or_none()
+        summary, covered = (row[0], row[1] or 0) if row else (None, 0)
+        self._set_summary(conversation_id, summary, covered)
+        return summary, covered
+    
+    def _set_summary(self, conversation_id: int, summary: Optional[str], covered: int) -> None:
+        self._summaries[conversation_id] = (summary, covered)
+        self._summaries.move_to_end(conversation_id)
+        while len(self._summaries) > self.max_conversations:
+            self._summaries.popitem(last=False)
+
+
+# Global conversation compactor instance
+conversation_compactor = ConversationCompactor()
+invalidation_bus.register(SUMMARY_TOPIC, conversation_compactor.drop)
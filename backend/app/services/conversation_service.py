@@ -12,6 +12,8 @@ from fastapi import HTTPException
 from app.models.conversation import Conversation
 from app.models.message import Message
 from app.schemas.conversation import ConversationCreate, ConversationUpdate
+from app.services.history_service import history_cache
+from app.services.message_writer import message_writer
 
 
 async def create_conversation(
@@ -37,7 +39,8 @@ async def create_conversation(
 
 async def get_conversation(
     conversation_id: int,
-    db: AsyncSession
+    db: AsyncSession,
+    load_messages: bool = True
 ) -> Conversation:
     """
     Get a conversation by ID.
@@ -45,6 +48,7 @@ async def get_conversation(
     Args:
         conversation_id: The ID of the conversation
         db: Database session
+        load_messages: Whether to eagerly load the conversation's messages
         
     Returns:
         The Conversation object
@@ -52,11 +56,10 @@ async def get_conversation(
     Raises:
         HTTPException: If conversation not found
     """
-    result = await db.execute(
-        select(Conversation)
-        .options(selectinload(Conversation.messages))
-        .where(Conversation.id == conversation_id)
-    )
+    query = select(Conversation).where(Conversation.id == conversation_id)
+    if load_messages:
+        query = query.options(selectinload(Conversation.messages))
+    result = await db.execute(query)
     conversation = result.scalar_one_or_none()
     
     if not conversation:
@@ -139,12 +142,16 @@ async def delete_conversation(
     conversation = await get_conversation(conversation_id, db)
     await db.delete(conversation)
     await db.commit()
+    # Responses still queued for the conversation would fail to insert
+    message_writer.discard(conversation_id)
+    await history_cache.invalidate(conversation_id)
 
 
 async def get_or_create_conversation(
     conversation_id: Optional[int],
     default_title: str,
-    db: AsyncSession
+    db: AsyncSession,
+    load_messages: bool = True
 ) -> Conversation:
     """
     Get an existing conversation or create a new one.
@@ -153,12 +160,13 @@ async def get_or_create_conversation(
         conversation_id: Optional ID of existing conversation
         default_title: Title to use if creating new conversation
         db: Database session
+        load_messages: Whether to eagerly load an existing conversation's messages
         
     Returns:
         The Conversation object (existing or newly created)
     """
     if conversation_id is not None:
-        return await get_conversation(conversation_id, db)
+        return await get_conversation(conversation_id, db, load_messages)
     else:
         return await create_conversation(default_title, db)
 
@@ -1,8 +1,12 @@
+import logging
 from typing import List, Dict, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 from app.models.document import Document, DocumentChunk, Embedding
 from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
 
 
 async def create_document_with_embeddings(
@@ -74,15 +78,30 @@ def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
     return chunks
 
 
+_embedding_client = None
+
+
+def get_embedding_client():
+    """
+    Get the shared async OpenAI client used for embeddings.
+    
+    Created on first use so importing this module does not need an API key.
+    """
+    global _embedding_client
+    if _embedding_client is None:
+        from openai import AsyncOpenAI
+        _embedding_client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+    return _embedding_client
+
+
 async def generate_embedding(text: str) -> List[float]:
     """
     Generate embedding using OpenAI's API.
-    """
-    from openai import OpenAI
-    
-    client = OpenAI(api_key=settings.OPENAI_API_KEY)
     
-    response = client.embeddings.create(
+    Uses the async client so a chat request's embedding call does not
+    block the event loop while other steps of the request run.
+    """
+    response = await get_embedding_client().embeddings.create(
         model="text-embedding-ada-002",
         input=text
     )
@@ -98,11 +117,8 @@ async def similarity_search(
     """
     Perform semantic similarity search using cosine similarity.
     """
-    print(f"🔍 Similarity search for query: '{query[:100]}...'")
-    
     # Generate query embedding
     query_embedding = await generate_embedding(query)
-    print(f"✓ Generated query embedding: {len(query_embedding)} dimensions")
     
     # Perform similarity search using pgvector
     query_sql = text("""
@@ -129,10 +145,11 @@ async def similarity_search(
     )
     
     results = [dict(row._mapping) for row in result]
-    print(f"✓ Found {len(results)} matching documents")
-    if results:
-        for i, r in enumerate(results[:3]):  # Show top 3
-            print(f"  {i+1}. Similarity: {r.get('similarity_score', 0):.4f} - {r.get('chunk_text', '')[:80]}...")
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug(
+            "Similarity search found %d documents; top scores: %s",
+            len(results), [round(r.get("similarity_score", 0), 4) for r in results[:3]]
+        )
     
     return results
 
@@ -0,0 +1,450 @@
+"""
+Compiled conversation history with an incremental per-conversation cache.
+
+Models get one assistant message per turn: the longest of the models'
+completed responses, or the longest partial one (e.g. cancelled) if no
+model completed the turn. Compiling that from the stored messages means a query and a
+pass over the whole conversation, so the compiled history is cached per
+conversation and messages are appended to it as they are saved. Deleting
+messages invalidates the conversation's entry.
+
+Each compiled message carries its token count ("tokens"), taken from the
+count stored with the message when it was written. window_history uses
+it to fit the newest turns into a model's context budget; it also strips
+the counts, so history must go through it before reaching a client.
+
+Entries live in process (LRU) and, with HISTORY_CACHE_REDIS_ENABLED, in
+Redis as well, so a worker that has not seen a conversation yet can pick
+it up without rebuilding it. With HISTORY_CACHE_PEERS, a worker that
+appends to a history tells the others to drop their in-process copy
+through the invalidation bus. Both happen in the background, so Redis
+latency never delays a turn.
+
+Messages queued for a write-behind insert (app.services.message_writer)
+are not in the database yet; a rebuild merges them in from the pending
+sources registered with the cache.
+"""
+
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.constants import MAX_CONVERSATION_HISTORY, MESSAGE_TOKEN_OVERHEAD, RESPONSE_TOKEN_RESERVE
+from app.models.message import Message, MessageRole, ModelProvider, ResponseStatus
+from app.utils.invalidation import invalidation_bus
+from app.utils.logging import get_logger
+from app.utils.validation import estimate_token_count, get_model_token_limit
+
+logger = get_logger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is in requirements.txt
+    aioredis = None
+
+
+# Invalidation topic for the history cache (key: conversation ID)
+HISTORY_TOPIC = "conversation_history"
+
+
+def append_message(history: List[Dict[str, Any]], message: Message) -> None:
+    """
+    Add one stored message to a compiled history, in place.
+    
+    Args:
+        history: Compiled history
+        message: Message (or anything with role, content, token_count and optionally status)
+    """
+    tokens = message.token_count
+    if tokens is None:
+        tokens = estimate_token_count(message.content)
+    
+    if message.role == MessageRole.USER:
+        history.append({"role": "user", "content": message.content, "tokens": tokens})
+    elif message.role == MessageRole.ASSISTANT:
+        entry = {"role": "assistant", "content": message.content, "tokens": tokens}
+        # Responses stopped early are only used for a turn no model completed
+        # (no status: stored before statuses were recorded, so completed)
+        if getattr(message, "status", None) not in (None, ResponseStatus.COMPLETED):
+            entry["partial"] = True
+        # One assistant message per turn: keep the longest, completed ones first
+        if history and history[-1]["role"] == "assistant":
+            kept = history[-1]
+            if (not entry.get("partial"), len(entry["content"])) > (not kept.get("partial"), len(kept["content"])):
+                history[-1] = entry
+        else:
+            history.append(entry)
+
+
+def compile_history(messages: Iterable[Message]) -> List[Dict[str, Any]]:
+    """
+    Compile stored messages, oldest first, into the history sent to models.
+    
+    Args:
+        messages: Messages ordered by creation time
+    
+    Returns:
+        List of message dicts with role, content and tokens
+    """
+    history: List[Dict[str, Any]] = []
+    for message in messages:
+        append_message(history, message)
+    return history
+
+
+def history_token_budget(
+    provider: ModelProvider,
+    prompt: str,
+    system_prompt: Optional[str] = None
+) -> int:
+    """
+    Tokens of history that fit into a model's context next to a request.
+    
+    Args:
+        provider: Model provider
+        prompt: The user's prompt
+        system_prompt: The system prompt sent with it (including any RAG context)
+    
+    Returns:
+        Token budget for history (may be zero)
+    """
+    budget = get_model_token_limit(provider.value) - RESPONSE_TOKEN_RESERVE
+    budget -= estimate_token_count(prompt) + MESSAGE_TOKEN_OVERHEAD
+    if system_prompt:
+        budget -= estimate_token_count(system_prompt) + MESSAGE_TOKEN_OVERHEAD
+    return max(0, budget)
+
+
+def window_history(
+    history: List[Dict[str, Any]],
+    token_budget: int,
+    max_messages: int = MAX_CONVERSATION_HISTORY
+) -> List[Dict[str, str]]:
+    """
+    Keep the newest messages that fit a token budget.
+    
+    Leading messages marked "pinned" (a conversation summary, see
+    app.services.compaction_service) are kept whenever they fit: their
+    tokens and slots are reserved before the newest messages fill the rest.
+    
+    The window never starts with an assistant message after the pinned
+    ones, so providers that require the conversation to open with a user
+    turn accept it.
+    
+    Args:
+        history: Compiled history, oldest first, with token counts
+        token_budget: Tokens available for history
+        max_messages: Maximum number of messages to keep
+    
+    Returns:
+        List of message dicts with role and content, oldest first
+    """
+    def cost(message: Dict[str, Any]) -> int:
+        tokens = message.get("tokens")
+        if tokens is None:
+            tokens = estimate_token_count(message["content"])
+        return tokens + MESSAGE_TOKEN_OVERHEAD
+    
+    pinned = 0
+    while pinned < len(history) and history[pinned].get("pinned"):
+        pinned += 1
+    used = sum(cost(message) for message in history[:pinned])
+    if used > token_budget or pinned > max_messages:
+        # No room for the summary; window the rest as usual
+        used = 0
+        kept_pinned = []
+    else:
+        kept_pinned = history[:pinned]
+        max_messages -= pinned
+    recent = history[pinned:]
+    
+    start = len(recent)
+    while start > 0 and len(recent) - start < max_messages:
+        used += cost(recent[start - 1])
+        if used > token_budget:
+            break
+        start -= 1
+    
+    while start < len(recent) and recent[start]["role"] != "user":
+        start += 1
+    
+    return [
+        {"role": message["role"], "content": message["content"]}
+        for message in kept_pinned + recent[start:]
+    ]
+
+
+class HistoryCache:
+    """
+    Per-conversation cache of compiled histories.
+    """
+    
+    def __init__(
+        self,
+        max_conversations: Optional[int] = None,
+        ttl: Optional[float] = None,
+        redis_url: Optional[str] = None,
+        redis_enabled: Optional[bool] = None,
+        peers: Optional[bool] = None
+    ):
+        """
+        Initialize history cache.
+        
+        Args:
+            max_conversations: Conversations kept in process (defaults to settings)
+            ttl: Seconds before an entry is rebuilt even without an invalidation (defaults to settings)
+            redis_url: Redis connection URL (defaults to settings)
+            redis_enabled: Whether to use the Redis tier (defaults to settings)
+            peers: Whether other workers cache the same conversations (defaults to settings)
+        """
+        self.max_conversations = max_conversations or settings.HISTORY_CACHE_MAX_CONVERSATIONS
+        self.ttl = settings.HISTORY_CACHE_TTL if ttl is None else ttl
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.redis_enabled = settings.HISTORY_CACHE_REDIS_ENABLED if redis_enabled is None else redis_enabled
+        self.peers = settings.HISTORY_CACHE_PEERS if peers is None else peers
+        self._entries: "OrderedDict[int, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        # Loads in flight; a save or invalidation removes the token so a
+        # load that may have missed it does not store its result
+        self._loads: Dict[int, object] = {}
+        # Callables returning a conversation's messages not yet committed
+        self._pending_sources: List[Callable[[int], List[Message]]] = []
+        self._redis = None
+        # Latest history (None: delete) to write to Redis, and whether to announce it, per conversation
+        self._unsynced: Dict[int, Tuple[Optional[List[Dict[str, Any]]], bool]] = {}
+        self._sync_task: Optional[asyncio.Task] = None
+    
+    def register_pending_source(self, source: Callable[[int], List[Message]]) -> None:
+        """
+        Register a source of messages saved but not yet in the database.
+        
+        Args:
+            source: Returns a conversation's pending messages, each with
+                created_at and idempotency_key set
+        """
+        self._pending_sources.append(source)
+    
+    async def get(self, conversation_id: int, db: AsyncSession) -> List[Dict[str, Any]]:
+        """
+        Get a conversation's compiled history.
+        
+        Args:
+            conversation_id: ID of the conversation
+            db: Database session, used on a cache miss
+        
+        Returns:
+            List of message dicts with role, content and tokens (a copy callers may modify)
+        """
+        history = self._get_local(conversation_id)
+        if history is None:
+            history = await self._load(conversation_id, db)
+        return [dict(message) for message in history]
+    
+    async def append(self, conversation_id: int, messages: List[Message]) -> None:
+        """
+        Add newly committed messages to a conversation's history.
+        
+        The Redis copy and the other workers are updated in the background.
+        
+        Args:
+            conversation_id: ID of the conversation
+            messages: The committed messages, oldest first
+        """
+        self._loads.pop(conversation_id, None)
+        history = self._get_local(conversation_id)
+        if history is not None:
+            for message in messages:
+                append_message(history, message)
+        # Without a local copy to extend, the Redis copy, if any, is out of date
+        self._schedule_sync(conversation_id, history)
+    
+    async def touch(self, conversation_id: int) -> None:
+        """
+        Signal that messages already appended here have reached the database.
+        
+        Other workers and the Redis copy may have been rebuilt without
+        them in the meantime, so they are refreshed.
+        
+        Args:
+            conversation_id: ID of the conversation
+        """
+        await self.append(conversation_id, [])
+    
+    async def invalidate(self, conversation_id: int) -> None:
+        """
+        Drop a conversation's history in every worker and in Redis.
+        
+        Args:
+            conversation_id: ID of the conversation
+        """
+        self._unsynced.pop(conversation_id, None)
+        await self._delete_remote(conversation_id)
+        await invalidation_bus.invalidate(HISTORY_TOPIC, str(conversation_id))
+    
+    def drop(self, key: Optional[str] = None) -> None:
+        """
+        Drop in-process entries (invalidation bus handler).
+        
+        Args:
+            key: Conversation ID, or None for every conversation
+        """
+        if key is None:
+            self._entries.clear()
+            self._loads.clear()
+            return
+        conversation_id = int(key)
+        self._entries.pop(conversation_id, None)
+        self._loads.pop(conversation_id, None)
+    
+    async def aclose(self) -> None:
+        """Finish background updates and close the Redis connection."""
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+            self._sync_task = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+    
+    async def _load(self, conversation_id: int, db: AsyncSession) -> List[Dict[str, Any]]:
+        """Load a history from Redis or the database and cache it."""
+        token = object()
+        self._loads[conversation_id] = token
+        try:
+            history = await self._get_remote(conversation_id)
+            from_redis = history is not None
+            if not from_redis:
+                # Taken before the query: a message committed in between is in
+                # both and deduplicated, one queued after it resets the token
+                pending = [m for source in self._pending_sources for m in source(conversation_id)]
+                result = await db.execute(
+                    select(Message).where(
+                        Message.conversation_id == conversation_id
+                    ).order_by(Message.created_at)
+                )
+                messages = list(result.scalars().all())
+                if pending:
+                    stored = {getattr(m, "idempotency_key", None) for m in messages}
+                    messages.extend(m for m in pending if m.idempotency_key not in stored)
+                    messages.sort(key=lambda m: m.created_at)
+                history = compile_history(messages)
+            
+            if self._loads.get(conversation_id) is token:
+                self._set_local(conversation_id, history)
+                if not from_redis:
+                    # Other workers' copies are not stale, only Redis lacks one
+                    self._schedule_sync(conversation_id, history, announce=False)
+            return history
+        finally:
+            if self._loads.get(conversation_id) is token:
+                del self._loads[conversation_id]
+    
+    def _schedule_sync(
+        self,
+        conversation_id: int,
+        history: Optional[List[Dict[str, Any]]],
+        announce: bool = True
+    ) -> None:
+        """
+        Queue a conversation's Redis update and invalidation, if there is anyone to tell.
+        
+        Args:
+            conversation_id: ID of the conversation
+            history: History to store in Redis, or None to delete the Redis copy
+            announce: Whether other workers must drop their copies
+        """
+        announce = announce and self.peers
+        if self._get_redis() is None and not announce:
+            return
+        # Later updates replace one not yet sent, so Redis never goes back in time;
+        # an invalidation still owed to other workers is kept
+        owed = self._unsynced.get(conversation_id, (None, False))[1]
+        history = None if history is None else [dict(m) for m in history]
+        self._unsynced[conversation_id] = (history, announce or owed)
+        if self._sync_task is None or self._sync_task.done():
+            self._sync_task = asyncio.create_task(self._sync())
+    
+    async def _sync(self) -> None:
+        """Send queued updates, one at a time and oldest first."""
+        while self._unsynced:
+            conversation_id = next(iter(self._unsynced))
+            history, announce = self._unsynced.pop(conversation_id)
+            if history is None:
+                await self._delete_remote(conversation_id)
+            else:
+                await self._set_remote(conversation_id, history)
+            if announce:
+                await invalidation_bus.publish(HISTORY_TOPIC, str(conversation_id))
+    
+    def _get_local(self, conversation_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Get an unexpired in-process entry and mark it recently used."""
+        entry = self._entries.get(conversation_id)
+        if entry is None:
+            return None
+        loaded_at, history = entry
+        if time.monotonic() - loaded_at > self.ttl:
+            del self._entries[conversation_id]
+            return None
+        self._entries.move_to_end(conversation_id)
+        return history
+    
+    def _set_local(self, conversation_id: int, history: List[Dict[str, Any]]) -> None:
+        """Store an in-process entry, evicting the least recently used."""
+        self._entries[conversation_id] = (time.monotonic(), history)
+        self._entries.move_to_end(conversation_id)
+        while len(self._entries) > self.max_conversations:
+            self._entries.popitem(last=False)
+    
+    def _get_redis(self):
+        """Get the Redis client, or None if the Redis tier is off."""
+        if not self.redis_enabled or not self.redis_url or aioredis is None:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=1
+            )
+        return self._redis
+    
+    @staticmethod
+    def _redis_key(conversation_id: int) -> str:
+        return f"conversation_history:{conversation_id}"
+    
+    async def _get_remote(self, conversation_id: int) -> Optional[List[Dict[str, Any]]]:
+        client = self._get_redis()
+        if client is None:
+            return None
+        try:
+            cached = await client.get(self._redis_key(conversation_id))
+            return json.loads(cached) if cached else None
+        except Exception as e:
+            logger.warning(f"History cache get failed for conversation {conversation_id}: {e}")
+            return None
+    
+    async def _set_remote(self, conversation_id: int, history: List[Dict[str, Any]]) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.set(self._redis_key(conversation_id), json.dumps(history), ex=int(self.ttl))
+        except Exception as e:
+            logger.warning(f"History cache set failed for conversation {conversation_id}: {e}")
+    
+    async def _delete_remote(self, conversation_id: int) -> None:
+        client = self._get_redis()
+        if client is None:
+            return
+        try:
+            await client.delete(self._redis_key(conversation_id))
+        except Exception as e:
+            logger.warning(f"History cache delete failed for conversation {conversation_id}: {e}")
+
+
+# Global history cache instance
+history_cache = HistoryCache()
+invalidation_bus.register(HISTORY_TOPIC, history_cache.drop)
@@ -0,0 +1,338 @@
+"""
+Write-behind persistence of assistant responses.
+
+Requests hand their assistant messages to the writer and return without
+waiting for the database. A background task batches the rows queued by
+all concurrent requests into multi-row inserts, flushing as soon as a
+batch is full or once the oldest row has waited WRITE_BEHIND_FLUSH_INTERVAL.
+
+Delivery is at-least-once: rows stay queued until the insert that
+carries them commits, and a flush that failed on connection trouble is
+retried. Each row has an idempotency key with a unique constraint behind
+it, so a replayed insert (e.g. one that committed but whose
+acknowledgement was lost) is a no-op. A batch the database rejects for
+any other reason is retried row by row, and the rows it still rejects
+(e.g. of a conversation deleted in the meantime) are logged and dropped,
+so they cannot block the queue.
+
+Queued messages are appended to the history cache right away, and the
+cache merges them into histories it rebuilds from the database, so the
+next turn sees them even before they are flushed. Whatever is left is
+flushed on shutdown.
+"""
+
+import asyncio
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_session
+from app.models.message import Message, MessageRole, ModelProvider, ResponseStatus
+from app.services.compaction_service import conversation_compactor
+from app.services.history_service import history_cache
+from app.utils.logging import get_logger
+from app.utils.validation import estimate_token_count
+
+logger = get_logger(__name__)
+
+
+def idempotency_key(conversation_id: int, turn_id: Optional[Any], provider: ModelProvider) -> str:
+    """
+    Key identifying one model's response to one turn.
+    
+    Args:
+        conversation_id: ID of the conversation
+        turn_id: ID of the turn's user message, or None to make the key unique
+        provider: Model that produced the response
+    
+    Returns:
+        Idempotency key
+    """
+    if turn_id is None:
+        turn_id = uuid.uuid4().hex
+    return f"{conversation_id}:{turn_id}:{provider.value}"
+
+
+def assistant_message_row(
+    conversation_id: int,
+    provider: ModelProvider,
+    content: str,
+    key: str,
+    status: ResponseStatus = ResponseStatus.COMPLETED
+) -> Dict[str, Any]:
+    """
+    Build the insert row for an assistant message.
+    
+    created_at is set now rather than at insert time, so a message keeps
+    its place before the next turn's prompt even if it is flushed later.
+    """
+    return {
+        "conversation_id": conversation_id,
+        "role": MessageRole.ASSISTANT,
+        "content": content,
+        "model_provider": provider,
+        "token_count": estimate_token_count(content),
+        "idempotency_key": key,
+        "status": status.value,
+        "created_at": datetime.now(timezone.utc),
+    }
+
+
+async def insert_messages(rows: List[Dict[str, Any]], db: AsyncSession) -> None:
+    """
+    Insert message rows in one statement and commit, skipping rows already stored.
+    
+    Args:
+        rows: Rows built by assistant_message_row
+        db: Database session
+    """
+    if not rows:
+        return
+    await db.execute(
+        insert(Message)
+        .values(rows)
+        .on_conflict_do_nothing(index_elements=[Message.idempotency_key])
+    )
+    await db.commit()
+
+
+def is_transient_error(error: BaseException) -> bool:
+    """
+    Whether a failed insert is worth retrying as is.
+    
+    Connection failures and timeouts are; constraint violations and bad
+    data fail the same way on every attempt.
+    """
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class MessageWriter:
+    """
+    Batches message inserts from concurrent requests off the request path.
+    """
+    
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        flush_interval: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        retry_delay: Optional[float] = None,
+        drain_timeout: Optional[float] = None,
+        session_factory: Optional[Callable[[], Any]] = None
+    ):
+        """
+        Initialize message writer.
+        
+        Args:
+            batch_size: Rows per insert (defaults to settings)
+            flush_interval: Seconds a row may wait for its batch to fill (defaults to settings)
+            max_pending: Queued rows past which enqueue waits for a flush (defaults to settings)
+            retry_delay: Seconds between attempts after a failed flush (defaults to settings)
+            drain_timeout: Seconds allowed to flush on shutdown (defaults to settings)
+            session_factory: Creates database sessions (defaults to async_session)
+        """
+        self.batch_size = batch_size or settings.WRITE_BEHIND_BATCH_SIZE
+        self.flush_interval = settings.WRITE_BEHIND_FLUSH_INTERVAL if flush_interval is None else flush_interval
+        self.max_pending = max_pending or settings.WRITE_BEHIND_MAX_PENDING
+        self.retry_delay = settings.WRITE_BEHIND_RETRY_DELAY if retry_delay is None else retry_delay
+        self.drain_timeout = settings.WRITE_BEHIND_DRAIN_TIMEOUT if drain_timeout is None else drain_timeout
+        self.session_factory = session_factory or async_session
+        # Rows in the order they were queued; removed once committed
+        self._rows: List[Dict[str, Any]] = []
+        self._flush_lock = asyncio.Lock()
+        self._has_rows = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def pending_count(self) -> int:
+        """Rows queued but not yet committed."""
+        return len(self._rows)
+    
+    def start(self) -> None:
+        """Start the background flush task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def enqueue(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Queue message rows for insertion and add them to the history cache.
+        
+        Returns without waiting for the database unless the queue is over
+        max_pending, in which case the caller waits for a flush. If that
+        flush fails, the rows are queued anyway: the background task keeps
+        retrying, and the request that produced them should not fail.
+        
+        Args:
+            rows: Rows built by assistant_message_row, for one conversation
+        """
+        if not rows:
+            return
+        if self.pending_count >= self.max_pending:
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Write-behind backlog of {self.pending_count} messages could not be flushed: {e}")
+        
+        self._rows.extend(rows)
+        self._has_rows.set()
+        if self.pending_count >= self.batch_size:
+            self._batch_full.set()
+        if self._task is None:
+            # Not started (e.g. outside the app); flush in the background anyway
+            self.start()
+        
+        await history_cache.append(rows[0]["conversation_id"], [Message(**row) for row in rows])
+    
+    def pending(self, conversation_id: int) -> List[Message]:
+        """
+        Get a conversation's messages that are queued but not yet committed.
+        
+        Args:
+            conversation_id: ID of the conversation
+        
+        Returns:
+            Unsaved Message objects, oldest first
+        """
+        return [Message(**row) for row in self._rows if row["conversation_id"] == conversation_id]
+    
+    def discard(self, conversation_id: int) -> int:
+        """
+        Drop a conversation's queued rows, e.g. because it was deleted.
+        
+        Args:
+            conversation_id: ID of the conversation
+        
+        Returns:
+            Number of rows dropped
+        """
+        count = self.pending_count
+        self._rows = [row for row in self._rows if row["conversation_id"] != conversation_id]
+        return count - self.pending_count
+    
+    async def flush(self) -> int:
+        """
+        Insert everything queued now, one batch at a time.
+        
+        Returns:
+            Number of rows committed
+        
+        Raises:
+            Exception: The database error if a batch failed on connection
+                trouble; its rows stay queued
+        """
+        written = 0
+        async with self._flush_lock:
+            while self._rows:
+                # Rows stay queued (and visible to history rebuilds) until committed
+                batch = self._rows[:self.batch_size]
+                try:
+                    async with self.session_factory() as db:
+                        await insert_messages(batch, db)
+                    committed, rejected = batch, []
+                except Exception as e:
+                    if is_transient_error(e):
+                        raise
+                    logger.warning(f"Write-behind batch rejected, inserting its {len(batch)} messages one by one: {e}")
+                    committed, rejected = await self._insert_each(batch)
+                # Appends and discards may have happened while the insert ran
+                taken = {id(row) for row in batch}
+                self._rows = [row for row in self._rows if id(row) not in taken]
+                written += len(committed)
+                await self._after_commit(committed)
+                await self._after_reject(rejected)
+            self._has_rows.clear()
+            self._batch_full.clear()
+        return written
+    
+    async def stop(self) -> None:
+        """Stop the background task and flush what is left, within drain_timeout."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        
+        deadline = time.monotonic() + self.drain_timeout
+        while self._rows:
+            try:
+                await asyncio.wait_for(self.flush(), max(0.0, deadline - time.monotonic()))
+            except Exception as e:
+                if time.monotonic() >= deadline:
+                    logger.error(f"Write-behind drain gave up; {self.pending_count} messages not saved: {e}")
+                    return
+                logger.warning(f"Write-behind drain failed, retrying: {e}")
+                await asyncio.sleep(min(self.retry_delay, max(0.0, deadline - time.monotonic())))
+    
+    async def _run(self) -> None:
+        """Flush when a batch fills up or the oldest row has waited flush_interval."""
+        while True:
+            await self._has_rows.wait()
+            try:
+                await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning(f"Write-behind flush of {self.pending_count} messages failed, retrying: {e}")
+                await asyncio.sleep(self.retry_delay)
+    
+    async def _insert_each(
+        self,
+        batch: List[Dict[str, Any]]
+    ) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Insert a rejected batch one row at a time.
+        
+        Returns:
+            (committed, rejected) rows
+        
+        Raises:
+            Exception: The database error if an insert failed on connection trouble
+        """
+        committed, rejected = [], []
+        for row in batch:
+            try:
+                async with self.session_factory() as db:
+                    await insert_messages([row], db)
+            except Exception as e:
+                if is_transient_error(e):
+                    raise
+                logger.error(
+                    f"Dropping message {row['idempotency_key']} of conversation "
+                    f"{row['conversation_id']}, rejected by the database: {e}"
+                )
+                rejected.append(row)
+            else:
+                committed.append(row)
+        return committed, rejected
+    
+    async def _after_reject(self, rows: List[Dict[str, Any]]) -> None:
+        """Rebuild the histories that showed the dropped rows."""
+        for conversation_id in dict.fromkeys(row["conversation_id"] for row in rows):
+            try:
+                await history_cache.invalidate(conversation_id)
+            except Exception as e:
+                logger.warning(f"History invalidation after dropped messages failed: {e}")
+    
+    async def _after_commit(self, batch: List[Dict[str, Any]]) -> None:
+        """Refresh other workers' histories and schedule compaction for the batch's conversations."""
+        for conversation_id in dict.fromkeys(row["conversation_id"] for row in batch):
+            try:
+                await history_cache.touch(conversation_id)
+            except Exception as e:
+                logger.warning(f"History refresh after write-behind flush failed: {e}")
+            conversation_compactor.schedule(conversation_id)
+
+
+# Global message writer instance
+message_writer = MessageWriter()
+history_cache.register_pending_source(message_writer.pending)
@@ -2,12 +2,21 @@
 Service for managing system prompts for different AI models.
 """
 
+import re
+import time
 from typing import List, Optional, Dict
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from app.config import settings
+from app.constants import RAG_CONTEXT_HEADER
 from app.models.system_prompt import SystemPrompt
 from app.models.message import ModelProvider
 from app.schemas.system_prompt import SystemPromptCreate, SystemPromptUpdate
+from app.utils.invalidation import invalidation_bus
+
+
+# Invalidation topic for the system prompt cache
+SYSTEM_PROMPTS_TOPIC = "system_prompts"
 
 
 # Default system prompts for each model
@@ -80,6 +89,84 @@ Your methodology:
 }
 
 
+class SystemPromptCache:
+    """
+    In-process cache of the active prompt template for every provider.
+    
+    All active prompts are loaded with a single query on a miss. Writes
+    invalidate the cache through the invalidation bus, which also reaches
+    other workers; the TTL bounds staleness if a pub/sub message is lost.
+    """
+    
+    def __init__(self, ttl: Optional[float] = None):
+        """
+        Initialize system prompt cache.
+        
+        Args:
+            ttl: Seconds before cached prompts are reloaded (defaults to settings)
+        """
+        self.ttl = settings.SYSTEM_PROMPT_CACHE_TTL if ttl is None else ttl
+        self._prompts: Optional[Dict[ModelProvider, str]] = None
+        self._loaded_at = 0.0
+        self._generation = 0
+    
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop the cached prompts (key is ignored; prompts are cached as one unit)."""
+        self._prompts = None
+        self._generation += 1
+    
+    async def get_all(self, db: AsyncSession) -> Dict[ModelProvider, str]:
+        """
+        Get the active prompt template for every provider that has one.
+        
+        Args:
+            db: Database session, used only on a cache miss
+        
+        Returns:
+            Dict mapping providers to prompt templates
+        """
+        if self._prompts is not None and time.monotonic() - self._loaded_at < self.ttl:
+            return self._prompts
+        
+        generation = self._generation
+        result = await db.execute(
+            select(SystemPrompt).where(SystemPrompt.is_active == True)
+        )
+        prompts = {
+            prompt.model_provider: prompt.prompt_template
+            for prompt in result.scalars().all()
+        }
+        
+        # Don't cache a result that an invalidation raced with
+        if generation == self._generation:
+            self._prompts = prompts
+            self._loaded_at = time.monotonic()
+        return prompts
+
+
+# Global system prompt cache instance
+system_prompt_cache = SystemPromptCache()
+invalidation_bus.register(SYSTEM_PROMPTS_TOPIC, system_prompt_cache.invalidate)
+
+
+async def invalidate_system_prompt_cache() -> None:
+    """Invalidate cached system prompts in this and every other worker."""
+    await invalidation_bus.invalidate(SYSTEM_PROMPTS_TOPIC)
+
+
+async def get_system_prompts(db: AsyncSession) -> Dict[ModelProvider, str]:
+    """
+    Get the active system prompt templates for all providers.
+    
+    Args:
+        db: Database session
+    
+    Returns:
+        Dict mapping providers to prompt templates (cached)
+    """
+    return await system_prompt_cache.get_all(db)
+
+
 async def get_system_prompt(
     model_provider: ModelProvider,
     db: AsyncSession,
@@ -96,16 +183,10 @@ async def get_system_prompt(
     Returns:
         The system prompt template or None if not found
     """
-    result = await db.execute(
-        select(SystemPrompt).where(
-            SystemPrompt.model_provider == model_provider,
-            SystemPrompt.is_active == True
-        )
-    )
-    prompt = result.scalar_one_or_none()
+    prompts = await get_system_prompts(db)
+    template = prompts.get(model_provider)
     
-    if prompt:
-        template = prompt.prompt_template
+    if template:
         if not include_rag_context and "{rag_context}" in template:
             # Remove RAG context placeholder if not needed
             template = template.replace("{rag_context}", "").strip()
@@ -143,6 +224,7 @@ async def create_system_prompt(
     db.add(prompt)
     await db.commit()
     await db.refresh(prompt)
+    await invalidate_system_prompt_cache()
     
     return prompt
 
@@ -177,6 +259,7 @@ async def update_system_prompt(
     
     await db.commit()
     await db.refresh(prompt)
+    await invalidate_system_prompt_cache()
     
     return prompt
 
@@ -230,6 +313,7 @@ async def initialize_default_prompts(db: AsyncSession) -> None:
             db.add(prompt)
     
     await db.commit()
+    await invalidate_system_prompt_cache()
 
 
 async def format_system_prompt(
@@ -239,6 +323,11 @@ async def format_system_prompt(
     """
     Format a system prompt template with optional RAG context.
     
+    The context goes after the instructions rather than where the
+    {rag_context} placeholder sits, so the instructions are an identical
+    prefix on every request and provider prompt caches can reuse them
+    (see app.clients.prompt_cache).
+    
     Args:
         template: System prompt template
         rag_context: Optional RAG context to include
@@ -246,8 +335,7 @@ async def format_system_prompt(
     Returns:
         Formatted system prompt
     """
+    instructions = re.sub(r"\n{3,}", "\n\n", template.replace("{rag_context}", "")).strip()
     if rag_context and "{rag_context}" in template:
-        rag_section = f"\nRELEVANT CONTEXT FROM KNOWLEDGE BASE:\n{rag_context}\n"
-        return template.replace("{rag_context}", rag_section)
-    else:
-        return template.replace("{rag_context}", "").strip()
+        return f"{instructions}\n\n{RAG_CONTEXT_HEADER}\n{rag_context}"
+    return instructions
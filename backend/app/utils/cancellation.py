@@ -0,0 +1,174 @@
+"""
+Client-initiated cancellation of in-flight chat requests.
+
+A CancellationScope records what the client asked to stop: the whole
+request or single providers. Code that waits on provider tasks waits
+through the scope, which cancels the tasks of cancelled providers as
+soon as the request arrives. Cancelling a provider task unwinds its
+upstream HTTP call or stream, so the provider stops generating (see
+app.utils.single_flight for calls shared with other requests).
+
+REST requests register their scope in the process-wide registry under
+their request ID (the X-Request-ID header, see app.utils.logging), where
+the cancel endpoint finds it. The registry is per process: with several
+workers, the cancel request has to reach the worker serving the request.
+WebSocket prompts keep their scopes on the connection instead.
+"""
+
+import asyncio
+from contextlib import contextmanager
+from typing import Dict, Hashable, Iterator, Optional, Set, Tuple
+
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class CancellationScope:
+    """
+    Cancellation requests for one chat request, whole or per provider.
+    """
+    
+    def __init__(self):
+        self.all = False
+        self.providers: Set[str] = set()
+        self._changed = asyncio.Event()
+    
+    def cancel(self, provider: Optional[str] = None) -> None:
+        """
+        Request cancellation.
+        
+        Args:
+            provider: Provider to stop, or None to stop the whole request
+        """
+        if provider is None:
+            self.all = True
+        else:
+            self.providers.add(provider)
+        # Wake every waiter, as with a shared stream's new chunks
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    def is_cancelled(self, provider: str) -> bool:
+        """Whether the client asked to stop this provider."""
+        return self.all or provider in self.providers
+    
+    async def wait(
+        self,
+        tasks: Dict[asyncio.Future, str],
+        timeout: Optional[float] = None,
+        return_when: str = asyncio.ALL_COMPLETED
+    ) -> Tuple[Set[asyncio.Future], Set[asyncio.Future]]:
+        """
+        Like asyncio.wait, but cancel the tasks of cancelled providers on the way.
+        
+        Cancelled tasks are waited for, so their cleanup (closing the upstream
+        stream) has run when they are returned among the done tasks.
+        
+        Args:
+            tasks: Provider name of each task
+            timeout: Seconds to wait at most (None waits until done)
+            return_when: asyncio.ALL_COMPLETED or asyncio.FIRST_COMPLETED
+        
+        Returns:
+            (done, pending) sets of tasks
+        """
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        done: Set[asyncio.Future] = set()
+        pending = set(tasks)
+        stopping: Set[asyncio.Future] = set()
+        
+        while pending:
+            for task in pending - stopping:
+                if self.is_cancelled(tasks[task]):
+                    task.cancel()
+                    stopping.add(task)
+            
+            remaining = None if deadline is None else max(0.0, deadline - loop.time())
+            changed = asyncio.ensure_future(self._changed.wait())
+            try:
+                finished, _ = await asyncio.wait(
+                    pending | {changed}, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                changed.cancel()
+            finished.discard(changed)
+            done |= finished
+            pending -= finished
+            
+            if finished and return_when == asyncio.FIRST_COMPLETED:
+                break
+            if deadline is not None and loop.time() >= deadline:
+                break
+        
+        return done, pending
+
+
+class CancellationRegistry:
+    """
+    Scopes of the REST chat requests in progress, by request ID.
+    """
+    
+    def __init__(self):
+        self._scopes: Dict[Hashable, CancellationScope] = {}
+    
+    def register(self, request_id: Optional[Hashable]) -> CancellationScope:
+        """
+        Create the scope of a request that is starting.
+        
+        Args:
+            request_id: ID the client cancels with; None registers nothing
+        
+        Returns:
+            The request's scope; pass it to release when the request ends
+        """
+        scope = CancellationScope()
+        if request_id is not None:
+            if request_id in self._scopes:
+                logger.warning(f"Request ID {request_id} is already in progress; only the newer request can be cancelled")
+            self._scopes[request_id] = scope
+        return scope
+    
+    def release(self, request_id: Optional[Hashable], scope: CancellationScope) -> None:
+        """Forget a request's scope once the request is over."""
+        if request_id is not None and self._scopes.get(request_id) is scope:
+            del self._scopes[request_id]
+    
+    @contextmanager
+    def open(self, request_id: Optional[Hashable]) -> Iterator[CancellationScope]:
+        """
+        Register a scope for a request while the block runs.
+        
+        Args:
+            request_id: ID the client cancels with; None registers nothing
+        
+        Yields:
+            The request's scope
+        """
+        scope = self.register(request_id)
+        try:
+            yield scope
+        finally:
+            self.release(request_id, scope)
+    
+    def cancel(self, request_id: Hashable, provider: Optional[str] = None) -> bool:
+        """
+        Cancel a request in progress, or one of its providers.
+        
+        Args:
+            request_id: ID of the request
+            provider: Provider to stop, or None to stop the whole request
+        
+        Returns:
+            False if no request with that ID is in progress
+        """
+        scope = self._scopes.get(request_id)
+        if scope is None:
+            return False
+        scope.cancel(provider)
+        return True
+
+
+# Global registry of cancellable REST requests
+cancellation_registry = CancellationRegistry()
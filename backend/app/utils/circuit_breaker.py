@@ -9,6 +9,8 @@ from typing import Optional, Callable, Any, Dict
 from enum import Enum
 from functools import wraps
 
+from app.clients.errors import counts_toward_circuit_breaker
+
 
 class CircuitState(Enum):
     """States of the circuit breaker"""
@@ -68,21 +70,29 @@ class CircuitBreaker:
                     self.state = CircuitState.HALF_OPEN
                     self.failure_count = 0
     
+    def record_success(self) -> None:
+        """Record a successful call made outside of call()"""
+        self.failure_count = 0
+        if self.state == CircuitState.HALF_OPEN:
+            self.state = CircuitState.CLOSED
+    
+    def record_failure(self) -> None:
+        """Record a failed call made outside of call()"""
+        self.failure_count += 1
+        self.last_failure_time = time.time()
+        
+        if self.failure_count >= self.failure_threshold:
+            self.state = CircuitState.OPEN
+    
     async def _on_success(self) -> None:
         """Handle successful call"""
         async with self._lock:
-            self.failure_count = 0
-            if self.state == CircuitState.HALF_OPEN:
-                self.state = CircuitState.CLOSED
+            self.record_success()
     
     async def _on_failure(self) -> None:
         """Handle failed call"""
         async with self._lock:
-            self.failure_count += 1
-            self.last_failure_time = time.time()
-            
-            if self.failure_count >= self.failure_threshold:
-                self.state = CircuitState.OPEN
+            self.record_failure()
     
     async def call(
         self,
@@ -120,7 +130,8 @@ class CircuitBreaker:
             await self._on_success()
             return result
         except Exception as e:
-            await self._on_failure()
+            if counts_toward_circuit_breaker(e):
+                await self._on_failure()
             raise e
 
 
@@ -166,6 +177,24 @@ class ProviderCircuitManager:
             )
         return self.breakers[provider_name]
     
+    def record_success(self, provider_name: str) -> None:
+        """
+        Record a successful call for a provider.
+        
+        Args:
+            provider_name: Name of the provider
+        """
+        self.get_breaker(provider_name).record_success()
+    
+    def record_failure(self, provider_name: str) -> None:
+        """
+        Record a failed call for a provider.
+        
+        Args:
+            provider_name: Name of the provider
+        """
+        self.get_breaker(provider_name).record_failure()
+    
     def get_provider_states(self) -> Dict[str, str]:
         """
         Get current state of all providers.
@@ -0,0 +1,131 @@
+"""
+Time-windowed coalescing of streamed chunks into fewer frames.
+
+Providers stream a few characters per chunk. Sending each one as its
+own WebSocket frame means thousands of small JSON frames per answer
+when several models stream at once. A ChunkCoalescer buffers one
+provider's chunks and sends them as one frame per time window, or
+sooner once the buffer reaches a byte limit.
+
+The first chunk after a quiet period is sent at once, so coalescing
+does not delay the first token. Frames keep the shape of a single
+chunk, so clients see no protocol change, only longer chunks.
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+
+
+class ChunkCoalescer:
+    """
+    Buffers one stream's chunks and sends them in windowed frames.
+    """
+    
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[Any]],
+        window: Optional[float] = None,
+        max_bytes: Optional[int] = None
+    ):
+        """
+        Initialize chunk coalescer.
+        
+        Args:
+            send: Sends one frame with the given content
+            window: Minimum seconds between frames; 0 sends every chunk (defaults to settings)
+            max_bytes: Buffered bytes that trigger a frame within the window (defaults to settings)
+        """
+        self.send = send
+        self.window = settings.STREAM_COALESCE_WINDOW if window is None else window
+        self.max_bytes = max_bytes or settings.STREAM_COALESCE_MAX_BYTES
+        self._parts: List[str] = []
+        self._size = 0
+        self._last_sent = float("-inf")
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+        self._error: Optional[BaseException] = None
+        self.frames = 0
+    
+    async def add(self, chunk: str) -> None:
+        """
+        Buffer a chunk, sending a frame if the window has passed or the buffer is full.
+        
+        Args:
+            chunk: Text chunk from the provider
+        """
+        self._raise_timer_error()
+        if not chunk:
+            return
+        self._parts.append(chunk)
+        self._size += len(chunk.encode("utf-8"))
+        
+        due = self._last_sent + self.window - time.monotonic()
+        if due <= 0 or self._size >= self.max_bytes:
+            await self.flush()
+        elif self._timer is None:
+            # Send what has accumulated once the window is over, even if no more chunks arrive
+            self._timer = asyncio.create_task(self._flush_after(due))
+    
+    async def flush(self) -> None:
+        """Send whatever is buffered as one frame."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        async with self._lock:
+            if not self._parts:
+                return
+            content = "".join(self._parts)
+            self._parts.clear()
+            self._size = 0
+            self._last_sent = time.monotonic()
+            self.frames += 1
+            await self.send(content)
+    
+    async def aclose(self) -> None:
+        """Send the rest of the buffer; call before reporting the stream complete."""
+        await self.flush()
+        self._raise_timer_error()
+    
+    def discard(self) -> None:
+        """Drop the buffer without sending it (e.g. the stream was cancelled)."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._parts.clear()
+        self._size = 0
+    
+    async def _flush_after(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self._timer = None
+        try:
+            await self.flush()
+        except Exception as e:
+            # Surfaced to the stream on its next add or aclose
+            self._error = e
+    
+    def _raise_timer_error(self) -> None:
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+
+def chunk_frame(provider: str, content: str) -> Dict[str, Any]:
+    """
+    Build a model_chunk message.
+    
+    Args:
+        provider: Provider name
+        content: Chunk text (possibly several coalesced chunks)
+    
+    Returns:
+        Message for WebSocket.send_json
+    """
+    return {
+        "type": "model_chunk",
+        "provider": provider,
+        "content": content,
+        "timestamp": time.time()
+    }
@@ -0,0 +1,265 @@
+"""
+Adaptive per-provider concurrency limiting.
+
+Each provider gets a limit on in-flight calls that follows AIMD
+(additive increase, multiplicative decrease): successful calls slowly
+raise the limit, rate-limit responses halve it, and calls much slower
+than usual trim it. Calls over the limit wait in a bounded queue.
+"""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Deque, Dict, Optional
+
+from app.clients.errors import ProviderOverloadedError
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    """
+    Check whether an error (or any error it was raised from) is an HTTP 429.
+    
+    Works with ProviderRateLimitError, httpx.HTTPStatusError and the
+    Anthropic/OpenAI SDK errors, which carry the status code on the
+    exception or its response.
+    """
+    seen = set()
+    current: Optional[BaseException] = error
+    while current is not None and id(current) not in seen:
+        seen.add(id(current))
+        status_code = getattr(current, "status_code", None)
+        if status_code is None:
+            response = getattr(current, "response", None)
+            status_code = getattr(response, "status_code", None)
+        if status_code == 429:
+            return True
+        current = current.__cause__ or current.__context__
+    return False
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limiter for a single provider.
+    """
+    
+    def __init__(
+        self,
+        name: str = "provider",
+        initial_limit: int = 10,
+        min_limit: int = 1,
+        max_limit: int = 50,
+        max_queue: int = 100,
+        backoff_ratio: float = 0.5,
+        latency_tolerance: float = 3.0,
+        latency_backoff_ratio: float = 0.9
+    ):
+        """
+        Initialize limiter.
+        
+        Args:
+            name: Provider name used in error messages
+            initial_limit: Starting number of concurrent calls
+            min_limit: Lowest the limit can drop to
+            max_limit: Highest the limit can grow to
+            max_queue: Maximum number of calls waiting for a slot
+            backoff_ratio: Multiplier applied to the limit on a 429
+            latency_tolerance: Calls slower than this multiple of the
+                smoothed latency trim the limit (0 disables)
+            latency_backoff_ratio: Multiplier applied on a slow call
+        """
+        self.name = name
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.latency_backoff_ratio = latency_backoff_ratio
+        self.in_flight = 0
+        self.smoothed_latency: Optional[float] = None
+        self.rate_limited_count = 0
+        self.rejected_count = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+    
+    @property
+    def current_limit(self) -> int:
+        """Whole number of calls currently allowed in flight"""
+        return max(self.min_limit, int(self.limit))
+    
+    @property
+    def queue_depth(self) -> int:
+        """Number of calls waiting for a slot"""
+        return sum(1 for waiter in self._waiters if not waiter.done())
+    
+    async def acquire(self) -> None:
+        """
+        Wait for a slot.
+        
+        Raises:
+            ProviderOverloadedError: If the wait queue is full
+        """
+        if self.in_flight < self.current_limit and not self.queue_depth:
+            self.in_flight += 1
+            return
+        
+        if self.queue_depth >= self.max_queue:
+            self.rejected_count += 1
+            raise ProviderOverloadedError(self.name)
+        
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # A slot was handed over just as we were cancelled; give it back
+                self.release()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+    
+    def release(self) -> None:
+        """Return a slot and wake waiters that now fit under the limit"""
+        self.in_flight = max(0, self.in_flight - 1)
+        self._wake_waiters()
+    
+    def _wake_waiters(self) -> None:
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+    
+    def on_success(self, latency: Optional[float] = None) -> None:
+        """
+        Adjust the limit after a successful call.
+        
+        Args:
+            latency: Call latency in seconds, if it should be used as a signal
+        """
+        if latency is not None:
+            slow = (
+                self.latency_tolerance > 0
+                and self.smoothed_latency is not None
+                and latency > self.smoothed_latency * self.latency_tolerance
+            )
+            self.smoothed_latency = (
+                latency if self.smoothed_latency is None
+                else 0.9 * self.smoothed_latency + 0.1 * latency
+            )
+            if slow:
+                self.limit = max(self.min_limit, self.limit * self.latency_backoff_ratio)
+                return
+        
+        # Additive increase: roughly +1 per limit's worth of successful calls
+        self.limit = min(self.max_limit, self.limit + 1 / max(self.limit, 1))
+        self._wake_waiters()
+    
+    def on_rate_limited(self) -> None:
+        """Multiplicative decrease after a 429"""
+        self.rate_limited_count += 1
+        self.limit = max(self.min_limit, self.limit * self.backoff_ratio)
+    
+    @asynccontextmanager
+    async def slot(self, track_latency: bool = True) -> AsyncIterator[None]:
+        """
+        Hold a slot for the duration of a call and feed the outcome back.
+        
+        Args:
+            track_latency: Whether the call's latency is a useful signal
+        """
+        await self.acquire()
+        start_time = time.monotonic()
+        try:
+            yield
+        except Exception as e:
+            if is_rate_limit_error(e):
+                self.on_rate_limited()
+            raise
+        else:
+            self.on_success(time.monotonic() - start_time if track_latency else None)
+        finally:
+            self.release()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current limit, in-flight calls and queue depth"""
+        return {
+            "limit": self.current_limit,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "rate_limited": self.rate_limited_count,
+            "rejected": self.rejected_count
+        }
+
+
+class ProviderConcurrencyManager:
+    """
+    Manages adaptive concurrency limiters for all AI providers.
+    """
+    
+    def __init__(self, **limiter_kwargs):
+        """
+        Initialize manager.
+        
+        Args:
+            **limiter_kwargs: Overrides for AdaptiveConcurrencyLimiter settings
+        """
+        self.limiter_kwargs = {
+            "initial_limit": settings.LIMITER_INITIAL_LIMIT,
+            "min_limit": settings.LIMITER_MIN_LIMIT,
+            "max_limit": settings.LIMITER_MAX_LIMIT,
+            "max_queue": settings.LIMITER_MAX_QUEUE,
+            "backoff_ratio": settings.LIMITER_BACKOFF_RATIO,
+            "latency_tolerance": settings.LIMITER_LATENCY_TOLERANCE,
+        }
+        self.limiter_kwargs.update(limiter_kwargs)
+        self.limiters: Dict[str, AdaptiveConcurrencyLimiter] = {}
+    
+    def get_limiter(self, provider_name: str) -> AdaptiveConcurrencyLimiter:
+        """Get or create the limiter for a provider"""
+        if provider_name not in self.limiters:
+            self.limiters[provider_name] = AdaptiveConcurrencyLimiter(
+                name=provider_name,
+                **self.limiter_kwargs
+            )
+        return self.limiters[provider_name]
+    
+    def slot(self, provider_name: str, track_latency: bool = True):
+        """Hold a concurrency slot for a provider call"""
+        return self.get_limiter(provider_name).slot(track_latency)
+    
+    def wrap(self, provider_name: str, func: Callable) -> Callable:
+        """
+        Wrap an async function so every call holds a slot.
+        
+        Args:
+            provider_name: Name of the provider
+            func: Async function to wrap
+            
+        Returns:
+            Wrapped async function
+        """
+        async def limited(*args, **kwargs) -> Any:
+            async with self.slot(provider_name):
+                return await func(*args, **kwargs)
+        return limited
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get limiter stats for every provider seen so far"""
+        return {
+            provider: limiter.get_stats()
+            for provider, limiter in self.limiters.items()
+        }
+
+
+# Global concurrency manager instance
+concurrency_manager = ProviderConcurrencyManager()
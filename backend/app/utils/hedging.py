@@ -0,0 +1,232 @@
+"""
+Hedged requests for AI providers.
+
+When a provider call takes longer than that provider's recent high
+percentile latency, a second identical request is sent and whichever
+finishes first wins. The loser is cancelled. Hedges are limited by a
+budget so they add at most a fixed percentage of extra traffic.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Optional
+
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class LatencyHistogram:
+    """
+    Rolling window of recent successful call latencies for one provider.
+    """
+    
+    def __init__(self, window_size: int = 200):
+        """
+        Initialize histogram.
+        
+        Args:
+            window_size: Number of most recent samples to keep
+        """
+        self.samples: Deque[float] = deque(maxlen=window_size)
+        self._sorted: Optional[list] = None
+    
+    def record(self, latency: float) -> None:
+        """Record a latency sample in seconds"""
+        self.samples.append(latency)
+        self._sorted = None
+    
+    def __len__(self) -> int:
+        return len(self.samples)
+    
+    def percentile(self, percentile: float) -> Optional[float]:
+        """
+        Get a latency percentile from the current window.
+        
+        Args:
+            percentile: Percentile between 0 and 100
+            
+        Returns:
+            Latency in seconds, or None if there are no samples
+        """
+        if not self.samples:
+            return None
+        if self._sorted is None:
+            self._sorted = sorted(self.samples)
+        index = min(len(self._sorted) - 1, max(0, math.ceil(percentile / 100 * len(self._sorted)) - 1))
+        return self._sorted[index]
+
+
+class HedgeBudget:
+    """
+    Token bucket that limits hedges to a percentage of primary requests.
+    
+    Each primary request deposits budget_percent / 100 tokens and each
+    hedge spends one token, so over time hedges never exceed that share
+    of traffic.
+    """
+    
+    def __init__(self, budget_percent: float, max_tokens: float = 10.0):
+        """
+        Initialize budget.
+        
+        Args:
+            budget_percent: Extra traffic allowed for hedges, as a percentage
+            max_tokens: Maximum number of hedges that can be saved up
+        """
+        self.ratio = budget_percent / 100
+        self.max_tokens = max_tokens
+        self.tokens = 0.0
+    
+    def on_request(self) -> None:
+        """Deposit tokens for a primary request"""
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+    
+    def try_spend(self) -> bool:
+        """Spend one token for a hedge if available"""
+        # Small tolerance so fractional deposits (e.g. 10 x 0.1) add up to a hedge
+        if self.tokens >= 1.0 - 1e-9:
+            self.tokens = max(0.0, self.tokens - 1.0)
+            return True
+        return False
+
+
+class RequestHedger:
+    """
+    Issues hedged requests for providers that have hedging enabled.
+    """
+    
+    def __init__(
+        self,
+        providers: Optional[Iterable[str]] = None,
+        percentile: Optional[float] = None,
+        budget_percent: Optional[float] = None,
+        min_samples: Optional[int] = None,
+        window_size: int = 200
+    ):
+        """
+        Initialize hedger.
+        
+        Args:
+            providers: Provider names hedging is enabled for (defaults to settings)
+            percentile: Latency percentile after which a hedge is sent
+            budget_percent: Extra traffic allowed for hedges, as a percentage
+            min_samples: Samples required before a provider can be hedged
+            window_size: Number of latency samples kept per provider
+        """
+        self.providers = set(settings.hedge_providers_list if providers is None else providers)
+        self.percentile = percentile or settings.HEDGE_PERCENTILE
+        self.budget_percent = settings.HEDGE_BUDGET_PERCENT if budget_percent is None else budget_percent
+        self.min_samples = settings.HEDGE_MIN_SAMPLES if min_samples is None else min_samples
+        self.window_size = window_size
+        self.histograms: Dict[str, LatencyHistogram] = {}
+        self.budgets: Dict[str, HedgeBudget] = {}
+        self.hedges_sent: Dict[str, int] = {}
+        self.hedges_won: Dict[str, int] = {}
+    
+    def get_histogram(self, provider_name: str) -> LatencyHistogram:
+        """Get or create the latency histogram for a provider"""
+        if provider_name not in self.histograms:
+            self.histograms[provider_name] = LatencyHistogram(self.window_size)
+        return self.histograms[provider_name]
+    
+    def get_budget(self, provider_name: str) -> HedgeBudget:
+        """Get or create the hedge budget for a provider"""
+        if provider_name not in self.budgets:
+            self.budgets[provider_name] = HedgeBudget(self.budget_percent)
+        return self.budgets[provider_name]
+    
+    def hedge_delay(self, provider_name: str) -> Optional[float]:
+        """
+        Get how long to wait before hedging a call to this provider.
+        
+        Returns:
+            Delay in seconds, or None if the provider should not be hedged
+        """
+        if provider_name not in self.providers:
+            return None
+        histogram = self.get_histogram(provider_name)
+        if len(histogram) < self.min_samples:
+            return None
+        return histogram.percentile(self.percentile)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get hedging statistics per provider.
+        
+        Returns:
+            Dict mapping provider names to hedge delay and counters
+        """
+        stats = {}
+        for provider, histogram in self.histograms.items():
+            delay = self.hedge_delay(provider)
+            stats[provider] = {
+                "enabled": provider in self.providers,
+                "hedge_delay_ms": delay * 1000 if delay is not None else None,
+                "samples": len(histogram),
+                "hedges_sent": self.hedges_sent.get(provider, 0),
+                "hedges_won": self.hedges_won.get(provider, 0)
+            }
+        return stats
+    
+    async def call(
+        self,
+        provider_name: str,
+        func: Callable,
+        *args,
+        **kwargs
+    ) -> Any:
+        """
+        Call func, sending a hedged duplicate if it is slower than usual.
+        
+        Args:
+            provider_name: Name of the provider being called
+            func: Async function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+            
+        Returns:
+            Result of whichever call finished first
+            
+        Raises:
+            Exception: If every attempt fails
+        """
+        start_time = time.monotonic()
+        delay = self.hedge_delay(provider_name)
+        budget = self.get_budget(provider_name)
+        budget.on_request()
+        
+        primary = asyncio.ensure_future(func(*args, **kwargs))
+        pending = {primary}
+        hedge = None
+        
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait(pending, timeout=delay)
+                if not done and budget.try_spend():
+                    hedge = asyncio.ensure_future(func(*args, **kwargs))
+                    pending.add(hedge)
+                    self.hedges_sent[provider_name] = self.hedges_sent.get(provider_name, 0) + 1
+                    logger.info(f"Hedging {provider_name} request after {delay * 1000:.0f} ms")
+            
+            error: Optional[BaseException] = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedges_won[provider_name] = self.hedges_won.get(provider_name, 0) + 1
+                        self.get_histogram(provider_name).record(time.monotonic() - start_time)
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+
+# Global hedger instance
+request_hedger = RequestHedger()
@@ -0,0 +1,182 @@
+"""
+Cross-worker cache invalidation over Redis pub/sub.
+
+In-process caches register a handler for a topic (e.g. "system_prompts").
+invalidate() runs the local handlers immediately and publishes the event
+so every other worker runs its handlers too. Pub/sub is fire-and-forget:
+if Redis is unavailable invalidation stays local, so caches that rely on
+this bus should also expire entries on their own after a while.
+"""
+
+import asyncio
+import json
+import uuid
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # pragma: no cover - redis is in requirements.txt
+    aioredis = None
+
+
+InvalidationHandler = Callable[[Optional[str]], None]
+
+
+class InvalidationBus:
+    """
+    Dispatches invalidation events locally and across workers.
+    """
+    
+    def __init__(
+        self,
+        redis_url: Optional[str] = None,
+        channel: Optional[str] = None,
+        enabled: Optional[bool] = None
+    ):
+        """
+        Initialize invalidation bus.
+        
+        Args:
+            redis_url: Redis connection URL (defaults to settings)
+            channel: Pub/sub channel name (defaults to settings)
+            enabled: Whether to publish/subscribe via Redis (defaults to settings)
+        """
+        self.redis_url = redis_url or settings.REDIS_URL
+        self.channel = channel or settings.CACHE_INVALIDATION_CHANNEL
+        self.enabled = settings.CACHE_INVALIDATION_ENABLED if enabled is None else enabled
+        self.instance_id = uuid.uuid4().hex
+        self._handlers: Dict[str, List[InvalidationHandler]] = {}
+        self._redis = None
+        self._listener: Optional[asyncio.Task] = None
+    
+    def register(self, topic: str, handler: InvalidationHandler) -> None:
+        """
+        Register a handler to run when a topic is invalidated.
+        
+        Args:
+            topic: Topic name
+            handler: Called with the invalidated key (None means everything)
+        """
+        self._handlers.setdefault(topic, []).append(handler)
+    
+    def dispatch(self, topic: str, key: Optional[str] = None) -> None:
+        """
+        Run the local handlers for a topic.
+        
+        Args:
+            topic: Topic name
+            key: Invalidated key, or None for the whole topic
+        """
+        for handler in self._handlers.get(topic, []):
+            try:
+                handler(key)
+            except Exception as e:
+                logger.error(f"Invalidation handler for {topic} failed: {e}", exc_info=True)
+    
+    async def invalidate(self, topic: str, key: Optional[str] = None) -> None:
+        """
+        Invalidate a topic in this worker and publish it to the others.
+        
+        Args:
+            topic: Topic name
+            key: Invalidated key, or None for the whole topic
+        """
+        self.dispatch(topic, key)
+        await self.publish(topic, key)
+    
+    async def publish(self, topic: str, key: Optional[str] = None) -> None:
+        """
+        Invalidate a topic in the other workers only.
+        
+        For caches that have already brought their own copy up to date.
+        
+        Args:
+            topic: Topic name
+            key: Invalidated key, or None for the whole topic
+        """
+        client = self._get_redis()
+        if client is None:
+            return
+        message = json.dumps({"origin": self.instance_id, "topic": topic, "key": key})
+        try:
+            await client.publish(self.channel, message)
+        except Exception as e:
+            logger.warning(f"Could not publish invalidation for {topic}: {e}")
+    
+    def handle_message(self, data) -> None:
+        """
+        Handle a raw pub/sub message from another worker.
+        
+        Args:
+            data: Message payload (JSON string or bytes)
+        """
+        try:
+            event = json.loads(data)
+        except (TypeError, ValueError):
+            logger.warning(f"Ignoring malformed invalidation message: {data!r}")
+            return
+        if event.get("origin") == self.instance_id:
+            return
+        self.dispatch(event.get("topic"), event.get("key"))
+    
+    async def start(self) -> None:
+        """Start listening for invalidations from other workers."""
+        if self._get_redis() is None or self._listener is not None:
+            return
+        self._listener = asyncio.create_task(self._listen())
+    
+    async def stop(self) -> None:
+        """Stop listening and close the Redis connection."""
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+        if self._redis is not None:
+            await self._redis.aclose()
+            self._redis = None
+    
+    def _get_redis(self):
+        """Get the Redis client, or None if cross-worker invalidation is off."""
+        if not self.enabled or not self.redis_url or aioredis is None:
+            return None
+        if self._redis is None:
+            self._redis = aioredis.from_url(
+                self.redis_url,
+                decode_responses=True,
+                socket_connect_timeout=1
+            )
+        return self._redis
+    
+    async def _listen(self) -> None:
+        """Subscribe to the channel, reconnecting with backoff on errors."""
+        delay = 1.0
+        while True:
+            try:
+                pubsub = self._redis.pubsub()
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Listening for cache invalidations on {self.channel}")
+                delay = 1.0
+                try:
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self.handle_message(message.get("data"))
+                finally:
+                    await pubsub.aclose()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Invalidation listener error, retrying in {delay:.0f}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 30.0)
+
+
+# Global invalidation bus instance
+invalidation_bus = InvalidationBus()
@@ -1,15 +1,168 @@
 """
 Structured logging configuration
+
+Records carry request-scoped context (request ID, conversation ID,
+provider) from a context variable, so it follows a request into the
+tasks it starts without being passed around. RequestContextMiddleware
+opens the context for each HTTP request and WebSocket connection;
+code that learns more about the request adds to it with
+bind_log_context or log_context.
+
+DEBUG records are sampled: whether a request's debug records are kept
+is decided once per request, so a kept request is logged completely.
+At INFO level and above, logger.debug returns before a record is built;
+guard debug arguments that are costly to compute with
+logger.isEnabledFor(logging.DEBUG).
 """
 
 import logging
 import logging.config
 import json
+import random
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar, Token
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, Iterator, Optional
 import sys
 
 
+# Request-scoped fields added to every record
+_log_context: ContextVar[Dict[str, Any]] = ContextVar("log_context", default={})
+
+# Whether the current request's DEBUG records are kept (None: decide per record)
+_debug_sampled: ContextVar[Optional[bool]] = ContextVar("debug_sampled", default=None)
+
+
+def get_log_context() -> Dict[str, Any]:
+    """Get the current request-scoped logging fields."""
+    return dict(_log_context.get())
+
+
+def bind_log_context(**fields) -> Token:
+    """
+    Add fields to the logging context for the rest of the current task.
+    
+    Tasks started afterwards inherit them.
+    
+    Args:
+        **fields: Fields to add (e.g. conversation_id=12)
+    
+    Returns:
+        Token that restores the previous context when passed to reset_log_context
+    """
+    return _log_context.set({**_log_context.get(), **fields})
+
+
+def reset_log_context(token: Token) -> None:
+    """Restore the logging context from before a bind_log_context call."""
+    _log_context.reset(token)
+
+
+@contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """
+    Add fields to the logging context within a block.
+    
+    Args:
+        **fields: Fields to add (e.g. provider="claude")
+    """
+    token = bind_log_context(**fields)
+    try:
+        yield
+    finally:
+        reset_log_context(token)
+
+
+class ContextFilter(logging.Filter):
+    """Attaches the request-scoped logging context to records."""
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.context = _log_context.get()
+        return True
+
+
+class DebugSampler(logging.Filter):
+    """
+    Keeps a fraction of DEBUG records; other levels always pass.
+    
+    Within a request the decision made by request_log_context is used for all
+    of its records; elsewhere each record is sampled on its own.
+    """
+    
+    def __init__(self, rate: float = 1.0):
+        super().__init__()
+        self.rate = rate
+    
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        sampled = _debug_sampled.get()
+        if sampled is None:
+            return random.random() < self.rate
+        return sampled
+
+
+# Sample rate configured by setup_logging
+_debug_sample_rate = 1.0
+
+
+@contextmanager
+def request_log_context(request_id: Optional[str] = None, **fields) -> Iterator[str]:
+    """
+    Open the logging context for one request and make its sampling decision.
+    
+    Args:
+        request_id: The caller's request ID, or None to generate one
+        **fields: Further fields to add
+    
+    Yields:
+        The request ID
+    """
+    request_id = request_id or uuid.uuid4().hex[:16]
+    context_token = bind_log_context(request_id=request_id, **fields)
+    sampled_token = _debug_sampled.set(random.random() < _debug_sample_rate)
+    try:
+        yield request_id
+    finally:
+        _debug_sampled.reset(sampled_token)
+        reset_log_context(context_token)
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware that gives every HTTP request and WebSocket connection
+    a request ID and a logging context.
+    
+    The ID is taken from the X-Request-ID header if the client sent one
+    and is echoed back on HTTP responses.
+    """
+    
+    header = b"x-request-id"
+    
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+        
+        incoming = dict(scope.get("headers") or []).get(self.header)
+        # Untrusted input: keep it short and printable
+        request_id = incoming.decode("latin-1")[:64] if incoming and incoming.isascii() else None
+        
+        with request_log_context(request_id) as request_id:
+            async def send_with_request_id(message):
+                if message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((self.header, request_id.encode("latin-1")))
+                    message = {**message, "headers": headers}
+                await send(message)
+            
+            await self.app(scope, receive, send_with_request_id)
+
+
 class StructuredFormatter(logging.Formatter):
     """Custom formatter that outputs structured JSON logs"""
     
@@ -25,6 +178,11 @@ class StructuredFormatter(logging.Formatter):
             "line": record.lineno
         }
         
+        # Add request-scoped context (set by ContextFilter)
+        context = getattr(record, "context", None)
+        if context:
+            log_data.update(context)
+        
         # Add exception info if present
         if record.exc_info:
             log_data["exception"] = self.formatException(record.exc_info)
@@ -36,14 +194,18 @@ class StructuredFormatter(logging.Formatter):
         return json.dumps(log_data)
 
 
-def setup_logging(level: str = "INFO", json_logs: bool = True):
+def setup_logging(level: str = "INFO", json_logs: bool = True, debug_sample_rate: float = 1.0):
     """
     Configure structured logging for the application.
     
     Args:
         level: Logging level (DEBUG, INFO, WARNING, ERROR, CRITICAL)
         json_logs: Whether to output JSON formatted logs
+        debug_sample_rate: Fraction of requests whose DEBUG records are kept
     """
+    global _debug_sample_rate
+    _debug_sample_rate = debug_sample_rate
+    
     config = {
         "version": 1,
         "disable_existing_loggers": False,
@@ -52,7 +214,16 @@ def setup_logging(level: str = "INFO", json_logs: bool = True):
                 "()": StructuredFormatter
             },
             "simple": {
-                "format": "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+                "format": "%(asctime)s - %(name)s - %(levelname)s - %(context)s - %(message)s"
+            }
+        },
+        "filters": {
+            "context": {
+                "()": ContextFilter
+            },
+            "debug_sampler": {
+                "()": DebugSampler,
+                "rate": debug_sample_rate
             }
         },
         "handlers": {
@@ -60,6 +231,7 @@ def setup_logging(level: str = "INFO", json_logs: bool = True):
                 "class": "logging.StreamHandler",
                 "level": level,
                 "formatter": "structured" if json_logs else "simple",
+                "filters": ["debug_sampler", "context"],
                 "stream": sys.stdout
             }
         },
@@ -0,0 +1,212 @@
+"""
+Single-flight coalescing of identical in-flight provider calls.
+
+When several users (or browser tabs) send the same prompt with the same
+history and system prompt at the same moment, only the first caller makes
+the upstream request; the others wait for it and share its result. For
+streaming calls every subscriber receives the same chunks, including any
+that arrived before it joined. Nothing is cached once the call finishes.
+"""
+
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncGenerator, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.logging import get_logger
+
+logger = get_logger(__name__)
+
+
+def request_key(
+    provider: str,
+    model: str,
+    system_prompt: Optional[str],
+    history: Optional[List[Dict[str, str]]],
+    prompt: str
+) -> str:
+    """
+    Build the coalescing key for a provider request.
+    
+    Args:
+        provider: Name of the provider
+        model: Model name used by the client
+        system_prompt: System prompt sent with the request
+        history: Conversation history sent with the request
+        prompt: The user prompt
+    
+    Returns:
+        Hex SHA-256 digest identifying the request
+    """
+    payload = json.dumps(
+        [provider, model, system_prompt, history or [], prompt],
+        sort_keys=True,
+        ensure_ascii=False,
+        separators=(",", ":")
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _Call:
+    """A shared in-flight call and the number of callers waiting on it"""
+    
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class _Stream:
+    """A shared in-flight stream with its buffered chunks"""
+    
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+    
+    def notify(self) -> None:
+        """Wake every subscriber waiting for new chunks."""
+        self._changed.set()
+        self._changed = asyncio.Event()
+    
+    async def wait(self) -> None:
+        """Wait until a chunk arrives or the stream finishes."""
+        await self._changed.wait()
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent calls into one upstream request.
+    
+    The shared request keeps running as long as at least one caller is
+    waiting on it; it is cancelled when the last caller goes away.
+    """
+    
+    def __init__(self, enabled: Optional[bool] = None):
+        """
+        Initialize single-flight group.
+        
+        Args:
+            enabled: Whether to coalesce calls (defaults to settings)
+        """
+        self.enabled = settings.SINGLE_FLIGHT_ENABLED if enabled is None else enabled
+        self._calls: Dict[str, _Call] = {}
+        self._streams: Dict[str, _Stream] = {}
+    
+    @property
+    def in_flight(self) -> int:
+        """Number of distinct shared calls and streams currently running"""
+        return len(self._calls) + len(self._streams)
+    
+    async def call(self, key: str, func: Callable, *args, **kwargs) -> Any:
+        """
+        Call an async function, sharing the result with identical in-flight calls.
+        
+        Args:
+            key: Coalescing key (see request_key)
+            func: Async function to call
+            *args: Positional arguments for func
+            **kwargs: Keyword arguments for func
+        
+        Returns:
+            Result of func (the same object for every coalesced caller)
+        """
+        if not self.enabled:
+            return await func(*args, **kwargs)
+        
+        flight = self._calls.get(key)
+        if flight is None:
+            flight = _Call(asyncio.ensure_future(func(*args, **kwargs)))
+            self._calls[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(self._calls, key, flight))
+        else:
+            logger.debug(f"Coalesced identical in-flight call {key[:12]}")
+        
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+    
+    async def stream(
+        self,
+        key: str,
+        stream_factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> AsyncGenerator[str, None]:
+        """
+        Iterate a stream, sharing it with identical in-flight streams.
+        
+        Late subscribers first receive every chunk already produced, so all
+        subscribers see the same sequence. An upstream error is raised to
+        every subscriber after the chunks that preceded it.
+        
+        Args:
+            key: Coalescing key (see request_key)
+            stream_factory: Callable that starts the upstream stream
+        
+        Yields:
+            Chunks from the shared stream
+        """
+        if not self.enabled:
+            async for chunk in stream_factory():
+                yield chunk
+            return
+        
+        flight = self._streams.get(key)
+        if flight is None:
+            flight = _Stream()
+            self._streams[key] = flight
+            flight.task = asyncio.ensure_future(self._produce(key, flight, stream_factory))
+        else:
+            logger.debug(f"Coalesced identical in-flight stream {key[:12]}")
+        
+        flight.subscribers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(flight.chunks):
+                    yield flight.chunks[position]
+                    position += 1
+                if flight.done:
+                    if flight.error is not None:
+                        raise flight.error
+                    return
+                await flight.wait()
+        finally:
+            flight.subscribers -= 1
+            if flight.subscribers == 0 and not flight.done:
+                self._forget(self._streams, key, flight)
+                flight.task.cancel()
+    
+    async def _produce(
+        self,
+        key: str,
+        flight: _Stream,
+        stream_factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> None:
+        """Pump the upstream stream into the shared buffer."""
+        try:
+            async for chunk in stream_factory():
+                flight.chunks.append(chunk)
+                flight.notify()
+        except Exception as e:
+            flight.error = e
+        finally:
+            flight.done = True
+            self._forget(self._streams, key, flight)
+            flight.notify()
+    
+    @staticmethod
+    def _forget(registry: Dict[str, Any], key: str, flight: Any) -> None:
+        """Drop a finished flight unless a newer one has taken its key."""
+        if registry.get(key) is flight:
+            del registry[key]
+
+
+# Global single-flight instance
+single_flight = SingleFlight()
@@ -0,0 +1,165 @@
+"""
+Frame encodings for the /stream/chat WebSocket.
+
+JSON text frames are the default. Clients that request the
+"chat.msgpack.v1" subprotocol when connecting get MessagePack binary
+frames instead, in which:
+
+- field names are short keys (STREAM_FIELD_KEYS, e.g. "type" -> "t")
+- event types and provider names are small integers
+  (STREAM_EVENT_CODES, STREAM_PROVIDER_CODES)
+- timestamps are integer milliseconds since the epoch
+
+Other fields keep their names and values. Clients on the binary
+protocol may send requests as MessagePack or JSON; "models" and
+"provider" may use provider codes or names, and "type" an event code or
+name. GET /stream/protocol returns the code tables.
+"""
+
+import json
+from typing import Any, Dict, List, Optional, Union
+
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from app.constants import (
+    STREAM_EVENT_CODES,
+    STREAM_FIELD_KEYS,
+    STREAM_MSGPACK_SUBPROTOCOL,
+    STREAM_PROVIDER_CODES,
+)
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - msgpack is in requirements.txt
+    msgpack = None
+
+_PROVIDER_NAMES = {code: name for name, code in STREAM_PROVIDER_CODES.items()}
+_EVENT_NAMES = {code: name for name, code in STREAM_EVENT_CODES.items()}
+
+
+class JsonCodec:
+    """JSON text frames (the default protocol)."""
+    
+    subprotocol: Optional[str] = None
+    binary = False
+    
+    def encode(self, message: Dict[str, Any]) -> str:
+        # Same encoding as WebSocket.send_json
+        return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+    
+    def decode(self, data: Union[str, bytes]) -> Any:
+        return json.loads(data)
+
+
+class MsgPackCodec:
+    """MessagePack binary frames with integer codes."""
+    
+    subprotocol = STREAM_MSGPACK_SUBPROTOCOL
+    binary = True
+    
+    def encode(self, message: Dict[str, Any]) -> bytes:
+        frame = {}
+        for field, value in message.items():
+            if field == "type":
+                value = STREAM_EVENT_CODES.get(value, value)
+            elif field == "provider":
+                value = STREAM_PROVIDER_CODES.get(value, value)
+            elif field == "timestamp":
+                value = int(value * 1000)
+            frame[STREAM_FIELD_KEYS.get(field, field)] = value
+        return msgpack.packb(frame)
+    
+    def decode(self, data: Union[str, bytes]) -> Any:
+        request = json.loads(data) if isinstance(data, str) else msgpack.unpackb(data)
+        if not isinstance(request, dict):
+            return request
+        if isinstance(request.get("models"), list):
+            request["models"] = [_PROVIDER_NAMES.get(model, model) for model in request["models"]]
+        if isinstance(request.get("provider"), int):
+            request["provider"] = _PROVIDER_NAMES.get(request["provider"], request["provider"])
+        if isinstance(request.get("type"), int):
+            request["type"] = _EVENT_NAMES.get(request["type"], request["type"])
+        return request
+
+
+def negotiate_codec(requested: List[str]) -> Union[JsonCodec, MsgPackCodec]:
+    """
+    Pick the frame encoding for a connection.
+    
+    Args:
+        requested: Subprotocols the client offered, in its order of preference
+    
+    Returns:
+        MsgPackCodec if offered (and available), otherwise JsonCodec
+    """
+    if msgpack is not None and STREAM_MSGPACK_SUBPROTOCOL in requested:
+        return MsgPackCodec()
+    return JsonCodec()
+
+
+class FramedWebSocket:
+    """
+    A WebSocket that sends and receives messages in the negotiated encoding.
+    
+    Offers the send_json/receive_json subset the stream handler uses, so
+    the handler does not depend on the encoding.
+    """
+    
+    def __init__(self, websocket: WebSocket, codec: Union[JsonCodec, MsgPackCodec]):
+        self.websocket = websocket
+        self.codec = codec
+    
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        """Send a message as one frame."""
+        frame = self.codec.encode(message)
+        if self.codec.binary:
+            await self.websocket.send_bytes(frame)
+        else:
+            await self.websocket.send_text(frame)
+    
+    async def receive_json(self) -> Any:
+        """Receive one message, text or binary."""
+        message = await self.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000), message.get("reason"))
+        data = message.get("text")
+        if data is None:
+            data = message.get("bytes")
+        return self.codec.decode(data)
+    
+    async def close(self, code: int = 1000) -> None:
+        await self.websocket.close(code)
+
+
+class TaggedWebSocket:
+    """
+    One request's view of a multiplexed stream WebSocket.
+    
+    Adds the client's request_id to every message it sends, so clients
+    running several prompts at once can tell their events apart.
+    """
+    
+    def __init__(self, websocket: FramedWebSocket, request_id: Union[str, int]):
+        self.websocket = websocket
+        self.request_id = request_id
+    
+    async def send_json(self, message: Dict[str, Any]) -> None:
+        """Send a message tagged with the request id."""
+        await self.websocket.send_json({**message, "request_id": self.request_id})
+
+
+def protocol_description() -> Dict[str, Any]:
+    """
+    Describe the binary protocol for clients.
+    
+    Returns:
+        Subprotocol name, availability and code tables
+    """
+    return {
+        "subprotocol": STREAM_MSGPACK_SUBPROTOCOL,
+        "available": msgpack is not None,
+        "fields": STREAM_FIELD_KEYS,
+        "event_types": STREAM_EVENT_CODES,
+        "providers": STREAM_PROVIDER_CODES,
+        "timestamp": "milliseconds since the epoch",
+    }
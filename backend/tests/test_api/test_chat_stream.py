@@ -0,0 +1,207 @@
+"""
+Tests for the streamed-as-completed chat endpoint.
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import httpx
+import pytest
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import chat
+from app.clients.base import BaseAIClient
+from app.database import get_db
+from app.main import app
+from app.models.message import ModelProvider
+from app.schemas.chat import ChatRequest
+from app.services import chat_service
+from app.utils.cancellation import cancellation_registry
+from app.utils.logging import log_context
+
+
+class DelayedClient(BaseAIClient):
+    """Answers after a fixed delay, or fails if no answer is given."""
+
+    def __init__(self, delay: float, answer: str = None):
+        super().__init__("test-key")
+        self.delay = delay
+        self.answer = answer
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        await asyncio.sleep(self.delay)
+        if self.answer is None:
+            raise ValueError("no answer")
+        return self.answer
+
+    def get_model_name(self) -> str:
+        return f"delayed-{self.delay}"
+
+
+class GatedClient(BaseAIClient):
+    """Answers once the gate is opened."""
+
+    def __init__(self, gate: asyncio.Event):
+        super().__init__("test-key")
+        self.gate = gate
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        await self.gate.wait()
+        return "gated answer"
+
+    def get_model_name(self) -> str:
+        return "gated"
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Stub out persistence and return the responses passed to save_assistant_responses."""
+    saved_responses = []
+
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=7)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=11)
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        saved_responses.extend(responses)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompts(db):
+        return {}
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(chat_service, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat, "async_session", fake_session)
+    monkeypatch.setattr(chat_service, "async_session", fake_session)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service.system_prompt_service, "get_system_prompts", fake_system_prompts)
+
+    app.dependency_overrides[get_db] = lambda: None
+    app.dependency_overrides[get_ai_clients] = lambda: {
+        ModelProvider.GROK: DelayedClient(0.2, "slow answer"),
+        ModelProvider.PERPLEXITY: DelayedClient(0.01, "fast answer"),
+        ModelProvider.GEMINI: DelayedClient(0.05),
+    }
+    yield saved_responses
+    app.dependency_overrides.clear()
+
+
+async def post_stream(headers=None) -> httpx.Response:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.post(
+            "/api/v1/chat/stream",
+            json={"prompt": "Hello", "models": ["grok", "perplexity", "gemini"]},
+            headers=headers
+        )
+
+
+@pytest.mark.asyncio
+async def test_ndjson_records_arrive_in_completion_order(saved):
+    response = await post_stream()
+
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    records = [json.loads(line) for line in response.text.splitlines()]
+
+    assert [r["type"] for r in records] == [
+        "conversation_info", "model_response", "model_response", "model_response", "summary"
+    ]
+    assert records[0]["conversation_id"] == 7
+    assert [r["provider"] for r in records[1:4]] == ["perplexity", "gemini", "grok"]
+    assert records[1]["content"] == "fast answer"
+    assert records[2]["error"]
+
+    summary = records[-1]
+    assert summary["user_message_id"] == 11
+    assert summary["succeeded"] == ["perplexity", "grok"]
+    assert summary["failed"] == ["gemini"]
+    assert len(saved) == 3
+
+
+@pytest.mark.asyncio
+async def test_server_sent_events_when_requested(saved):
+    response = await post_stream(headers={"Accept": "text/event-stream"})
+
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    names = [block.splitlines()[0] for block in events]
+
+    assert names[0] == "event: conversation_info"
+    assert names[-1] == "event: summary"
+    assert names.count("event: model_response") == 3
+    first_response = json.loads(events[1].splitlines()[1][len("data: "):])
+    assert first_response["provider"] == "perplexity"
+
+
+@pytest.mark.asyncio
+async def test_cancelling_one_model_stops_it(saved):
+    clients = {
+        # Grok never answers on its own, so only the cancel can end it
+        ModelProvider.GROK: GatedClient(asyncio.Event()),
+        ModelProvider.PERPLEXITY: DelayedClient(0.01, "fast answer"),
+    }
+    with log_context(request_id="req-1"):
+        response = await chat.send_chat_stream(
+            ChatRequest(prompt="Hello", models=["grok", "perplexity"]),
+            SimpleNamespace(headers={}), None, clients
+        )
+
+    # The test client buffers whole bodies, so the body is read here directly
+    body = response.body_iterator
+    records = [json.loads(await body.__anext__())]
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        # The request is registered before its first record is sent
+        cancelled = await client.post("/api/v1/chat/req-1/cancel", params={"provider": "grok"})
+        records += [json.loads(record) async for record in body]
+        await response.background()
+        unknown = await client.post("/api/v1/chat/req-1/cancel")
+
+    assert cancelled.json() == {"request_id": "req-1", "provider": "grok", "cancelled": True}
+    assert records[0]["type"] == "conversation_info"
+    assert records[0]["request_id"] == "req-1"
+    grok = [r for r in records if r["type"] == "model_response" and r["provider"] == "grok"]
+    assert [r["status"] for r in grok] == ["cancelled"]
+
+    summary = records[-1]
+    assert summary["succeeded"] == ["perplexity"]
+    assert summary["cancelled"] == ["grok"]
+    # The request is over, so there is nothing left to cancel
+    assert unknown.status_code == 404
+
+
+@pytest.mark.asyncio
+async def test_response_cleans_up_when_the_body_never_runs(saved, monkeypatch):
+    turns = []
+    start_chat_turn = chat_service.start_chat_turn
+
+    async def recording_start_chat_turn(*args, **kwargs):
+        turns.append(await start_chat_turn(*args, **kwargs))
+        return turns[-1]
+
+    monkeypatch.setattr(chat_service, "start_chat_turn", recording_start_chat_turn)
+    clients = {ModelProvider.GROK: DelayedClient(10, "never sent")}
+
+    with log_context(request_id="req-2"):
+        response = await chat.send_chat_stream(
+            ChatRequest(prompt="Hello", models=["grok"]), SimpleNamespace(headers={}), None, clients
+        )
+
+    # The client went away before the body was sent, so only the background task runs
+    await response.background()
+    calls = [task for _, task in turns[0].calls]
+    await asyncio.gather(*calls, return_exceptions=True)
+
+    assert all(task.cancelled() for task in calls)
+    assert cancellation_registry.cancel("req-2") is False
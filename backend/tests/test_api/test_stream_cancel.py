@@ -0,0 +1,121 @@
+"""
+Tests for cancelling generations on the stream WebSocket.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import stream
+from app.clients.base import BaseAIClient
+from app.config import settings
+from app.main import app
+from app.models.message import ModelProvider, ResponseStatus
+from app.services import chat_service
+
+
+class EndlessClient(BaseAIClient):
+    """Streams chunks until cancelled, recording whether the stream was closed."""
+
+    def __init__(self):
+        super().__init__("test-key")
+        self.closed = False
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        try:
+            while True:
+                yield "token "
+                await asyncio.sleep(0.01)
+        finally:
+            self.closed = True
+
+    def get_model_name(self) -> str:
+        return "endless"
+
+
+class ShortClient(EndlessClient):
+    """Streams a fixed answer."""
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        for chunk in ("short ", "answer"):
+            await asyncio.sleep(0.01)
+            yield chunk
+
+    def get_model_name(self) -> str:
+        return "short"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    saved = []
+
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=5)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=6)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db, rag_context=None):
+        return None
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        saved.extend(responses)
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(stream, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service, "get_model_system_prompt", fake_system_prompt)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+    monkeypatch.setattr(stream, "async_session", fake_session)
+    monkeypatch.setattr(settings, "STREAM_COALESCE_WINDOW", 0)
+    clients = {ModelProvider.GROK: EndlessClient(), ModelProvider.MOCK: ShortClient()}
+    app.dependency_overrides[get_ai_clients] = lambda: clients
+    yield TestClient(app), clients, saved
+    app.dependency_overrides.clear()
+
+
+def test_cancelling_a_model_keeps_its_partial_response(chat):
+    client, clients, saved = chat
+    with client.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "go", "request_id": "a"})
+        messages = []
+        while not any(m["type"] == "model_chunk" and m["provider"] == "grok" for m in messages):
+            messages.append(ws.receive_json())
+        ws.send_json({"type": "cancel", "request_id": "a", "provider": "grok"})
+        while messages[-1]["type"] != "all_complete":
+            messages.append(ws.receive_json())
+
+    cancelled = [m for m in messages if m["type"] == "model_cancelled"]
+    assert [m["provider"] for m in cancelled] == ["grok"]
+    assert cancelled[0]["request_id"] == "a"
+    assert clients[ModelProvider.GROK].closed
+
+    by_provider = {r.provider: r for r in saved}
+    assert by_provider[ModelProvider.MOCK].status == ResponseStatus.COMPLETED
+    assert by_provider[ModelProvider.MOCK].content == "short answer"
+    assert by_provider[ModelProvider.GROK].status == ResponseStatus.CANCELLED
+    assert by_provider[ModelProvider.GROK].content.startswith("token ")
+
+
+def test_cancelling_an_unknown_request_is_an_error(chat):
+    client, _, _ = chat
+    with client.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"type": "cancel", "request_id": "nope"})
+        message = ws.receive_json()
+
+    assert message["type"] == "error"
+    assert message["request_id"] == "nope"
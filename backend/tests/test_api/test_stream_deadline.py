@@ -0,0 +1,100 @@
+"""
+Tests for the WebSocket handler's per-turn deadline.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import stream
+from app.clients.base import BaseAIClient
+from app.main import app
+from app.models.message import ModelProvider
+from app.services import chat_service
+
+
+class StreamingClient(BaseAIClient):
+    """Streams one chunk, then waits before finishing."""
+
+    def __init__(self, delay: float):
+        super().__init__("test-key")
+        self.delay = delay
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        yield "partial"
+        await asyncio.sleep(self.delay)
+        yield " done"
+
+    def get_model_name(self) -> str:
+        return f"streaming-{self.delay}"
+
+
+@pytest.fixture
+def saved(monkeypatch):
+    """Responses passed to save_assistant_responses."""
+    saved_responses = []
+
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=3)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=4)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db, rag_context=None):
+        return None
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        saved_responses.extend(responses)
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(stream, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service, "get_model_system_prompt", fake_system_prompt)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+
+    monkeypatch.setattr(stream, "async_session", fake_session)
+    app.dependency_overrides[get_ai_clients] = lambda: {
+        ModelProvider.GROK: StreamingClient(30),
+        ModelProvider.PERPLEXITY: StreamingClient(0.01),
+    }
+    yield saved_responses
+    app.dependency_overrides.clear()
+
+
+def test_websocket_turn_times_out_slow_providers(saved):
+    client = TestClient(app)
+    with client.websocket_connect("/api/v1/stream/chat") as websocket:
+        websocket.send_json({
+            "prompt": "Deadline test",
+            "models": ["grok", "perplexity"],
+            "timeout_seconds": 0.3
+        })
+
+        messages = []
+        while True:
+            message = websocket.receive_json()
+            messages.append(message)
+            if message["type"] == "all_complete":
+                break
+
+    timed_out = [m for m in messages if m["type"] == "model_timed_out"]
+    completed = [m for m in messages if m["type"] == "model_complete"]
+
+    assert [m["provider"] for m in timed_out] == ["grok"]
+    assert [m["provider"] for m in completed] == ["perplexity"]
+    assert [r.provider for r in saved] == [ModelProvider.PERPLEXITY]
+    assert saved[0].content == "partial done"
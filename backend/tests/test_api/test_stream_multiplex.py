@@ -0,0 +1,179 @@
+"""
+Tests for running several prompts at once on one stream WebSocket.
+"""
+
+import asyncio
+import threading
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import stream
+from app.clients.base import BaseAIClient
+from app.config import settings
+from app.constants import ERROR_MESSAGES
+from app.main import app
+from app.models.message import ModelProvider
+from app.services import chat_service
+
+
+class SlowClient(BaseAIClient):
+    """Streams the prompt back in a few chunks, slowly enough for prompts to overlap."""
+
+    def __init__(self):
+        super().__init__("test-key")
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        return prompt * 3
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        for _ in range(3):
+            await asyncio.sleep(0.05)
+            yield prompt
+
+    def get_model_name(self) -> str:
+        return "slow"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=conversation_id or 5)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=6)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db, rag_context=None):
+        return None
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        pass
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(stream, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service, "get_model_system_prompt", fake_system_prompt)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+    monkeypatch.setattr(stream, "async_session", fake_session)
+    monkeypatch.setattr(settings, "STREAM_COALESCE_WINDOW", 0)
+    app.dependency_overrides[get_ai_clients] = lambda: {ModelProvider.GROK: SlowClient()}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def receive(ws, timeout=5):
+    """Receive a message, failing instead of hanging if none arrives in time."""
+    received = []
+    # The test client's receive cannot time out; a daemon thread cannot block the exit either
+    reader = threading.Thread(target=lambda: received.append(ws.receive_json()), daemon=True)
+    reader.start()
+    reader.join(timeout)
+    assert received, f"no message within {timeout} seconds"
+    return received[0]
+
+
+def receive_until_complete(ws, count, limit=100):
+    """Receive messages until count all_complete messages have arrived, failing after limit messages."""
+    messages = []
+    while sum(message["type"] == "all_complete" for message in messages) < count:
+        assert len(messages) < limit, f"no all_complete after {limit} messages: {messages}"
+        messages.append(receive(ws))
+    return messages
+
+
+def test_tagged_prompts_stream_concurrently(chat):
+    with chat.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "one", "request_id": "a"})
+        ws.send_json({"prompt": "two", "request_id": 7, "conversation_id": 9})
+        messages = receive_until_complete(ws, 2)
+
+    by_request = {
+        request_id: [message for message in messages if message["request_id"] == request_id]
+        for request_id in ("a", 7)
+    }
+    assert sum(map(len, by_request.values())) == len(messages)
+    for request_id, prompt, conversation_id in (("a", "one", 5), (7, "two", 9)):
+        events = by_request[request_id]
+        assert events[0] == {**events[0], "type": "conversation_info", "conversation_id": conversation_id}
+        assert "".join(m["content"] for m in events if m["type"] == "model_chunk") == prompt * 3
+        assert events[-1]["type"] == "all_complete"
+
+    # The second prompt started before the first finished
+    types = [(message["request_id"], message["type"]) for message in messages]
+    assert types.index((7, "model_start")) < types.index(("a", "all_complete"))
+
+
+def test_prompts_over_the_limit_are_rejected(chat, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_MAX_CONCURRENT_REQUESTS", 1)
+
+    with chat.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "one", "request_id": "a"})
+        ws.send_json({"prompt": "two", "request_id": "b"})
+        ws.send_json({"prompt": "three", "request_id": "a"})
+        messages = receive_until_complete(ws, 1)
+        # The slot is free again once the first prompt is done
+        ws.send_json({"prompt": "four", "request_id": "b"})
+        later = receive_until_complete(ws, 1)
+
+    errors = [message for message in messages if message["type"] == "error"]
+    assert errors == [
+        {
+            "type": "error",
+            "request_id": "b",
+            "error": ERROR_MESSAGES["too_many_stream_requests"].format(limit=1),
+        },
+        {
+            "type": "error",
+            "request_id": "a",
+            "error": ERROR_MESSAGES["duplicate_request_id"].format(request_id="a"),
+        },
+    ]
+    assert {message["request_id"] for message in later} == {"b"}
+    assert later[-1]["type"] == "all_complete"
+
+
+def test_untagged_prompts_count_toward_the_limit(chat, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_MAX_CONCURRENT_REQUESTS", 2)
+
+    with chat.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "one"})
+        ws.send_json({"prompt": "two", "request_id": "a"})
+        ws.send_json({"prompt": "three"})
+        messages = receive_until_complete(ws, 2)
+
+    errors = [message for message in messages if message["type"] == "error"]
+    assert errors == [
+        {"type": "error", "error": ERROR_MESSAGES["too_many_stream_requests"].format(limit=2)},
+    ]
+    chunks = "".join(
+        message["content"] for message in messages
+        if message["type"] == "model_chunk" and "request_id" not in message
+    )
+    assert chunks == "one" * 3
+
+
+def test_untagged_prompts_run_in_order(chat):
+    with chat.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "one"})
+        ws.send_json({"prompt": "two"})
+        messages = receive_until_complete(ws, 2)
+
+    assert all("request_id" not in message for message in messages)
+    chunks = "".join(message["content"] for message in messages if message["type"] == "model_chunk")
+    assert chunks == "one" * 3 + "two" * 3
+
+
+def test_invalid_request_id_is_rejected(chat):
+    with chat.websocket_connect("/api/v1/stream/chat") as ws:
+        ws.send_json({"prompt": "one", "request_id": ["a"]})
+        assert ws.receive_json() == {"type": "error", "error": ERROR_MESSAGES["invalid_request_id"]}
@@ -0,0 +1,122 @@
+"""
+Tests for the WebSocket stream's binary (MessagePack) framing.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+import json
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import stream
+from app.clients.base import BaseAIClient
+from app.constants import STREAM_EVENT_CODES, STREAM_MSGPACK_SUBPROTOCOL, STREAM_PROVIDER_CODES
+from app.main import app
+from app.models.message import ModelProvider
+from app.services import chat_service
+from app.utils.stream_codec import JsonCodec, MsgPackCodec
+
+msgpack = pytest.importorskip("msgpack")
+
+
+class TwoChunkClient(BaseAIClient):
+    def __init__(self):
+        super().__init__("test-key")
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        yield "Hello"
+        await asyncio.sleep(0)
+        yield " there"
+
+    def get_model_name(self) -> str:
+        return "two-chunk"
+
+
+@pytest.fixture
+def chat(monkeypatch):
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=5)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=6)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db, rag_context=None):
+        return None
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        pass
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    monkeypatch.setattr(stream, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service, "get_model_system_prompt", fake_system_prompt)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+
+    monkeypatch.setattr(stream, "async_session", fake_session)
+    app.dependency_overrides[get_ai_clients] = lambda: {ModelProvider.GROK: TwoChunkClient()}
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_chunk_frames_are_smaller_in_msgpack():
+    message = {"type": "model_chunk", "provider": "perplexity", "content": "Hello", "timestamp": 1760659200.123456}
+
+    binary = MsgPackCodec().encode(message)
+
+    assert msgpack.unpackb(binary) == {
+        "t": STREAM_EVENT_CODES["model_chunk"],
+        "p": STREAM_PROVIDER_CODES["perplexity"],
+        "c": "Hello",
+        "ts": 1760659200123,
+    }
+    assert len(binary) < len(JsonCodec().encode(message)) / 2
+
+
+def test_requests_may_name_models_by_code():
+    request = MsgPackCodec().decode(msgpack.packb({"prompt": "Hi", "models": [STREAM_PROVIDER_CODES["grok"], "claude"]}))
+
+    assert request == {"prompt": "Hi", "models": ["grok", "claude"]}
+
+
+def test_binary_subprotocol_is_negotiated(chat):
+    with chat.websocket_connect("/api/v1/stream/chat", subprotocols=[STREAM_MSGPACK_SUBPROTOCOL]) as websocket:
+        assert websocket.accepted_subprotocol == STREAM_MSGPACK_SUBPROTOCOL
+        websocket.send_bytes(msgpack.packb({"prompt": "Hi", "models": [STREAM_PROVIDER_CODES["grok"]]}))
+
+        frames = []
+        while not frames or frames[-1]["t"] != STREAM_EVENT_CODES["all_complete"]:
+            frames.append(msgpack.unpackb(websocket.receive_bytes()))
+
+    chunks = [f for f in frames if f["t"] == STREAM_EVENT_CODES["model_chunk"]]
+    assert frames[0] == {"t": STREAM_EVENT_CODES["conversation_info"], "cid": 5, "ts": frames[0]["ts"]}
+    assert {f["p"] for f in chunks} == {STREAM_PROVIDER_CODES["grok"]}
+    assert "".join(f["c"] for f in chunks) == "Hello there"
+
+
+def test_json_remains_the_default(chat):
+    with chat.websocket_connect("/api/v1/stream/chat") as websocket:
+        assert websocket.accepted_subprotocol is None
+        websocket.send_json({"prompt": "Hi", "models": ["grok"]})
+        first = json.loads(websocket.receive_text())
+
+    assert first["type"] == "conversation_info"
+
+
+def test_protocol_tables_are_published(chat):
+    response = chat.get("/api/v1/stream/protocol")
+
+    assert response.json()["event_types"] == STREAM_EVENT_CODES
+    assert response.json()["subprotocol"] == STREAM_MSGPACK_SUBPROTOCOL
@@ -0,0 +1,150 @@
+"""
+Tests that the WebSocket handler only holds database sessions during a turn.
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.api.deps import get_ai_clients
+from app.api.v1 import stream
+from app.clients.base import BaseAIClient
+from app.main import app
+from app.models.message import ModelProvider
+from app.services import chat_service
+
+SOCKETS = 300
+# Sockets taking a turn at once; more would trip the provider concurrency limit
+TURN_BATCH = 25
+
+
+class FakePool:
+    """Counts sessions as if each held a pool connection for its whole life."""
+
+    def __init__(self):
+        self.checked_out = 0
+        self.peak = 0
+        self.sessions = 0
+
+    @asynccontextmanager
+    async def session(self):
+        self.checked_out += 1
+        self.sessions += 1
+        self.peak = max(self.peak, self.checked_out)
+        try:
+            yield SimpleNamespace()
+        finally:
+            self.checked_out -= 1
+
+
+class QuickClient(BaseAIClient):
+    def __init__(self):
+        super().__init__("test-key")
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        raise NotImplementedError
+
+    async def generate_stream(self, prompt, conversation_history=None, system_prompt=None):
+        await asyncio.sleep(0.01)
+        yield f"answer to {prompt}"
+
+    def get_model_name(self) -> str:
+        return "quick"
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    pool = FakePool()
+
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        return SimpleNamespace(id=conversation_id or 1)
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        return SimpleNamespace(id=1)
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db, rag_context=None):
+        return None
+
+    async def fake_save_responses(conversation_id, responses, db, user_message_id=None):
+        pass
+
+    monkeypatch.setattr(stream, "async_session", pool.session)
+    monkeypatch.setattr(stream, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service, "get_model_system_prompt", fake_system_prompt)
+    monkeypatch.setattr(chat_service, "save_assistant_responses", fake_save_responses)
+    app.dependency_overrides[get_ai_clients] = lambda: {ModelProvider.MOCK: QuickClient()}
+    yield pool
+    app.dependency_overrides.clear()
+
+
+class Socket:
+    """Drives one WebSocket connection against the ASGI app directly."""
+
+    def __init__(self):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        scope = {
+            "type": "websocket",
+            "path": "/api/v1/stream/chat",
+            "raw_path": b"/api/v1/stream/chat",
+            "root_path": "",
+            "scheme": "ws",
+            "query_string": b"",
+            "headers": [],
+            "subprotocols": [],
+            "client": ("test", 1234),
+            "server": ("test", 80),
+        }
+        self.task = asyncio.create_task(app(scope, self.inbox.get, self.outbox.put))
+
+    async def connect(self):
+        await self.inbox.put({"type": "websocket.connect"})
+        assert (await self.outbox.get())["type"] == "websocket.accept"
+
+    async def turn(self, prompt, conversation_id):
+        await self.inbox.put({
+            "type": "websocket.receive",
+            "text": json.dumps({"prompt": prompt, "conversation_id": conversation_id}),
+        })
+        messages = []
+        while not messages or messages[-1]["type"] != "all_complete":
+            messages.append(json.loads((await self.outbox.get())["text"]))
+        return messages
+
+    async def close(self):
+        await self.inbox.put({"type": "websocket.disconnect", "code": 1000})
+        await self.task
+
+
+@pytest.mark.asyncio
+async def test_idle_sockets_hold_no_pool_connections(pool):
+    sockets = [Socket() for _ in range(SOCKETS)]
+    await asyncio.gather(*(socket.connect() for socket in sockets))
+    assert pool.sessions == 0
+
+    turns = []
+    for start in range(0, SOCKETS, TURN_BATCH):
+        turns.extend(await asyncio.gather(*(
+            socket.turn(f"question {index}", index + 1)
+            for index, socket in enumerate(sockets[start:start + TURN_BATCH], start)
+        )))
+        # The sockets that have finished their turn stay open without holding sessions
+        assert pool.checked_out == 0
+    assert all(messages[0]["type"] == "conversation_info" for messages in turns)
+    assert all(any(m["type"] == "model_complete" for m in messages) for messages in turns)
+
+    # Every turn used sessions, yet with all sockets still open and idle none is held
+    assert pool.sessions == 2 * SOCKETS
+    assert pool.checked_out == 0
+    # Sessions in use track turns in progress, not open sockets
+    assert pool.peak <= TURN_BATCH
+
+    await asyncio.gather(*(socket.close() for socket in sockets))
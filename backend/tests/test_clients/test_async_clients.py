@@ -0,0 +1,100 @@
+"""
+Tests that the Claude and OpenAI clients do not block the event loop.
+"""
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from app.clients.claude import ClaudeClient
+from app.clients.openai import OpenAIClient
+from app.models.message import ModelProvider
+from app.services import chat_service
+
+
+PROVIDER_LATENCY = 0.3
+
+
+def slow_transport(payload: dict) -> httpx.MockTransport:
+    """Build a mock transport that answers after PROVIDER_LATENCY seconds."""
+    async def handler(request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(PROVIDER_LATENCY)
+        return httpx.Response(200, json=payload)
+
+    return httpx.MockTransport(handler)
+
+
+def make_claude_client() -> ClaudeClient:
+    client = ClaudeClient("test-key")
+    client.client = AsyncAnthropic(
+        api_key="test-key",
+        http_client=httpx.AsyncClient(transport=slow_transport({
+            "id": "msg_test",
+            "type": "message",
+            "role": "assistant",
+            "model": client.model,
+            "content": [{"type": "text", "text": "Hello from Claude"}],
+            "stop_reason": "end_turn",
+            "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 3}
+        }))
+    )
+    return client
+
+
+def make_openai_client() -> OpenAIClient:
+    client = OpenAIClient("test-key")
+    client.client = AsyncOpenAI(
+        api_key="test-key",
+        http_client=httpx.AsyncClient(transport=slow_transport({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": client.model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "Hello from ChatGPT"},
+                "finish_reason": "stop"
+            }]
+        }))
+    )
+    return client
+
+
+@pytest.mark.asyncio
+async def test_slow_providers_run_concurrently(monkeypatch):
+    """Two slow providers should finish in max(latency), not sum(latency)."""
+    clients = {
+        ModelProvider.CLAUDE: make_claude_client(),
+        ModelProvider.CHATGPT: make_openai_client(),
+    }
+
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db):
+        return None
+
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(
+        chat_service.system_prompt_service, "get_system_prompt", fake_system_prompt
+    )
+
+    start = time.perf_counter()
+    responses = await chat_service.generate_multi_model_responses(
+        prompt="Hi",
+        conversation_id=1,
+        db=None,
+        selected_models=[ModelProvider.CLAUDE, ModelProvider.CHATGPT],
+        clients=clients
+    )
+    elapsed = time.perf_counter() - start
+
+    assert [r.error for r in responses] == [None, None]
+    assert responses[0].content == "Hello from Claude"
+    assert responses[1].content == "Hello from ChatGPT"
+    assert elapsed < PROVIDER_LATENCY * 1.8
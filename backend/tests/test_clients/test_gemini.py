@@ -0,0 +1,54 @@
+"""
+Tests for the Gemini client's structured history and model caching.
+"""
+
+import pytest
+
+from app.clients.gemini import GeminiClient
+
+
+def test_history_is_sent_as_alternating_structured_turns():
+    client = GeminiClient("test-key")
+    history = [
+        {"role": "system", "content": "ignored"},
+        {"role": "user", "content": "Hi"},
+        {"role": "assistant", "content": "Hello!"},
+        {"role": "user", "content": "Second"},
+        {"role": "user", "content": "How are you?"},
+    ]
+
+    contents = client._build_contents("How are you?", history)
+
+    assert contents == [
+        {"role": "user", "parts": ["Hi"]},
+        {"role": "model", "parts": ["Hello!"]},
+        {"role": "user", "parts": ["Second", "How are you?"]},
+    ]
+
+
+def test_models_are_cached_per_system_prompt():
+    client = GeminiClient("test-key")
+
+    first = client._get_model("Be brief")
+    assert client._get_model("Be brief") is first
+    assert client._get_model("Be verbose") is not first
+    assert client._get_model(None) is client.model
+
+
+@pytest.mark.asyncio
+async def test_generate_response_passes_contents_to_async_api(monkeypatch):
+    client = GeminiClient("test-key")
+    calls = []
+
+    class FakeResponse:
+        text = "Paris"
+
+    class FakeModel:
+        async def generate_content_async(self, contents, **kwargs):
+            calls.append(contents)
+            return FakeResponse()
+
+    monkeypatch.setattr(client, "_get_model", lambda system_prompt: FakeModel())
+
+    assert await client.generate_response("Capital?", [], "Sys") == "Paris"
+    assert calls == [[{"role": "user", "parts": ["Capital?"]}]]
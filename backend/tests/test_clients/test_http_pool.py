@@ -0,0 +1,51 @@
+"""
+Tests for the shared provider HTTP connection pools.
+"""
+
+import httpx
+import pytest
+
+from app.clients.grok import GrokClient
+from app.clients.http_pool import ProviderHTTPPool, http_pool
+
+
+@pytest.mark.asyncio
+async def test_pool_reuses_client_until_closed():
+    pool = ProviderHTTPPool(max_connections=5, max_keepalive_connections=2)
+
+    first = pool.get_client("grok")
+    assert pool.get_client("grok") is first
+    assert pool.get_client("perplexity") is not first
+
+    await pool.aclose()
+    assert first.is_closed
+    assert pool.get_client("grok") is not first
+    await pool.aclose()
+
+
+@pytest.mark.asyncio
+async def test_grok_requests_share_pooled_client(monkeypatch):
+    seen_clients = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={
+            "choices": [{"message": {"role": "assistant", "content": "pong"}}]
+        })
+
+    pooled = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    original_post = pooled.post
+
+    async def tracking_post(*args, **kwargs):
+        seen_clients.append(pooled)
+        return await original_post(*args, **kwargs)
+
+    pooled.post = tracking_post
+    monkeypatch.setitem(http_pool._clients, "grok", pooled)
+
+    client = GrokClient("test-key")
+    assert await client.generate_response("ping") == "pong"
+    assert await client.generate_response("ping") == "pong"
+
+    assert len(seen_clients) == 2
+    assert not pooled.is_closed
+    await pooled.aclose()
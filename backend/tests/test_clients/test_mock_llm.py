@@ -0,0 +1,102 @@
+"""
+Tests for the local mock LLM server and its client.
+"""
+
+import time
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from app.clients.claude import ClaudeClient
+from app.clients.errors import ProviderRateLimitError, ProviderUnavailableError
+from app.clients.http_pool import http_pool
+from app.clients.mock import MockLLMClient
+from app.clients.openai import OpenAIClient
+from app.mock_llm import MockLLMConfig, create_app
+
+BASE_URL = "http://mock-llm/v1"
+
+
+def mock_http_client(config: MockLLMConfig) -> httpx.AsyncClient:
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))
+
+
+@pytest.fixture
+def instant():
+    return MockLLMConfig(ttft=0, tokens_per_second=0, response_tokens=8)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_mock_client_response_and_stream_match(monkeypatch, instant):
+    pooled = mock_http_client(instant)
+    monkeypatch.setitem(http_pool._clients, "mock", pooled)
+    client = MockLLMClient("mock-key", base_url=BASE_URL)
+
+    text = await client.generate_response("Hi", [], "Be brief")
+    chunks = await collect(client.generate_stream("Hi", [], "Be brief"))
+
+    assert len(chunks) == 8
+    assert "".join(chunks) == text
+    await pooled.aclose()
+
+
+@pytest.mark.asyncio
+async def test_mock_server_is_openai_compatible(instant):
+    client = OpenAIClient("mock-key", model="mock-llm")
+    client.client = AsyncOpenAI(api_key="mock-key", base_url=BASE_URL, http_client=mock_http_client(instant))
+
+    text = await client.generate_response("Hi")
+    chunks = await collect(client.generate_stream("Hi"))
+
+    assert text and "".join(chunks) == text
+
+
+@pytest.mark.asyncio
+async def test_mock_server_is_anthropic_compatible(instant):
+    client = ClaudeClient("mock-key", model="mock-llm")
+    client.client = AsyncAnthropic(
+        api_key="mock-key",
+        base_url="http://mock-llm",
+        http_client=mock_http_client(instant)
+    )
+
+    text = await client.generate_response("Hi", None, "Be brief")
+    chunks = await collect(client.generate_stream("Hi", None, "Be brief"))
+
+    assert text and "".join(chunks) == text
+
+
+@pytest.mark.asyncio
+async def test_time_to_first_token_is_applied(monkeypatch):
+    pooled = mock_http_client(MockLLMConfig(ttft=0.2, tokens_per_second=0, response_tokens=4))
+    monkeypatch.setitem(http_pool._clients, "mock", pooled)
+
+    start = time.perf_counter()
+    await MockLLMClient("mock-key", base_url=BASE_URL).generate_response("Hi")
+
+    assert time.perf_counter() - start >= 0.2
+    await pooled.aclose()
+
+
+@pytest.mark.asyncio
+async def test_injected_faults_map_to_typed_errors(monkeypatch):
+    client = MockLLMClient("mock-key", base_url=BASE_URL)
+
+    pooled = mock_http_client(MockLLMConfig(ttft=0, rate_limit_rate=1.0, retry_after=2))
+    monkeypatch.setitem(http_pool._clients, "mock", pooled)
+    with pytest.raises(ProviderRateLimitError) as rate_limited:
+        await client.generate_response("Hi")
+    assert rate_limited.value.retry_after == 2.0
+    await pooled.aclose()
+
+    pooled = mock_http_client(MockLLMConfig(ttft=0, error_rate=1.0))
+    monkeypatch.setitem(http_pool._clients, "mock", pooled)
+    with pytest.raises(ProviderUnavailableError):
+        await client.generate_response("Hi")
+    await pooled.aclose()
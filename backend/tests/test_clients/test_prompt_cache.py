@@ -0,0 +1,104 @@
+"""
+Tests for prompt layouts that let providers cache the stable prefix.
+"""
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from app.clients.claude import ClaudeClient
+from app.clients.openai import OpenAIClient
+from app.clients.prompt_cache import EPHEMERAL_CACHE, prompt_cache_stats, split_system_prompt
+from app.constants import RAG_CONTEXT_HEADER
+from app.mock_llm import MockLLMConfig, create_app
+from app.services.system_prompt_service import format_system_prompt
+
+TEMPLATE = "You are helpful.\n\n{rag_context}\n\nAnswer carefully."
+SYSTEM_PROMPT = f"You are helpful.\n\nAnswer carefully.\n\n{RAG_CONTEXT_HEADER}\nDoc excerpt"
+HISTORY = [
+    {"role": "user", "content": "Earlier question"},
+    {"role": "assistant", "content": "Earlier answer"},
+]
+
+
+def mock_http_client() -> httpx.AsyncClient:
+    config = MockLLMConfig(ttft=0, tokens_per_second=0, response_tokens=4)
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config)))
+
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    prompt_cache_stats.reset()
+    yield
+    prompt_cache_stats.reset()
+
+
+@pytest.mark.asyncio
+async def test_rag_context_goes_after_the_instructions():
+    prompt = await format_system_prompt(TEMPLATE, "Doc excerpt")
+    instructions, rag_context = split_system_prompt(prompt)
+
+    assert instructions == "You are helpful.\n\nAnswer carefully."
+    assert rag_context == f"{RAG_CONTEXT_HEADER}\nDoc excerpt"
+    # Without context the instructions are unchanged from turn to turn
+    assert await format_system_prompt(TEMPLATE, "") == instructions
+
+
+def test_claude_layout_marks_the_stable_prefix():
+    client = ClaudeClient("test-key")
+    params = client._build_params("Question", list(HISTORY), SYSTEM_PROMPT)
+
+    assert params["system"] == [
+        {"type": "text", "text": "You are helpful.\n\nAnswer carefully.", "cache_control": EPHEMERAL_CACHE}
+    ]
+    assert params["messages"][1]["content"][0]["cache_control"] == EPHEMERAL_CACHE
+    assert params["messages"][-1]["content"] == [
+        {"type": "text", "text": f"{RAG_CONTEXT_HEADER}\nDoc excerpt"},
+        {"type": "text", "text": "Question"},
+    ]
+    # The caller's history is not modified
+    assert HISTORY[1] == {"role": "assistant", "content": "Earlier answer"}
+
+
+def test_openai_layout_keeps_the_changing_parts_last():
+    client = OpenAIClient("test-key")
+    messages = client._build_messages("Question", HISTORY, SYSTEM_PROMPT)
+
+    assert [m["role"] for m in messages] == ["system", "user", "assistant", "system", "user"]
+    assert messages[0]["content"] == "You are helpful.\n\nAnswer carefully."
+    assert messages[3]["content"].startswith(RAG_CONTEXT_HEADER)
+    assert messages[4]["content"] == "Question"
+
+
+@pytest.mark.asyncio
+async def test_openai_cached_tokens_are_reported():
+    client = OpenAIClient("mock-key", model="mock-llm")
+    client.client = AsyncOpenAI(api_key="mock-key", base_url="http://mock-llm/v1", http_client=mock_http_client())
+    system_prompt = "Long stable instructions. " * 20
+
+    await client.generate_response("First", HISTORY, system_prompt)
+    await client.generate_response("Second", HISTORY, system_prompt)
+    async for _ in client.generate_stream("Third", HISTORY, system_prompt):
+        pass
+
+    stats = prompt_cache_stats.get_stats()["chatgpt"]
+    assert stats["requests"] == 3
+    assert 0 < stats["cached_tokens"] < stats["input_tokens"]
+
+
+@pytest.mark.asyncio
+async def test_claude_cache_reads_and_writes_are_reported():
+    client = ClaudeClient("mock-key", model="mock-llm")
+    client.client = AsyncAnthropic(api_key="mock-key", base_url="http://mock-llm", http_client=mock_http_client())
+    system_prompt = "Long stable instructions. " * 20
+
+    await client.generate_response("First", None, system_prompt)
+    first = dict(prompt_cache_stats.get_stats()["claude"])
+    async for _ in client.generate_stream("Second", None, system_prompt):
+        pass
+    second = prompt_cache_stats.get_stats()["claude"]
+
+    assert first["cached_tokens"] == 0 and first["cache_write_tokens"] > 0
+    assert second["cached_tokens"] == first["cache_write_tokens"]
+    assert second["cache_hit_ratio"] > 0
@@ -0,0 +1,160 @@
+"""
+Tests for typed provider errors and the shared retry policy.
+"""
+
+import time
+
+import httpx
+import pytest
+
+from app.clients.errors import (
+    ProviderBadRequestError,
+    ProviderError,
+    ProviderRateLimitError,
+    ProviderUnavailableError,
+    classify_error,
+    counts_toward_circuit_breaker,
+    parse_retry_after,
+)
+from app.clients.retry import RetryPolicy
+
+
+def make_status_error(status_code: int, headers=None) -> httpx.HTTPStatusError:
+    request = httpx.Request("POST", "https://api.example.com/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    return httpx.HTTPStatusError("error", request=request, response=response)
+
+
+def fast_policy(**kwargs) -> RetryPolicy:
+    options = {"max_attempts": 3, "base_delay": 0.0, "max_delay": 0.0, "max_retry_after": 1.0}
+    options.update(kwargs)
+    return RetryPolicy(**options)
+
+
+def test_parse_retry_after_variants():
+    assert parse_retry_after({"retry-after": "2"}) == 2.0
+    assert parse_retry_after({"retry-after-ms": "250"}) == 0.25
+    assert parse_retry_after({"x-ratelimit-reset-requests": "1m30s"}) == 90.0
+    assert parse_retry_after({
+        "x-ratelimit-reset-requests": "0.5s",
+        "x-ratelimit-reset-tokens": "3s",
+    }) == 3.0
+    assert parse_retry_after({"x-ratelimit-reset": "2"}, include_reset=False) is None
+    assert parse_retry_after({}) is None
+
+    epoch = parse_retry_after({"x-ratelimit-reset": str(int(time.time()) + 10)})
+    assert 8 <= epoch <= 10
+
+
+def test_classify_http_status_errors():
+    rate_limited = classify_error("grok", make_status_error(429, {"retry-after": "1"}))
+    bad_request = classify_error("grok", make_status_error(400))
+    unavailable = classify_error("grok", make_status_error(503))
+
+    assert isinstance(rate_limited, ProviderRateLimitError)
+    assert rate_limited.retryable and rate_limited.retry_after == 1.0
+    assert isinstance(bad_request, ProviderBadRequestError)
+    assert not bad_request.retryable
+    assert isinstance(unavailable, ProviderUnavailableError)
+    assert unavailable.retryable
+
+
+def test_rate_limits_do_not_count_toward_circuit_breaker():
+    assert not counts_toward_circuit_breaker(ProviderRateLimitError("grok", "slow down"))
+    assert counts_toward_circuit_breaker(ProviderUnavailableError("grok", "down"))
+
+
+@pytest.mark.asyncio
+async def test_retries_transient_error_then_succeeds():
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) == 1:
+            raise make_status_error(503)
+        return "ok"
+
+    assert await fast_policy().call("grok", flaky) == "ok"
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_bad_request():
+    calls = []
+
+    async def rejected():
+        calls.append(1)
+        raise make_status_error(400)
+
+    with pytest.raises(ProviderBadRequestError):
+        await fast_policy().call("grok", rejected)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_honors_retry_after():
+    calls = []
+
+    async def rate_limited():
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            raise make_status_error(429, {"retry-after-ms": "200"})
+        return "ok"
+
+    assert await fast_policy().call("grok", rate_limited) == "ok"
+    assert calls[1] - calls[0] >= 0.19
+
+
+@pytest.mark.asyncio
+async def test_gives_up_when_retry_after_exceeds_limit():
+    async def rate_limited():
+        raise make_status_error(429, {"retry-after": "60"})
+
+    with pytest.raises(ProviderRateLimitError):
+        await fast_policy().call("grok", rate_limited)
+
+
+@pytest.mark.asyncio
+async def test_does_not_retry_past_deadline():
+    calls = []
+
+    async def rate_limited():
+        calls.append(1)
+        raise make_status_error(429, {"retry-after": "0.5"})
+
+    with pytest.raises(ProviderRateLimitError):
+        await fast_policy().call("grok", rate_limited, deadline=time.monotonic() + 0.2)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_retries_only_before_first_chunk():
+    attempts = []
+
+    def failing_before_output():
+        async def stream():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise make_status_error(503)
+            yield "hello"
+        return stream()
+
+    chunks = [chunk async for chunk in fast_policy().stream("grok", failing_before_output)]
+    assert chunks == ["hello"]
+    assert len(attempts) == 2
+
+    attempts.clear()
+
+    def failing_mid_stream():
+        async def stream():
+            attempts.append(1)
+            yield "partial"
+            raise make_status_error(503)
+        return stream()
+
+    received = []
+    with pytest.raises(ProviderError):
+        async for chunk in fast_policy().stream("grok", failing_mid_stream):
+            received.append(chunk)
+    assert received == ["partial"]
+    assert len(attempts) == 1
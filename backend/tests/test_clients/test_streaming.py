@@ -0,0 +1,130 @@
+"""
+Tests for native token streaming in the provider clients.
+"""
+
+import json
+
+import httpx
+import pytest
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
+
+from app.clients.claude import ClaudeClient
+from app.clients.grok import GrokClient
+from app.clients.http_pool import http_pool
+from app.clients.openai import OpenAIClient
+from app.clients.sse import iter_sse_data
+
+
+def sse_body(events) -> bytes:
+    """Encode (event, data) pairs as a server-sent event stream."""
+    lines = []
+    for event, data in events:
+        if event:
+            lines.append(f"event: {event}")
+        lines.append(f"data: {data if isinstance(data, str) else json.dumps(data)}")
+        lines.append("")
+    return ("\n".join(lines) + "\n").encode()
+
+
+def sse_transport(body: bytes, captured: list) -> httpx.MockTransport:
+    def handler(request: httpx.Request) -> httpx.Response:
+        captured.append(json.loads(request.content))
+        return httpx.Response(
+            200,
+            headers={"content-type": "text/event-stream"},
+            content=body
+        )
+
+    return httpx.MockTransport(handler)
+
+
+def openai_chunks(*deltas):
+    events = [(None, {
+        "id": "chunk",
+        "object": "chat.completion.chunk",
+        "created": 0,
+        "model": "test",
+        "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}]
+    }) for delta in deltas]
+    events.append((None, "[DONE]"))
+    return sse_body(events)
+
+
+async def collect(stream):
+    return [chunk async for chunk in stream]
+
+
+@pytest.mark.asyncio
+async def test_sse_parser_joins_multiline_data_and_stops_at_done():
+    body = b": keep-alive\n\ndata: first\ndata: second\n\ndata: [DONE]\n\ndata: ignored\n\n"
+    response = httpx.Response(200, content=body)
+
+    assert await collect(iter_sse_data(response)) == ["first\nsecond"]
+
+
+@pytest.mark.asyncio
+async def test_claude_streams_text_deltas_with_system_prompt():
+    captured = []
+    body = sse_body([
+        ("message_start", {"type": "message_start", "message": {
+            "id": "msg", "type": "message", "role": "assistant", "model": "test",
+            "content": [], "stop_reason": None, "stop_sequence": None,
+            "usage": {"input_tokens": 1, "output_tokens": 0}
+        }}),
+        ("content_block_start", {"type": "content_block_start", "index": 0,
+                                 "content_block": {"type": "text", "text": ""}}),
+        ("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": "Hel"}}),
+        ("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                 "delta": {"type": "text_delta", "text": "lo"}}),
+        ("content_block_stop", {"type": "content_block_stop", "index": 0}),
+        ("message_delta", {"type": "message_delta", "delta": {"stop_reason": "end_turn",
+                                                              "stop_sequence": None},
+                           "usage": {"output_tokens": 2}}),
+        ("message_stop", {"type": "message_stop"}),
+    ])
+    client = ClaudeClient("test-key")
+    client.client = AsyncAnthropic(
+        api_key="test-key",
+        http_client=httpx.AsyncClient(transport=sse_transport(body, captured))
+    )
+
+    chunks = await collect(client.generate_stream("Hi", [], "Be brief"))
+
+    assert chunks == ["Hel", "lo"]
+    assert captured[0]["stream"] is True
+    assert captured[0]["system"] == [
+        {"type": "text", "text": "Be brief", "cache_control": {"type": "ephemeral"}}
+    ]
+
+
+@pytest.mark.asyncio
+async def test_openai_streams_content_deltas_with_system_prompt():
+    captured = []
+    client = OpenAIClient("test-key")
+    client.client = AsyncOpenAI(
+        api_key="test-key",
+        http_client=httpx.AsyncClient(
+            transport=sse_transport(openai_chunks("Par", "is"), captured)
+        )
+    )
+
+    chunks = await collect(client.generate_stream("Capital?", [], "Be brief"))
+
+    assert chunks == ["Par", "is"]
+    assert captured[0]["messages"][0] == {"role": "system", "content": "Be brief"}
+
+
+@pytest.mark.asyncio
+async def test_grok_parses_sse_stream(monkeypatch):
+    captured = []
+    pooled = httpx.AsyncClient(transport=sse_transport(openai_chunks("a", "b", "c"), captured))
+    monkeypatch.setitem(http_pool._clients, "grok", pooled)
+
+    chunks = await collect(GrokClient("test-key").generate_stream("Hi", None, "Sys"))
+
+    assert chunks == ["a", "b", "c"]
+    assert captured[0]["stream"] is True
+    assert captured[0]["messages"][0]["content"] == "Sys"
+    await pooled.aclose()
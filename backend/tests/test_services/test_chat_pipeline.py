@@ -0,0 +1,131 @@
+"""
+Tests for the concurrent pre-generation steps of a chat turn.
+"""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+
+from app.clients.base import BaseAIClient
+from app.models.message import ModelProvider
+from app.schemas.chat import ChatRequest
+from app.services import chat_service
+
+STEP_DELAY = 0.1
+
+
+class RecordingClient(BaseAIClient):
+    """Records the history it was called with."""
+
+    def __init__(self):
+        super().__init__("test-key")
+        self.histories = []
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        self.histories.append(list(conversation_history or []))
+        return "answer"
+
+    def get_model_name(self) -> str:
+        return "recording"
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stub every pre-generation step with a fixed delay and record the order they finish in."""
+    events = []
+    stored = [{"role": "user", "content": "Earlier question"}]
+
+    @asynccontextmanager
+    async def fake_session():
+        yield None
+
+    async def fake_conversation(conversation_id, title, db, load_messages=True):
+        await asyncio.sleep(STEP_DELAY)
+        events.append("conversation")
+        return SimpleNamespace(id=conversation_id or 1)
+
+    async def fake_rag(prompt, db, top_k=3):
+        await asyncio.sleep(STEP_DELAY)
+        events.append("rag")
+        return "Some context", [{"content": "Some context"}]
+
+    async def fake_history(conversation_id, db):
+        await asyncio.sleep(STEP_DELAY)
+        events.append("history")
+        return list(stored)
+
+    async def fake_system_prompts(db):
+        await asyncio.sleep(STEP_DELAY)
+        events.append("prompts")
+        return {}
+
+    async def fake_save_user_message(conversation_id, prompt, db):
+        await asyncio.sleep(STEP_DELAY)
+        stored.append({"role": "user", "content": prompt})
+        events.append("user_message")
+        return SimpleNamespace(id=11)
+
+    monkeypatch.setattr(chat_service, "async_session", fake_session)
+    monkeypatch.setattr(chat_service, "get_or_create_conversation", fake_conversation)
+    monkeypatch.setattr(chat_service, "retrieve_rag_context", fake_rag)
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service.system_prompt_service, "get_system_prompts", fake_system_prompts)
+    monkeypatch.setattr(chat_service, "save_user_message", fake_save_user_message)
+    return events
+
+
+@pytest.mark.asyncio
+async def test_steps_run_concurrently_and_save_overlaps_generation(pipeline):
+    client = RecordingClient()
+    request = ChatRequest(
+        prompt="New question", conversation_id=3, use_rag=True, models=[ModelProvider.GROK]
+    )
+
+    start = time.perf_counter()
+    turn = await chat_service.start_chat_turn(request, None, {ModelProvider.GROK: client})
+    started_after = time.perf_counter() - start
+
+    # Four independent steps of STEP_DELAY each, but only one round trip
+    assert started_after < 2 * STEP_DELAY
+    assert "user_message" not in pipeline
+    assert turn.rag_context == "Some context"
+
+    responses = await chat_service.collect_model_responses(
+        turn.calls, chat_service.request_deadline(5)
+    )
+    user_message = await turn.user_message
+
+    assert responses[0].content == "answer"
+    assert user_message.id == 11
+    # The current prompt is sent as the prompt, not repeated in the history
+    assert client.histories == [[{"role": "user", "content": "Earlier question"}]]
+
+
+@pytest.mark.asyncio
+async def test_new_conversation_skips_history(pipeline):
+    request = ChatRequest(prompt="First question", models=[ModelProvider.GROK])
+
+    turn = await chat_service.start_chat_turn(request, None, {ModelProvider.GROK: RecordingClient()})
+    await turn.user_message
+    turn.cancel()
+
+    assert "history" not in pipeline
+    assert "rag" not in pipeline
+
+
+@pytest.mark.asyncio
+async def test_failed_step_cancels_the_others(pipeline, monkeypatch):
+    async def missing_conversation(conversation_id, title, db, load_messages=True):
+        raise LookupError("Conversation not found")
+
+    monkeypatch.setattr(chat_service, "get_or_create_conversation", missing_conversation)
+    request = ChatRequest(prompt="Question", conversation_id=3, use_rag=True)
+
+    with pytest.raises(LookupError):
+        await chat_service.start_chat_turn(request, None, {})
+    await asyncio.sleep(2 * STEP_DELAY)
+
+    assert pipeline == []
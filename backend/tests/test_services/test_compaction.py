@@ -0,0 +1,174 @@
+"""
+Tests for rolling conversation compaction.
+"""
+
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.sql.dml import Update
+
+from app.config import Settings, settings
+from app.services import compaction_service
+from app.services.compaction_service import (
+    SUMMARY_PREFIX,
+    BaseSummarizer,
+    ConversationCompactor,
+    ExtractiveSummarizer,
+    load_summarizer,
+)
+from app.utils.invalidation import invalidation_bus
+
+
+class CountingSummarizer(BaseSummarizer):
+    """Records what it was asked to summarize."""
+
+    def __init__(self):
+        self.calls = []
+
+    async def summarize(self, previous, messages):
+        self.calls.append((previous, [m["content"] for m in messages]))
+        return f"summary of {len(messages)} messages"
+
+
+class FakeSession:
+    """Stores one conversation's summary columns."""
+
+    def __init__(self):
+        self.summary = None
+        self.summarized_messages = 0
+
+    async def execute(self, statement):
+        if isinstance(statement, Update):
+            values = {column.key: value.value for column, value in statement._values.items()}
+            self.summary = values["summary"]
+            self.summarized_messages = values["summarized_messages"]
+            return SimpleNamespace(rowcount=1)
+        row = (self.summary, self.summarized_messages)
+        return SimpleNamespace(one_or_none=lambda: row)
+
+    async def commit(self):
+        pass
+
+
+def turns(count):
+    history = []
+    for index in range(count):
+        history.append({"role": "user", "content": f"question {index}", "tokens": 2})
+        history.append({"role": "assistant", "content": f"answer {index}", "tokens": 2})
+    return history
+
+
+@pytest.fixture
+def conversation(monkeypatch):
+    """A growing conversation whose history the compactor reads."""
+    state = SimpleNamespace(history=[])
+
+    async def fake_get(conversation_id, db):
+        return [dict(m) for m in state.history]
+
+    monkeypatch.setattr(compaction_service.history_cache, "get", fake_get)
+    monkeypatch.setattr(invalidation_bus, "enabled", False)
+    return state
+
+
+@pytest.mark.asyncio
+async def test_short_conversations_are_not_compacted(conversation):
+    summarizer = CountingSummarizer()
+    compactor = ConversationCompactor(summarizer, threshold=6, keep_recent=2, enabled=True)
+    db = FakeSession()
+    conversation.history = turns(3)
+
+    assert not await compactor.refresh(1, db)
+    assert await compactor.apply(1, conversation.history, db) == conversation.history
+    assert summarizer.calls == []
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_replaced_by_the_summary(conversation):
+    summarizer = CountingSummarizer()
+    compactor = ConversationCompactor(summarizer, threshold=6, keep_recent=2, enabled=True)
+    db = FakeSession()
+    conversation.history = turns(4)
+
+    assert await compactor.refresh(1, db)
+    history = await compactor.apply(1, conversation.history, db)
+
+    assert db.summarized_messages == 6
+    assert history[0]["content"] == f"{SUMMARY_PREFIX}\nsummary of 6 messages"
+    assert [m["role"] for m in history] == ["user", "assistant", "user", "assistant"]
+    assert history[2:] == conversation.history[6:]
+
+
+@pytest.mark.asyncio
+async def test_refresh_only_summarizes_new_messages(conversation):
+    summarizer = CountingSummarizer()
+    compactor = ConversationCompactor(summarizer, threshold=6, keep_recent=2, enabled=True)
+    db = FakeSession()
+
+    conversation.history = turns(4)
+    await compactor.refresh(1, db)
+    conversation.history = turns(8)
+    await compactor.refresh(1, db)
+
+    previous, messages = summarizer.calls[-1]
+    assert previous == "summary of 6 messages"
+    assert messages[0] == "question 3"
+    assert db.summarized_messages == 14
+
+
+@pytest.mark.asyncio
+async def test_prompt_size_stays_bounded(conversation):
+    compactor = ConversationCompactor(CountingSummarizer(), threshold=6, keep_recent=2, enabled=True)
+    db = FakeSession()
+
+    sizes = []
+    for count in range(1, 40):
+        conversation.history = turns(count)
+        await compactor.refresh(1, db)
+        sizes.append(len(await compactor.apply(1, conversation.history, db)))
+
+    assert max(sizes) <= 2 + 6 + 2
+    assert sizes[-1] < len(conversation.history)
+
+
+@pytest.mark.asyncio
+async def test_extractive_summary_fits_budget_and_keeps_order():
+    summarizer = ExtractiveSummarizer(max_tokens=30)
+    messages = [
+        {"role": "user", "content": "How do I tune the Postgres connection pool? The pool keeps timing out."},
+        {"role": "assistant", "content": "Raise the pool size. Check the pool timeout too. Weather is nice today."},
+        {"role": "user", "content": "The pool size is already 20."},
+    ]
+
+    summary = await summarizer.summarize(None, messages)
+
+    assert summary
+    assert len(summary) // 4 <= 30
+    assert "pool" in summary.lower()
+    assert "Weather" not in summary
+    assert summary.startswith("User:")
+
+
+def test_custom_summarizer_can_be_named_by_path():
+    summarizer = load_summarizer("app.services.compaction_service:ExtractiveSummarizer")
+
+    assert isinstance(summarizer, ExtractiveSummarizer)
+    with pytest.raises(ValueError):
+        load_summarizer("no-such-summarizer")
+
+
+def test_threshold_must_fit_the_history_window():
+    with pytest.raises(ValueError):
+        ConversationCompactor(CountingSummarizer(), threshold=19, enabled=True)
+    ConversationCompactor(CountingSummarizer(), threshold=19, enabled=False)
+
+
+def test_default_threshold_fits_the_history_window(monkeypatch):
+    defaults = Settings.model_fields
+    monkeypatch.setattr(settings, "COMPACTION_ENABLED", True)
+    monkeypatch.setattr(settings, "COMPACTION_THRESHOLD", defaults["COMPACTION_THRESHOLD"].default)
+    monkeypatch.setattr(settings, "COMPACTION_KEEP_RECENT", defaults["COMPACTION_KEEP_RECENT"].default)
+
+    compactor = ConversationCompactor()
+
+    assert compactor.threshold == defaults["COMPACTION_THRESHOLD"].default
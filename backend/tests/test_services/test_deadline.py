@@ -0,0 +1,99 @@
+"""
+Tests for per-request deadlines in multi-model generation.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from app.clients.base import BaseAIClient
+from app.models.message import ModelProvider, ResponseStatus
+from app.services import chat_service
+
+
+class DelayedClient(BaseAIClient):
+    """Answers after a fixed delay."""
+
+    def __init__(self, delay: float):
+        super().__init__("test-key")
+        self.delay = delay
+        self.cancelled = asyncio.Event()
+
+    async def generate_response(self, prompt, conversation_history=None, system_prompt=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled.set()
+            raise
+        return f"answer after {self.delay}s"
+
+    def get_model_name(self) -> str:
+        return f"delayed-{self.delay}"
+
+
+@pytest.fixture(autouse=True)
+def no_database(monkeypatch):
+    async def fake_history(conversation_id, db):
+        return []
+
+    async def fake_system_prompt(provider, db):
+        return None
+
+    monkeypatch.setattr(chat_service, "format_conversation_history", fake_history)
+    monkeypatch.setattr(chat_service.system_prompt_service, "get_system_prompt", fake_system_prompt)
+
+
+@pytest.mark.asyncio
+async def test_deadline_returns_partial_results():
+    hung = DelayedClient(30)
+    clients = {
+        ModelProvider.GROK: hung,
+        ModelProvider.PERPLEXITY: DelayedClient(0.01),
+    }
+
+    start = time.perf_counter()
+    responses = await chat_service.generate_multi_model_responses(
+        prompt="Deadline test",
+        conversation_id=1,
+        db=None,
+        selected_models=[ModelProvider.GROK, ModelProvider.PERPLEXITY],
+        clients=clients,
+        deadline=chat_service.request_deadline(0.2)
+    )
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
+    assert [r.provider for r in responses] == [ModelProvider.GROK, ModelProvider.PERPLEXITY]
+    assert responses[0].status == ResponseStatus.TIMED_OUT
+    assert responses[0].error
+    assert responses[1].status == ResponseStatus.COMPLETED
+    assert responses[1].content == "answer after 0.01s"
+
+    # The hung call is cancelled upstream, not left running
+    await asyncio.wait_for(hung.cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_as_completed_reports_timed_out_providers_last():
+    calls = await chat_service.prepare_model_calls(
+        prompt="Deadline stream test",
+        conversation_id=1,
+        db=None,
+        selected_models=[ModelProvider.GROK, ModelProvider.PERPLEXITY],
+        clients={
+            ModelProvider.GROK: DelayedClient(30),
+            ModelProvider.PERPLEXITY: DelayedClient(0.01),
+        }
+    )
+
+    responses = [
+        r async for r in chat_service.iter_responses_as_completed(
+            calls, chat_service.request_deadline(0.2)
+        )
+    ]
+
+    assert [(r.provider, r.status) for r in responses] == [
+        (ModelProvider.PERPLEXITY, ResponseStatus.COMPLETED),
+        (ModelProvider.GROK, ResponseStatus.TIMED_OUT),
+    ]
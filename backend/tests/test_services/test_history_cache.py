@@ -0,0 +1,280 @@
+"""
+Tests for the incremental per-conversation history cache and history windowing.
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.message import MessageRole, ModelProvider
+from app.services.history_service import (
+    HistoryCache,
+    compile_history,
+    history_token_budget,
+    window_history,
+)
+from app.utils.invalidation import invalidation_bus
+
+
+def message(role, content, token_count=None, status=None):
+    return SimpleNamespace(role=role, content=content, token_count=token_count, status=status)
+
+
+STORED = [
+    message(MessageRole.USER, "First question"),
+    message(MessageRole.ASSISTANT, "Short"),
+    message(MessageRole.ASSISTANT, "The longest answer"),
+    message(MessageRole.ASSISTANT, "Medium answer"),
+    message(MessageRole.USER, "Second question"),
+    message(MessageRole.ASSISTANT, "Only answer"),
+]
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Counts queries and returns the stored messages."""
+
+    def __init__(self, messages, delay=0):
+        self.messages = list(messages)
+        self.queries = 0
+        self.delay = delay
+
+    async def execute(self, statement):
+        self.queries += 1
+        rows = list(self.messages)
+        await asyncio.sleep(self.delay)
+        return FakeResult(rows)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    monkeypatch.setattr(invalidation_bus, "enabled", False)
+    return HistoryCache(max_conversations=2, ttl=300, redis_enabled=False)
+
+
+def test_one_assistant_message_per_turn():
+    assert [(m["role"], m["content"]) for m in compile_history(STORED)] == [
+        ("user", "First question"),
+        ("assistant", "The longest answer"),
+        ("user", "Second question"),
+        ("assistant", "Only answer"),
+    ]
+
+
+def test_partial_answers_only_stand_in_for_a_turn_nobody_completed():
+    history = compile_history([
+        message(MessageRole.USER, "First question"),
+        message(MessageRole.ASSISTANT, "A long answer that was cancelled", status="cancelled"),
+        message(MessageRole.ASSISTANT, "Done", status="completed"),
+        message(MessageRole.ASSISTANT, "A longer answer also cancelled early", status="cancelled"),
+        message(MessageRole.USER, "Second question"),
+        message(MessageRole.ASSISTANT, "Cut short", status="cancelled"),
+        message(MessageRole.ASSISTANT, "Cut", status="cancelled"),
+    ])
+
+    assert [m["content"] for m in history if m["role"] == "assistant"] == ["Done", "Cut short"]
+
+
+def test_stored_token_counts_are_used():
+    history = compile_history([
+        message(MessageRole.USER, "Question", token_count=7),
+        message(MessageRole.ASSISTANT, "Answer"),
+    ])
+
+    assert [m["tokens"] for m in history] == [7, len("Answer") // 4]
+
+
+def turns(count, tokens):
+    history = []
+    for index in range(count):
+        history.append({"role": "user", "content": f"question {index}", "tokens": tokens})
+        history.append({"role": "assistant", "content": f"answer {index}", "tokens": tokens})
+    return history
+
+
+def test_window_keeps_newest_messages_within_budget():
+    # 10 tokens + 4 overhead per message: 3 messages fit into 45 tokens
+    window = window_history(turns(5, 10), token_budget=45)
+
+    # The oldest fitting message is an answer, so the window starts one later
+    assert window == [
+        {"role": "user", "content": "question 4"},
+        {"role": "assistant", "content": "answer 4"},
+    ]
+
+
+def test_window_is_capped_at_max_messages():
+    window = window_history(turns(30, 1), token_budget=100000, max_messages=20)
+
+    assert len(window) == 20
+    assert window[0] == {"role": "user", "content": "question 20"}
+    assert window[-1] == {"role": "assistant", "content": "answer 29"}
+
+
+def test_window_keeps_the_pinned_summary():
+    summary = [
+        {"role": "user", "content": "summary", "tokens": 10, "pinned": True},
+        {"role": "assistant", "content": "ok", "tokens": 10, "pinned": True},
+    ]
+    history = summary + turns(15, 10)
+
+    # Cut by the message cap and by the token budget, the summary stays first
+    for window in (
+        window_history(history, token_budget=100000, max_messages=20),
+        window_history(history, token_budget=100),
+    ):
+        assert window[:2] == [
+            {"role": "user", "content": "summary"},
+            {"role": "assistant", "content": "ok"},
+        ]
+        assert window[2]["role"] == "user"
+        assert window[-1] == {"role": "assistant", "content": "answer 14"}
+    assert len(window_history(history, token_budget=100000, max_messages=20)) == 20
+    assert len(window_history(history, token_budget=100)) == 6
+
+
+def test_budget_leaves_room_for_prompts_and_answer():
+    long_system_prompt = "x" * 4000
+
+    small = history_token_budget(ModelProvider.CHATGPT, "Hi", long_system_prompt)
+    large = history_token_budget(ModelProvider.CLAUDE, "Hi", long_system_prompt)
+
+    assert small < history_token_budget(ModelProvider.CHATGPT, "Hi")
+    assert 0 < small < large
+    assert history_token_budget(ModelProvider.CHATGPT, "Hi", "x" * 40000) == 0
+
+
+@pytest.mark.asyncio
+async def test_saved_messages_are_appended_without_a_query(cache):
+    db = FakeSession(STORED)
+    await cache.get(1, db)
+
+    new = [message(MessageRole.USER, "Third question")]
+    db.messages.extend(new)
+    await cache.append(1, new)
+    new = [message(MessageRole.ASSISTANT, "Brief"), message(MessageRole.ASSISTANT, "A fuller answer")]
+    db.messages.extend(new)
+    await cache.append(1, new)
+
+    assert await cache.get(1, db) == compile_history(db.messages)
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_returned_history_is_a_copy(cache):
+    db = FakeSession(STORED)
+
+    history = await cache.get(1, db)
+    history.pop()
+    history[0]["content"] = "changed"
+
+    assert await cache.get(1, db) == compile_history(STORED)
+
+
+@pytest.mark.asyncio
+async def test_load_racing_a_save_is_not_cached(cache):
+    db = FakeSession(STORED, delay=0.05)
+
+    load = asyncio.create_task(cache.get(1, db))
+    await asyncio.sleep(0.01)
+    new = [message(MessageRole.USER, "Saved during the load")]
+    db.messages.extend(new)
+    await cache.append(1, new)
+    await load
+
+    db.delay = 0
+    assert (await cache.get(1, db))[-1]["content"] == "Saved during the load"
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_invalidation_drops_the_conversation(cache):
+    db = FakeSession(STORED)
+    await cache.get(1, db)
+    await cache.get(2, db)
+
+    invalidation_bus.register("conversation_history", cache.drop)
+    try:
+        db.messages = STORED[:2]
+        await cache.invalidate(1)
+    finally:
+        invalidation_bus._handlers["conversation_history"].remove(cache.drop)
+
+    assert await cache.get(1, db) == compile_history(STORED[:2])
+    await cache.get(2, db)
+    assert db.queries == 3
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_conversation_is_evicted(cache):
+    db = FakeSession(STORED)
+    for conversation_id in (1, 2, 1, 3):
+        await cache.get(conversation_id, db)
+
+    await cache.get(1, db)
+    await cache.get(2, db)
+
+    assert db.queries == 4
+
+
+@pytest.mark.asyncio
+async def test_appends_are_announced_in_the_background(monkeypatch):
+    published = []
+
+    async def slow_publish(topic, key=None):
+        await asyncio.sleep(0.05)
+        published.append(key)
+
+    monkeypatch.setattr(invalidation_bus, "publish", slow_publish)
+    shared = HistoryCache(redis_enabled=False, peers=True)
+    alone = HistoryCache(redis_enabled=False, peers=False)
+
+    await shared.append(1, [message(MessageRole.USER, "Question")])
+    await alone.append(2, [message(MessageRole.USER, "Question")])
+
+    # The append did not wait for the publish, and only workers with peers publish
+    assert published == []
+    await shared.aclose()
+    await alone.aclose()
+    assert published == ["1"]
+
+
+@pytest.mark.asyncio
+async def test_loads_are_written_to_redis_in_the_background(monkeypatch):
+    published = []
+    stored = []
+
+    async def publish(topic, key=None):
+        published.append(key)
+
+    async def get_remote(conversation_id):
+        return None
+
+    async def slow_set_remote(conversation_id, history):
+        await asyncio.sleep(0.05)
+        stored.append(conversation_id)
+
+    monkeypatch.setattr(invalidation_bus, "publish", publish)
+    cache = HistoryCache(redis_enabled=False, peers=True)
+    monkeypatch.setattr(cache, "_get_redis", lambda: object())
+    monkeypatch.setattr(cache, "_get_remote", get_remote)
+    monkeypatch.setattr(cache, "_set_remote", slow_set_remote)
+
+    assert await cache.get(1, FakeSession(STORED)) == compile_history(STORED)
+
+    # The load did not wait for Redis, and other workers' copies are still valid
+    assert stored == []
+    await cache.aclose()
+    assert stored == [1]
+    assert published == []
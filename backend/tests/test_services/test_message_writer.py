@@ -0,0 +1,234 @@
+"""
+Tests for write-behind persistence of assistant responses.
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.exc import IntegrityError
+
+from app.models.message import MessageRole, ModelProvider
+from app.services import message_writer as writer_module
+from app.services.history_service import HistoryCache
+from app.services.message_writer import (
+    MessageWriter,
+    assistant_message_row,
+    idempotency_key,
+    insert_messages,
+)
+from app.utils.invalidation import invalidation_bus
+
+
+class FakeDatabase:
+    """Records the rows of each insert; can be told to fail or to reject rows."""
+
+    def __init__(self, delay=0):
+        self.inserts = []
+        self.failures = 0
+        self.rejected = set()
+        self.delay = delay
+
+    @asynccontextmanager
+    async def session(self):
+        yield self
+
+    async def execute(self, statement):
+        await asyncio.sleep(self.delay)
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        params = statement.compile(dialect=postgresql.dialect()).params
+        keys = sorted(v for k, v in params.items() if k.startswith("idempotency_key"))
+        if self.rejected.intersection(keys):
+            raise IntegrityError("INSERT INTO messages", params, Exception("foreign key violation"))
+        self.inserts.append(keys)
+
+    async def commit(self):
+        pass
+
+
+def rows(conversation_id, turn, providers=(ModelProvider.CLAUDE, ModelProvider.GEMINI)):
+    return [
+        assistant_message_row(
+            conversation_id, provider, f"answer {turn}", idempotency_key(conversation_id, turn, provider)
+        )
+        for provider in providers
+    ]
+
+
+@pytest.fixture(autouse=True)
+def isolated(monkeypatch):
+    """Keep the shared history cache and compactor out of these tests."""
+    appended = []
+
+    async def fake_append(conversation_id, messages):
+        appended.extend(messages)
+
+    async def fake_touch(conversation_id):
+        pass
+
+    monkeypatch.setattr(writer_module.history_cache, "append", fake_append)
+    monkeypatch.setattr(writer_module.history_cache, "touch", fake_touch)
+    monkeypatch.setattr(writer_module.history_cache, "invalidate", fake_touch)
+    monkeypatch.setattr(writer_module.conversation_compactor, "enabled", False)
+    return appended
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_multi_row_inserts(isolated):
+    database = FakeDatabase()
+    writer = MessageWriter(batch_size=10, flush_interval=0.05, session_factory=database.session)
+    writer.start()
+
+    await asyncio.gather(*(writer.enqueue(rows(conversation, 1)) for conversation in range(15)))
+    # Returns before anything is written
+    assert database.inserts == []
+    assert len(isolated) == 30
+
+    await asyncio.sleep(0.1)
+    await writer.stop()
+
+    assert [len(batch) for batch in database.inserts] == [10, 10, 10]
+    assert writer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_after_the_interval():
+    database = FakeDatabase()
+    writer = MessageWriter(batch_size=100, flush_interval=0.05, session_factory=database.session)
+    writer.start()
+
+    await writer.enqueue(rows(1, 1))
+    await asyncio.sleep(0.01)
+    assert database.inserts == []
+    await asyncio.sleep(0.1)
+
+    assert len(database.inserts) == 1
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_keeps_rows_and_retries():
+    database = FakeDatabase()
+    database.failures = 2
+    writer = MessageWriter(batch_size=100, flush_interval=0.01, retry_delay=0.01, session_factory=database.session)
+    writer.start()
+
+    await writer.enqueue(rows(1, 1))
+    await asyncio.sleep(0.015)
+    assert [m.content for m in writer.pending(1)] == ["answer 1", "answer 1"]
+    await asyncio.sleep(0.1)
+
+    assert len(database.inserts) == 1
+    assert writer.pending(1) == []
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_rejected_rows_are_dropped_without_blocking_the_batch():
+    database = FakeDatabase()
+    database.rejected = {"2:1:gemini"}
+    writer = MessageWriter(batch_size=100, flush_interval=60, session_factory=database.session)
+
+    await writer.enqueue(rows(1, 1))
+    await writer.enqueue(rows(2, 1))
+
+    assert await writer.flush() == 3
+    assert database.inserts == [["1:1:claude"], ["1:1:gemini"], ["2:1:claude"]]
+    assert writer.pending_count == 0
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_discarded_conversations_are_not_written():
+    database = FakeDatabase()
+    writer = MessageWriter(batch_size=100, flush_interval=60, session_factory=database.session)
+
+    await writer.enqueue(rows(1, 1))
+    await writer.enqueue(rows(2, 1))
+
+    assert writer.discard(1) == 2
+    assert writer.pending(1) == []
+    await writer.flush()
+    assert database.inserts == [["2:1:claude", "2:1:gemini"]]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_backpressure_flush_failure_does_not_fail_the_request():
+    database = FakeDatabase()
+    database.failures = 1
+    writer = MessageWriter(batch_size=100, flush_interval=60, max_pending=2, session_factory=database.session)
+
+    await writer.enqueue(rows(1, 1))
+    await writer.enqueue(rows(1, 2))
+
+    assert writer.pending_count == 4
+    await writer.stop()
+    assert writer.pending_count == 0
+
+
+@pytest.mark.asyncio
+async def test_stop_drains_queued_rows():
+    database = FakeDatabase()
+    writer = MessageWriter(batch_size=100, flush_interval=60, session_factory=database.session)
+    writer.start()
+
+    await writer.enqueue(rows(1, 1))
+    await writer.enqueue(rows(2, 1))
+    await writer.stop()
+
+    assert database.inserts == [sorted(
+        ["1:1:claude", "1:1:gemini", "2:1:claude", "2:1:gemini"]
+    )]
+
+
+def test_replayed_inserts_are_ignored():
+    statements = []
+
+    class Session:
+        async def execute(self, statement):
+            statements.append(statement)
+
+        async def commit(self):
+            pass
+
+    asyncio.run(insert_messages(rows(1, 1), Session()))
+    sql = str(statements[0].compile(dialect=postgresql.dialect()))
+
+    assert "ON CONFLICT (idempotency_key) DO NOTHING" in sql
+    assert idempotency_key(1, 5, ModelProvider.CLAUDE) == idempotency_key(1, 5, ModelProvider.CLAUDE)
+    assert idempotency_key(1, None, ModelProvider.CLAUDE) != idempotency_key(1, None, ModelProvider.CLAUDE)
+
+
+@pytest.mark.asyncio
+async def test_history_rebuild_includes_unflushed_messages(monkeypatch):
+    monkeypatch.setattr(invalidation_bus, "enabled", False)
+    now = datetime.now(timezone.utc)
+    question = SimpleNamespace(
+        role=MessageRole.USER, content="question", token_count=2,
+        idempotency_key=None, created_at=now - timedelta(seconds=1)
+    )
+    flushed = rows(1, 1)[0]
+    queued = {**rows(1, 1)[1], "content": "a longer unflushed answer"}
+    stored = [question, SimpleNamespace(**flushed)]
+
+    class Session:
+        async def execute(self, statement):
+            return SimpleNamespace(scalars=lambda: SimpleNamespace(all=lambda: list(stored)))
+
+    writer = MessageWriter(session_factory=None)
+    writer._rows = [flushed, queued]
+    cache = HistoryCache(redis_enabled=False)
+    cache.register_pending_source(writer.pending)
+
+    history = await cache.get(1, Session())
+
+    assert [(m["role"], m["content"]) for m in history] == [
+        ("user", "question"),
+        ("assistant", "a longer unflushed answer"),
+    ]
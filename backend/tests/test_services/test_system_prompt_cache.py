@@ -0,0 +1,112 @@
+"""
+Tests for the cached, batched system prompt lookup.
+"""
+
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from app.models.message import ModelProvider
+from app.services import system_prompt_service
+from app.services.system_prompt_service import SystemPromptCache
+from app.utils.invalidation import InvalidationBus, invalidation_bus
+
+
+class FakeResult:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class FakeSession:
+    """Counts queries and returns one active prompt per provider."""
+
+    def __init__(self, on_execute=None):
+        self.queries = 0
+        self.on_execute = on_execute
+        self.templates = {provider: f"You are {provider.value}" for provider in ModelProvider}
+
+    async def execute(self, statement):
+        self.queries += 1
+        if self.on_execute:
+            self.on_execute()
+        return FakeResult([
+            SimpleNamespace(model_provider=provider, prompt_template=template)
+            for provider, template in self.templates.items()
+        ])
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    fresh = SystemPromptCache(ttl=300)
+    monkeypatch.setattr(system_prompt_service, "system_prompt_cache", fresh)
+    monkeypatch.setattr(invalidation_bus, "enabled", False)
+    monkeypatch.setitem(
+        invalidation_bus._handlers, system_prompt_service.SYSTEM_PROMPTS_TOPIC, [fresh.invalidate]
+    )
+    return fresh
+
+
+@pytest.mark.asyncio
+async def test_all_providers_load_with_one_query(cache):
+    db = FakeSession()
+
+    prompts = [
+        await system_prompt_service.get_system_prompt(provider, db)
+        for provider in ModelProvider
+    ]
+
+    assert prompts == [f"You are {provider.value}" for provider in ModelProvider]
+    assert db.queries == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation_reloads_prompts(cache):
+    db = FakeSession()
+    await system_prompt_service.get_system_prompt(ModelProvider.CLAUDE, db)
+
+    db.templates[ModelProvider.CLAUDE] = "Updated"
+    await system_prompt_service.invalidate_system_prompt_cache()
+
+    assert await system_prompt_service.get_system_prompt(ModelProvider.CLAUDE, db) == "Updated"
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_load_racing_an_invalidation_is_not_cached(cache):
+    db = FakeSession(on_execute=cache.invalidate)
+
+    await cache.get_all(db)
+    db.on_execute = None
+    await cache.get_all(db)
+
+    assert db.queries == 2
+
+
+@pytest.mark.asyncio
+async def test_expired_prompts_are_reloaded():
+    db = FakeSession()
+    cache = SystemPromptCache(ttl=0)
+
+    await cache.get_all(db)
+    await cache.get_all(db)
+
+    assert db.queries == 2
+
+
+def test_messages_from_other_workers_are_dispatched():
+    bus = InvalidationBus(enabled=False)
+    seen = []
+    bus.register("system_prompts", seen.append)
+
+    bus.handle_message(json.dumps({"origin": "other-worker", "topic": "system_prompts", "key": None}))
+    bus.handle_message(json.dumps({"origin": bus.instance_id, "topic": "system_prompts", "key": "own"}))
+    bus.handle_message("not json")
+
+    assert seen == [None]
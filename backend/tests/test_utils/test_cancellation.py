@@ -0,0 +1,85 @@
+"""
+Tests for client-initiated cancellation of provider calls.
+"""
+
+import asyncio
+
+import pytest
+
+from app.models.message import ModelProvider, ResponseStatus
+from app.schemas.chat import ModelResponse
+from app.services import chat_service
+from app.utils.cancellation import CancellationRegistry, CancellationScope
+
+
+async def answer_after(delay: float, stopped: list, name: str) -> str:
+    try:
+        await asyncio.sleep(delay)
+    except asyncio.CancelledError:
+        stopped.append(name)
+        raise
+    return name
+
+
+@pytest.mark.asyncio
+async def test_wait_cancels_only_the_cancelled_provider():
+    scope = CancellationScope()
+    stopped = []
+    fast = asyncio.ensure_future(answer_after(0.01, stopped, "fast"))
+    slow = asyncio.ensure_future(answer_after(5, stopped, "slow"))
+    asyncio.get_running_loop().call_later(0.05, scope.cancel, "slow")
+
+    done, pending = await scope.wait({fast: "fast", slow: "slow"}, timeout=1)
+
+    assert done == {fast, slow} and not pending
+    assert fast.result() == "fast"
+    assert slow.cancelled()
+    assert stopped == ["slow"]
+
+
+@pytest.mark.asyncio
+async def test_cancelling_the_request_stops_every_provider():
+    scope = CancellationScope()
+    stopped = []
+    tasks = {asyncio.ensure_future(answer_after(5, stopped, name)): name for name in ("a", "b")}
+    asyncio.get_running_loop().call_later(0.01, scope.cancel)
+
+    done, _ = await scope.wait(tasks, timeout=1, return_when=asyncio.FIRST_COMPLETED)
+
+    assert done and all(task.cancelled() for task in done)
+    assert scope.is_cancelled("a") and scope.is_cancelled("anything")
+
+
+def test_registry_forgets_finished_requests():
+    registry = CancellationRegistry()
+
+    with registry.open("req-1") as scope:
+        assert registry.cancel("req-1", "claude")
+        assert scope.is_cancelled("claude")
+        assert not scope.is_cancelled("gemini")
+
+    assert not registry.cancel("req-1")
+    with registry.open(None):
+        assert not registry.cancel(None)
+
+
+@pytest.mark.asyncio
+async def test_collect_model_responses_reports_cancelled_models():
+    scope = CancellationScope()
+
+    async def respond(provider, delay):
+        await asyncio.sleep(delay)
+        return ModelResponse(provider=provider, content="answer")
+
+    calls = [
+        (ModelProvider.CLAUDE, respond(ModelProvider.CLAUDE, 0.01)),
+        (ModelProvider.GROK, respond(ModelProvider.GROK, 5)),
+    ]
+    asyncio.get_running_loop().call_later(0.05, scope.cancel, "grok")
+
+    responses = await chat_service.collect_model_responses(
+        calls, chat_service.request_deadline(1), cancellation=scope
+    )
+
+    assert [r.status for r in responses] == [ResponseStatus.COMPLETED, ResponseStatus.CANCELLED]
+    assert responses[1].error
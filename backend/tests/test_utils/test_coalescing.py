@@ -0,0 +1,77 @@
+"""
+Tests for time-windowed chunk coalescing.
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.coalescing import ChunkCoalescer
+
+
+class Frames:
+    """Records the frames a coalescer sends."""
+
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, content):
+        self.sent.append(content)
+
+
+@pytest.mark.asyncio
+async def test_first_chunk_is_sent_immediately_and_the_rest_per_window():
+    frames = Frames()
+    coalescer = ChunkCoalescer(frames.send, window=0.05, max_bytes=1000)
+
+    await coalescer.add("Hel")
+    assert frames.sent == ["Hel"]
+
+    for chunk in ("lo", ", ", "wor", "ld"):
+        await coalescer.add(chunk)
+    assert frames.sent == ["Hel"]
+
+    # The timer sends the buffer once the window is over, without another chunk
+    await asyncio.sleep(0.08)
+    assert frames.sent == ["Hel", "lo, world"]
+
+    await coalescer.add("!")
+    await coalescer.aclose()
+    assert "".join(frames.sent) == "Hello, world!"
+
+
+@pytest.mark.asyncio
+async def test_full_buffer_is_sent_before_the_window_ends():
+    frames = Frames()
+    coalescer = ChunkCoalescer(frames.send, window=10, max_bytes=7)
+
+    for chunk in ("a", "bcd", "efgh", "ij"):
+        await coalescer.add(chunk)
+    await coalescer.aclose()
+
+    assert frames.sent == ["a", "bcdefgh", "ij"]
+
+
+@pytest.mark.asyncio
+async def test_zero_window_sends_every_chunk():
+    frames = Frames()
+    coalescer = ChunkCoalescer(frames.send, window=0)
+
+    for chunk in ("a", "b", "c"):
+        await coalescer.add(chunk)
+    await coalescer.aclose()
+
+    assert frames.sent == ["a", "b", "c"]
+
+
+@pytest.mark.asyncio
+async def test_discard_drops_the_buffer_and_timer():
+    frames = Frames()
+    coalescer = ChunkCoalescer(frames.send, window=0.02)
+
+    await coalescer.add("sent")
+    await coalescer.add("dropped")
+    coalescer.discard()
+    await asyncio.sleep(0.04)
+
+    assert frames.sent == ["sent"]
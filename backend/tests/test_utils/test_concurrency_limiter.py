@@ -0,0 +1,89 @@
+"""
+Tests for the adaptive per-provider concurrency limiter.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.utils.concurrency_limiter import (
+    AdaptiveConcurrencyLimiter,
+    ProviderOverloadedError,
+    is_rate_limit_error,
+)
+
+
+def rate_limited_error() -> Exception:
+    """Mimic a client wrapping an HTTP 429 in a generic Exception."""
+    request = httpx.Request("POST", "https://api.example.com/chat")
+    response = httpx.Response(429, request=request)
+    try:
+        try:
+            response.raise_for_status()
+        except httpx.HTTPStatusError as e:
+            raise Exception(f"Grok API error: {e}")
+    except Exception as wrapped:
+        return wrapped
+
+
+def test_rate_limit_detected_through_wrapped_errors():
+    assert is_rate_limit_error(rate_limited_error())
+    assert not is_rate_limit_error(Exception("bad request"))
+
+
+@pytest.mark.asyncio
+async def test_limit_caps_in_flight_calls_and_queues_the_rest():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=2, max_limit=2, latency_tolerance=0)
+    active = 0
+    peak = 0
+    release = asyncio.Event()
+
+    async def call():
+        nonlocal active, peak
+        async with limiter.slot():
+            active += 1
+            peak = max(peak, active)
+            await release.wait()
+            active -= 1
+
+    tasks = [asyncio.create_task(call()) for _ in range(5)]
+    await asyncio.sleep(0.01)
+
+    assert limiter.get_stats()["in_flight"] == 2
+    assert limiter.queue_depth == 3
+
+    release.set()
+    await asyncio.gather(*tasks)
+    assert peak == 2
+    assert limiter.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_rejects_new_calls():
+    limiter = AdaptiveConcurrencyLimiter(name="grok", initial_limit=1, max_queue=1)
+    await limiter.acquire()
+    waiter = asyncio.create_task(limiter.acquire())
+    await asyncio.sleep(0)
+
+    with pytest.raises(ProviderOverloadedError, match="grok"):
+        await limiter.acquire()
+
+    limiter.release()
+    await waiter
+    limiter.release()
+
+
+@pytest.mark.asyncio
+async def test_aimd_adjusts_limit():
+    limiter = AdaptiveConcurrencyLimiter(initial_limit=8, latency_tolerance=0)
+
+    with pytest.raises(Exception):
+        async with limiter.slot():
+            raise rate_limited_error()
+    assert limiter.current_limit == 4
+
+    for _ in range(20):
+        async with limiter.slot():
+            pass
+    assert limiter.current_limit > 4
@@ -0,0 +1,94 @@
+"""
+Tests for hedged provider requests.
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.hedging import HedgeBudget, LatencyHistogram, RequestHedger
+
+
+def warmed_hedger(latency: float = 0.01, **kwargs) -> RequestHedger:
+    hedger = RequestHedger(providers=["grok"], percentile=95, min_samples=5, **kwargs)
+    for _ in range(10):
+        hedger.get_histogram("grok").record(latency)
+    return hedger
+
+
+def test_histogram_percentile():
+    histogram = LatencyHistogram(window_size=100)
+    for ms in range(1, 101):
+        histogram.record(ms / 1000)
+
+    assert histogram.percentile(95) == pytest.approx(0.095)
+    assert histogram.percentile(50) == pytest.approx(0.050)
+
+
+def test_budget_limits_hedges_to_share_of_traffic():
+    budget = HedgeBudget(budget_percent=10)
+    spent = 0
+    for _ in range(100):
+        budget.on_request()
+        spent += budget.try_spend()
+
+    assert spent == 10
+
+
+@pytest.mark.asyncio
+async def test_straggler_is_hedged_and_cancelled():
+    hedger = warmed_hedger(budget_percent=100)
+    calls = []
+    cancelled = []
+
+    async def provider_call():
+        attempt = len(calls)
+        calls.append(attempt)
+        try:
+            await asyncio.sleep(5 if attempt == 0 else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(attempt)
+            raise
+        return f"attempt {attempt}"
+
+    result = await asyncio.wait_for(hedger.call("grok", provider_call), timeout=1)
+    await asyncio.sleep(0)
+
+    assert result == "attempt 1"
+    assert cancelled == [0]
+    assert hedger.get_stats()["grok"]["hedges_won"] == 1
+
+
+@pytest.mark.asyncio
+async def test_no_hedge_without_budget_or_when_disabled():
+    calls = []
+
+    async def provider_call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    no_budget = warmed_hedger(budget_percent=0)
+    assert await no_budget.call("grok", provider_call) == "ok"
+
+    disabled = warmed_hedger(budget_percent=100)
+    assert await disabled.call("claude", provider_call) == "ok"
+
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_primary_falls_back_to_hedge():
+    hedger = warmed_hedger(budget_percent=100)
+    calls = []
+
+    async def provider_call():
+        attempt = len(calls)
+        calls.append(attempt)
+        if attempt == 0:
+            await asyncio.sleep(0.05)
+            raise RuntimeError("primary failed")
+        await asyncio.sleep(0.1)
+        return "hedge"
+
+    assert await hedger.call("grok", provider_call) == "hedge"
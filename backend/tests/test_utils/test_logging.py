@@ -0,0 +1,88 @@
+"""
+Tests for request-scoped structured logging and debug sampling.
+"""
+
+import asyncio
+import json
+import logging
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils import logging as app_logging
+from app.utils.logging import (
+    ContextFilter,
+    DebugSampler,
+    RequestContextMiddleware,
+    StructuredFormatter,
+    bind_log_context,
+    get_log_context,
+    log_context,
+    request_log_context,
+)
+
+
+def record(level=logging.DEBUG, message="message"):
+    return logging.LogRecord("app.test", level, __file__, 1, message, None, None)
+
+
+def test_context_fields_are_added_to_json_records():
+    with request_log_context("req-1", conversation_id=7), log_context(provider="claude"):
+        log_record = record(logging.INFO, "hello")
+        ContextFilter().filter(log_record)
+
+    data = json.loads(StructuredFormatter().format(log_record))
+
+    assert data["message"] == "hello"
+    assert (data["request_id"], data["conversation_id"], data["provider"]) == ("req-1", 7, "claude")
+    assert get_log_context() == {}
+
+
+@pytest.mark.asyncio
+async def test_tasks_inherit_context_without_leaking_back():
+    async def provider_call(provider):
+        with log_context(provider=provider):
+            await asyncio.sleep(0)
+            return get_log_context()
+
+    with request_log_context("req-2"):
+        bind_log_context(conversation_id=3)
+        results = await asyncio.gather(provider_call("claude"), provider_call("gemini"))
+        after = get_log_context()
+
+    assert results == [
+        {"request_id": "req-2", "conversation_id": 3, "provider": "claude"},
+        {"request_id": "req-2", "conversation_id": 3, "provider": "gemini"},
+    ]
+    assert after == {"request_id": "req-2", "conversation_id": 3}
+
+
+def test_debug_records_are_sampled_per_request(monkeypatch):
+    sampler = DebugSampler(rate=0.5)
+
+    monkeypatch.setattr(app_logging, "_debug_sample_rate", 0.0)
+    with request_log_context():
+        assert not any(sampler.filter(record()) for _ in range(20))
+        assert sampler.filter(record(logging.WARNING))
+
+    monkeypatch.setattr(app_logging, "_debug_sample_rate", 1.0)
+    with request_log_context():
+        assert all(sampler.filter(record()) for _ in range(20))
+
+
+def test_middleware_sets_and_echoes_request_id():
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    @app.get("/context")
+    async def context():
+        return get_log_context()
+
+    client = TestClient(app)
+    given = client.get("/context", headers={"X-Request-ID": "abc123"})
+    generated = client.get("/context")
+
+    assert given.json() == {"request_id": "abc123"}
+    assert given.headers["x-request-id"] == "abc123"
+    assert generated.json()["request_id"] == generated.headers["x-request-id"]
@@ -0,0 +1,142 @@
+"""
+Tests for single-flight coalescing of identical provider calls.
+"""
+
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight, request_key
+
+
+def test_request_key_covers_every_input():
+    history = [{"role": "user", "content": "Hi"}]
+    base = request_key("claude", "model-a", "Be brief", history, "Hello")
+
+    assert base == request_key("claude", "model-a", "Be brief", list(history), "Hello")
+    assert base != request_key("chatgpt", "model-a", "Be brief", history, "Hello")
+    assert base != request_key("claude", "model-b", "Be brief", history, "Hello")
+    assert base != request_key("claude", "model-a", None, history, "Hello")
+    assert base != request_key("claude", "model-a", "Be brief", [], "Hello")
+    assert base != request_key("claude", "model-a", "Be brief", history, "Hello!")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_calls_share_one_request():
+    group = SingleFlight(enabled=True)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "answer"
+
+    results = await asyncio.gather(*[group.call("key", upstream) for _ in range(5)])
+
+    assert results == ["answer"] * 5
+    assert len(calls) == 1
+    assert group.in_flight == 0
+
+    # Once finished, the next call goes upstream again
+    await group.call("key", upstream)
+    assert len(calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_errors_are_shared_by_all_callers():
+    group = SingleFlight(enabled=True)
+
+    async def upstream():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("provider down")
+
+    results = await asyncio.gather(
+        *[group.call("key", upstream) for _ in range(3)],
+        return_exceptions=True
+    )
+
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_call_is_cancelled_when_last_waiter_leaves():
+    group = SingleFlight(enabled=True)
+    cancelled = asyncio.Event()
+
+    async def upstream():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    first = asyncio.create_task(group.call("key", upstream))
+    second = asyncio.create_task(group.call("key", upstream))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    assert not cancelled.is_set()
+
+    second.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+
+
+@pytest.mark.asyncio
+async def test_stream_subscribers_receive_identical_chunks():
+    group = SingleFlight(enabled=True)
+    starts = []
+
+    def upstream():
+        async def stream():
+            starts.append(1)
+            for chunk in ["Hel", "lo", " world"]:
+                await asyncio.sleep(0.01)
+                yield chunk
+        return stream()
+
+    async def consume(delay: float):
+        await asyncio.sleep(delay)
+        return [chunk async for chunk in group.stream("key", upstream)]
+
+    # The late subscriber joins after the first chunk has been produced
+    results = await asyncio.gather(consume(0), consume(0), consume(0.015))
+
+    assert results == [["Hel", "lo", " world"]] * 3
+    assert len(starts) == 1
+    assert group.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_stream_error_reaches_every_subscriber():
+    group = SingleFlight(enabled=True)
+
+    def upstream():
+        async def stream():
+            await asyncio.sleep(0.01)
+            yield "partial"
+            raise RuntimeError("stream broke")
+        return stream()
+
+    async def consume():
+        received = []
+        with pytest.raises(RuntimeError):
+            async for chunk in group.stream("key", upstream):
+                received.append(chunk)
+        return received
+
+    assert await asyncio.gather(consume(), consume()) == [["partial"], ["partial"]]
+
+
+@pytest.mark.asyncio
+async def test_disabled_group_calls_upstream_every_time():
+    group = SingleFlight(enabled=False)
+    calls = []
+
+    async def upstream():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    await asyncio.gather(group.call("key", upstream), group.call("key", upstream))
+    assert len(calls) == 2